@@ -0,0 +1,184 @@
+"""
+Push feed of case changes.
+
+The write paths in routes.py publish a compact delta per case write to the
+`cases:changes` Redis channel:
+
+    {"type": "created" | "updated", "case_id", "version",
+     "lawyers": [addresses], "fields": {name: new value}}
+
+Evidence lists in `fields` carry only the items that were added. Each worker
+holds one subscription to the channel, started and stopped with the app (see
+the lifespan in main.py), and fans deltas out to the `GET /cases/changes`
+streams of that worker that asked for the case or one of its lawyers (or for
+everything). A subscriber that falls `change_feed_queue_size` deltas behind,
+or that may have missed deltas because the subscription was (re-)established,
+gets a `resync` event and should re-read the cases it follows (cheaply, with
+If-None-Match).
+
+In-process caches keyed by case (such as the chat room authorizations) can
+register a listener that is called with every delta and with `resync`.
+"""
+import asyncio
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+import orjson
+
+from ...config import settings
+from ...db.storage import async_store, store
+from ...db.store import RESYNC
+
+# Scalar fields sent when a case is created; clients fetch the rest if needed
+CREATED_FIELDS = (
+    "title", "lawyer1_type", "lawyer1_address", "lawyer2_type", "lawyer2_address",
+    "case_status", "mode", "created_at", "updated_at",
+)
+
+def case_change(kind: str, case: dict, fields: Optional[dict] = None) -> dict:
+    """Delta for a write to `case` (its API view after the write)"""
+    if fields is None:
+        fields = {name: case.get(name) for name in CREATED_FIELDS}
+    return {
+        "type": kind,
+        "case_id": case["case_id"],
+        "version": case.get("version"),
+        "lawyers": [a for a in (case.get("lawyer1_address"), case.get("lawyer2_address")) if a],
+        "fields": fields,
+    }
+
+
+def publish_changes(*changes: dict):
+    """Publish deltas without failing the write they describe"""
+    try:
+        store.publish_case_changes(changes)
+    except Exception as e:
+        print(f"Error publishing case changes: {e}")
+
+
+class Subscription:
+    def __init__(self, case_ids: Iterable[str], lawyer_addresses: Iterable[str], queue_size: int):
+        self.case_ids = set(case_ids)
+        self.lawyer_addresses = set(lawyer_addresses)
+        self.queue: "asyncio.Queue[dict]" = asyncio.Queue(maxsize=queue_size)
+
+    def deliver(self, change: dict):
+        try:
+            self.queue.put_nowait(change)
+        except asyncio.QueueFull:
+            # Too far behind: drop what is queued and have the client re-read
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC)
+
+
+class ChangeFeed:
+    def __init__(self, queue_size: int):
+        self.queue_size = queue_size
+        self.everything: Set[Subscription] = set()
+        self.by_case: Dict[str, Set[Subscription]] = {}
+        self.by_lawyer: Dict[str, Set[Subscription]] = {}
+        self.listeners: List[Callable[[dict], None]] = []
+        self.listener: Optional[asyncio.Task] = None
+        self.delivered = 0
+
+    def add_listener(self, callback: Callable[[dict], None]):
+        """Call `callback` with every delta received by this worker"""
+        self.listeners.append(callback)
+
+    def start(self):
+        """Start relaying the change channel, if not already; needs a running loop"""
+        if self.listener is None or self.listener.done():
+            self.listener = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.listener is not None:
+            self.listener.cancel()
+            try:
+                await self.listener
+            except asyncio.CancelledError:
+                pass
+            self.listener = None
+
+    def subscribe(self, case_ids: Iterable[str] = (), lawyer_addresses: Iterable[str] = ()) -> Subscription:
+        subscription = Subscription(case_ids, lawyer_addresses, self.queue_size)
+        if not subscription.case_ids and not subscription.lawyer_addresses:
+            self.everything.add(subscription)
+        for case_id in subscription.case_ids:
+            self.by_case.setdefault(case_id, set()).add(subscription)
+        for address in subscription.lawyer_addresses:
+            self.by_lawyer.setdefault(address, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self.everything.discard(subscription)
+        for index, keys in ((self.by_case, subscription.case_ids), (self.by_lawyer, subscription.lawyer_addresses)):
+            for key in keys:
+                subscribers = index.get(key)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del index[key]
+
+    def subscriptions(self) -> Set[Subscription]:
+        everyone = set(self.everything)
+        for index in (self.by_case, self.by_lawyer):
+            for subscribers in index.values():
+                everyone.update(subscribers)
+        return everyone
+
+    def dispatch(self, change: dict):
+        # Index lookups, so a delta only touches the subscribers it concerns
+        targets = set(self.everything)
+        targets.update(self.by_case.get(change.get("case_id"), ()))
+        for address in change.get("lawyers") or ():
+            targets.update(self.by_lawyer.get(address, ()))
+        for subscription in targets:
+            subscription.deliver(change)
+        self.delivered += len(targets)
+        self.notify(change)
+
+    def notify(self, change: dict):
+        for callback in self.listeners:
+            try:
+                callback(change)
+            except Exception as e:
+                print(f"Error in case change listener: {e}")
+
+    def resync(self):
+        """Tell every subscriber and listener that deltas may have been missed"""
+        for subscription in self.subscriptions():
+            subscription.deliver(RESYNC)
+        self.notify(RESYNC)
+
+    async def run(self):
+        """Relay the change channel to local subscribers, resubscribing whenever it ends"""
+        while True:
+            try:
+                # Every (re)subscription starts with RESYNC: deltas published
+                # while it was not live are lost
+                async for change in async_store.case_changes():
+                    if change.get("type") == RESYNC["type"]:
+                        self.resync()
+                    else:
+                        self.dispatch(change)
+                print("Case change subscription ended, resubscribing")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Error reading case changes: {e}")
+            await asyncio.sleep(1)
+
+    def status(self) -> dict:
+        return {
+            "subscribers": len(self.subscriptions()),
+            "cases": len(self.by_case),
+            "lawyers": len(self.by_lawyer),
+            "delivered": self.delivered,
+        }
+
+
+def sse_event(change: dict) -> bytes:
+    return b"event: " + change["type"].encode() + b"\ndata: " + orjson.dumps(change) + b"\n\n"
+
+
+change_feed = ChangeFeed(settings.change_feed_queue_size)
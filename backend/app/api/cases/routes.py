@@ -1,6 +1,10 @@
-from fastapi import APIRouter, HTTPException
-from datetime import datetime
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
+from typing import List, Optional
+import asyncio
+import orjson
 import uuid
+import weakref
 
 
 from reportlab.lib import colors
@@ -20,18 +24,31 @@ import os
 
 
 
-file_path = r'../content-verification/case.txt'
-reference_path = r'../content-verification/references'
-
-
-
 from ...schema.schemas import (
     CaseCreateSchema, 
     EvidenceSubmissionSchema, 
-    LawyerType,
-    CaseStatus
+    CaseStatus,
+    CaseMode,
+    LawyerType
 )
-from ...db.redis_db import redis_client
+from ...schema.models import Case, Evidence, now
+from ...db.codec import case_from_dict
+from ...db.case_cache import case_cache
+from ...db.storage import store
+from ...db.evidence_store import evidence_store
+from ...search.index import search_index
+from ...human_ai.report_files import (
+    file_etag,
+    http_date,
+    is_stale,
+    iter_file,
+    not_modified,
+    parse_range,
+    write_rendered_version,
+)
+from ...human_ai.report_text import case_sections, pdf_path, write_sections
+from ...config import settings
+from .changes import case_change, change_feed, publish_changes, sse_event
 
 router = APIRouter()
 
@@ -52,8 +69,10 @@ def generate_case_pdf(case: dict) -> str:
     # Generate unique filename
     pdf_filename = f'case_reports/case_{case["case_id"]}.pdf'
     
-    # Create PDF document
-    doc = SimpleDocTemplate(pdf_filename, pagesize=letter)
+    # Create PDF document, rendered beside the report and swapped in so
+    # downloads in progress keep reading the previous version whole
+    rendering_filename = f'case_reports/rendering_{case["case_id"]}_{uuid.uuid4().hex}.pdf'
+    doc = SimpleDocTemplate(rendering_filename, pagesize=letter)
     styles = getSampleStyleSheet()
     
     # Custom style for wrapping text
@@ -243,65 +262,331 @@ def generate_case_pdf(case: dict) -> str:
         story.append(lawyer2_evidence_table)
 
     # Build PDF
-    doc.build(story)
+    try:
+        doc.build(story)
+        os.replace(rendering_filename, pdf_filename)
+    finally:
+        if os.path.exists(rendering_filename):
+            os.remove(rendering_filename)
+
+    # Keep the text alongside, so the case index never parses the PDF
+    write_sections(case["case_id"], case_sections(case))
+    write_rendered_version(case["case_id"], case.get("version") or 0)
     
     return pdf_filename
 
+def update_search_index(index_fn, *args):
+    """Keep the search index in step with case writes without failing the write"""
+    try:
+        index_fn(*args)
+    except Exception as e:
+        print(f"Error updating search index: {e}")
+
+@router.get("/search")
+async def search_cases(
+    q: str = Query(..., min_length=1),
+    mode: str = Query("hybrid", pattern="^(hybrid|keyword|semantic)$"),
+    case_id: Optional[str] = None,
+    kind: Optional[str] = Query(None, pattern="^(case|evidence)$"),
+    lawyer_address: Optional[str] = None,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(10, ge=1, le=100),
+):
+    """Searches case descriptions and evidence across all cases"""
+    # Embedding the query is CPU-bound, so it runs off the event loop
+    return await asyncio.to_thread(
+        search_index.search,
+        q,
+        mode=mode,
+        case_id=case_id,
+        kind=kind,
+        lawyer_address=lawyer_address,
+        offset=offset,
+        limit=limit,
+    )
+
+@router.get("/changes")
+async def case_changes(
+    request: Request,
+    case_id: List[str] = Query([]),
+    lawyer_address: List[str] = Query([]),
+):
+    """
+    Server-sent events with a delta for every write to the given cases, or
+    to cases of the given lawyer addresses (every case if neither is given)
+    """
+    subscription = change_feed.subscribe(case_id, lawyer_address)
+
+    async def events():
+        try:
+            while True:
+                try:
+                    change = await asyncio.wait_for(
+                        subscription.queue.get(), settings.change_feed_heartbeat_seconds
+                    )
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield b": keep-alive\n\n"
+                    continue
+                yield sse_event(change)
+        finally:
+            change_feed.unsubscribe(subscription)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+EXPORT_BATCH_SIZE = 500
+IMPORT_BATCH_SIZE = 500
+MAX_IMPORT_ERRORS = 100
+
+def render_pending_cases():
+    """Generate PDFs and search entries for imported cases, in batches"""
+    while True:
+        case_ids = store.pop_pending_render(IMPORT_BATCH_SIZE)
+        if not case_ids:
+            break
+        for case in store.get_cases(case_ids):
+            case_view = case.to_dict()
+            try:
+                generate_case_pdf(case_view)
+            except Exception as e:
+                print(f"Error rendering PDF for case {case.case_id}: {e}")
+            update_search_index(search_index.index_case, case_view)
+
+IMPORT_REQUIRED_FIELDS = ("title", "created_at", "mode", "case_status", "lawyer1_type", "lawyer1_address")
+
+def validate_imported_case(case: Case):
+    """Raise ValueError for an imported case that cannot be stored or served"""
+    missing = [name for name in IMPORT_REQUIRED_FIELDS if getattr(case, name) in (None, "")]
+    if missing:
+        raise ValueError(f"missing required fields: {', '.join(missing)}")
+    if case.mode not in {mode.value for mode in CaseMode}:
+        raise ValueError(f"invalid mode: {case.mode!r}")
+    for name in ("lawyer1_type", "lawyer2_type"):
+        value = getattr(case, name)
+        if value is not None and value not in {lawyer.value for lawyer in LawyerType}:
+            raise ValueError(f"invalid {name}: {value!r}")
+    if case.updated_at is None:
+        case.updated_at = case.created_at
+
+def store_imported_cases(cases: List[Case]):
+    store.create_cases(cases)
+    # PDF rendering and indexing are deferred to render_pending_cases
+    store.add_pending_render([case.case_id for case in cases])
+    publish_changes(*[case_change("created", case.to_dict()) for case in cases])
+
+@router.get("/export")
+async def export_cases(batch_size: int = Query(EXPORT_BATCH_SIZE, ge=1, le=5000)):
+    """Streams every case as NDJSON, reading Redis one batch at a time"""
+    def generate():
+        for cases in store.iter_case_batches(batch_size):
+            yield b"".join(orjson.dumps(case.to_dict()) + b"\n" for case in cases)
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+@router.post("/import")
+async def import_cases(request: Request, background_tasks: BackgroundTasks):
+    """
+    Imports cases from an NDJSON request body (one case per line, as produced
+    by /cases/export). Cases are written in pipelined batches; PDF rendering
+    and search indexing run in the background afterwards.
+    """
+    imported, failed, errors = 0, 0, []
+    batch: List[Case] = []
+    batch_lines: List[int] = []
+    buffer = b""
+    line_number = 0
+
+    def report(error: dict):
+        if len(errors) < MAX_IMPORT_ERRORS:
+            errors.append(error)
+
+    def parse(line: bytes):
+        nonlocal failed
+        try:
+            data = orjson.loads(line)
+            if not data.get("case_id"):
+                data["case_id"] = str(uuid.uuid4())
+            case = case_from_dict(data)
+            validate_imported_case(case)
+            batch.append(case)
+            batch_lines.append(line_number)
+        except Exception as e:
+            failed += 1
+            report({"line": line_number, "error": str(e)})
+
+    async def flush():
+        # A batch is written (or fails) as a whole; a failed batch reports its
+        # line range so the caller knows which lines were not stored
+        nonlocal imported, failed, batch, batch_lines
+        if batch:
+            try:
+                await asyncio.to_thread(store_imported_cases, batch)
+                imported += len(batch)
+            except Exception as e:
+                print(f"Error storing imported cases: {e}")
+                failed += len(batch)
+                report({"lines": [batch_lines[0], batch_lines[-1]], "error": f"batch failed: {e}"})
+            batch, batch_lines = [], []
+
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line_number += 1
+            if line.strip():
+                parse(line)
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                await flush()
+    if buffer.strip():
+        line_number += 1
+        parse(buffer)
+    await flush()
+
+    if imported:
+        background_tasks.add_task(render_pending_cases)
+
+    return {"imported": imported, "failed": failed, "errors": errors}
+
+def version_headers(version: int) -> dict:
+    # Clients revalidate with If-None-Match instead of trusting a stale copy
+    return {"ETag": f'"{version}"', "Cache-Control": "no-cache"}
+
+def etag_matches(request: Request, version: int) -> bool:
+    """Whether the request's If-None-Match covers this version"""
+    header = request.headers.get("if-none-match")
+    if not header or not version:
+        return False
+    tags = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return "*" in tags or f'"{version}"' in tags
+
+def versioned_response(request: Request, version: int, body: bytes) -> Response:
+    """The JSON body with its version as ETag, or 304 if the client already has it"""
+    if not version:
+        return Response(body, media_type="application/json")
+    if etag_matches(request, version):
+        return Response(status_code=304, headers=version_headers(version))
+    return Response(body, media_type="application/json", headers=version_headers(version))
+
 @router.get("/{case_id}")
-async def get_case(case_id: str):
-    """Retrieves full case details"""
-    case = redis_client.get_case(case_id)
-    if not case:
+async def get_case(case_id: str, request: Request):
+    """Retrieves full case details; honours If-None-Match with the case version"""
+    version = case_cache.case_version(case_id)
+    if etag_matches(request, version):
+        return Response(status_code=304, headers=version_headers(version))
+    cached = case_cache.get_case(case_id, version)
+    if cached is None:
         raise HTTPException(status_code=404, detail="Case not found")
-    return case
+    return versioned_response(request, *cached)
 
 @router.get("/")
-async def list_cases():
-    """Lists all cases"""
-    return redis_client.list_cases()
+async def list_cases(request: Request, created_after: Optional[float] = None, created_before: Optional[float] = None):
+    """Lists all cases, optionally only those created within an epoch time range"""
+    version = case_cache.list_version()
+    if etag_matches(request, version):
+        return Response(status_code=304, headers=version_headers(version))
+    return versioned_response(request, *case_cache.list_cases(created_after, created_before, version))
+
+# Serializes on-demand renders of the same report within this worker. A lock
+# lives as long as some request holds it, so every waiter shares the same one
+report_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+@router.get("/{case_id}/report")
+async def get_case_report(case_id: str, request: Request):
+    """
+    Streams the case report PDF, rendering it first if the case has changed
+    since. Supports single byte ranges, ETag and Last-Modified.
+    """
+    case = store.get_case(case_id)
+    if not case:
+        raise HTTPException(status_code=404, detail="Case not found")
+
+    if is_stale(case_id, case.version, case.updated_at):
+        lock = report_locks.get(case_id)
+        if lock is None:
+            lock = report_locks[case_id] = asyncio.Lock()
+        async with lock:
+            if is_stale(case_id, case.version, case.updated_at):
+                await asyncio.to_thread(generate_case_pdf, case.to_dict())
+
+    # Everything below describes the version of the file that was opened
+    try:
+        f = open(pdf_path(case_id), "rb")
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Report not found")
+    stat = os.fstat(f.fileno())
+    headers = {
+        "ETag": file_etag(stat),
+        "Last-Modified": http_date(stat.st_mtime),
+        "Accept-Ranges": "bytes",
+        "Cache-Control": "no-cache",
+    }
+    if not_modified(request.headers.get("if-none-match"), request.headers.get("if-modified-since"),
+                    headers["ETag"], stat.st_mtime):
+        f.close()
+        return Response(status_code=304, headers=headers)
+
+    byte_range = None
+    if_range = request.headers.get("if-range")
+    if not if_range or if_range in (headers["ETag"], headers["Last-Modified"]):
+        try:
+            byte_range = parse_range(request.headers.get("range"), stat.st_size)
+        except ValueError:
+            f.close()
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{stat.st_size}"})
+
+    headers["Content-Disposition"] = f'inline; filename="case_{case_id}.pdf"'
+    if byte_range is None:
+        headers["Content-Length"] = str(stat.st_size)
+        return StreamingResponse(iter_file(f, 0, stat.st_size - 1), media_type="application/pdf", headers=headers)
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{stat.st_size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(
+        iter_file(f, start, end), status_code=206, media_type="application/pdf", headers=headers
+    )
 
 @router.post("/create")
 async def create_case(case_data: CaseCreateSchema):
     """Creates a new case with initial evidence"""
     try:
-        os.makedirs('content-verification', exist_ok=True)
-        file_path = os.path.join('content-verification', 'case.txt')
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(case_data.description)
-        
-        for file in case_data.files:
-            os.makedirs('content-verification/references', exist_ok=True)
-            reference_file_path = os.path.join('content-verification/references', f"{file.original_name.split('.')[0]}.txt")
-            with open(reference_file_path, 'w', encoding='utf-8') as f:
-                f.write(file.description)
-
         case_id = str(uuid.uuid4())
-        case_obj = {
-            "case_id": case_id,
-            "title": case_data.title,
-            "description": case_data.description,
-            "lawyer1_type": case_data.lawyer1_type,
-            "lawyer1_address": case_data.lawyer1_address,
-            "lawyer1_evidences": [
-                {
-                    "ipfs_hash": file.ipfs_hash,
-                    "description": file.description,
-                    "original_name": file.original_name,
-                    "submitted_at": datetime.now().strftime("%d-%m-%Y %H:%M:%S")
-                } for file in case_data.files
+        created_at = now()
+        case_obj = Case(
+            case_id=case_id,
+            title=case_data.title,
+            description=case_data.description,
+            lawyer1_type=case_data.lawyer1_type.value,
+            lawyer1_address=case_data.lawyer1_address,
+            lawyer1_evidences=[
+                Evidence(
+                    ipfs_hash=file.ipfs_hash,
+                    description=file.description,
+                    original_name=file.original_name,
+                    submitted_at=created_at
+                ) for file in case_data.files
             ],
-            "lawyer2_type": "AI" if case_data.mode == "human-ai" else None,   
-            "lawyer2_address": None,
-            "lawyer2_evidences": [],
-            "case_status": case_data.case_status,
-            "mode": case_data.mode,
-            "created_at": datetime.now().strftime("%d-%m-%Y %H:%M:%S"),
-            "updated_at": datetime.now().strftime("%d-%m-%Y %H:%M:%S")
-        }
+            lawyer2_type="AI" if case_data.mode == "human-ai" else None,
+            case_status=case_data.case_status.value,
+            mode=case_data.mode.value,
+            created_at=created_at,
+            updated_at=created_at
+        )
         
-        saved_case = redis_client.create_case(case_id, case_obj)
+        saved_case = store.create_case(case_id, case_obj).to_dict()
+        publish_changes(case_change("created", saved_case))
+
+        # Verification inputs: the briefing plus each distinct evidence text,
+        # stored once by content key
+        await asyncio.to_thread(evidence_store.write_case, case_id, case_data.description)
+        await asyncio.to_thread(evidence_store.store, case_id, "lawyer1", case_obj.lawyer1_evidences)
         print(saved_case)
-        generate_case_pdf(case_obj)
+        await asyncio.to_thread(generate_case_pdf, saved_case)
+        await asyncio.to_thread(update_search_index, search_index.index_case, saved_case)
         
         return saved_case
         
@@ -314,78 +599,70 @@ async def create_case(case_data: CaseCreateSchema):
 @router.post("/{case_id}/evidence")
 async def submit_evidence(case_id: str, evidence_data: EvidenceSubmissionSchema):
     """Submits additional evidence to an existing case"""
-    case = redis_client.get_case(case_id)
-    if not case:
-        raise HTTPException(status_code=404, detail="Case not found")
-    
-    for file in evidence_data.evidences:
-        os.makedirs('content-verification/references', exist_ok=True)
-        reference_file_path = os.path.join('content-verification/references', f"{file.original_name.split('.')[0]}.txt")
-        with open(reference_file_path, 'w', encoding='utf-8') as f:
-            f.write(file.description)
-
+    submitted_at = now()
     evidence_with_timestamp = [
-        {
-            "ipfs_hash": evidence.ipfs_hash,
-            "description": evidence.description,
-            "original_name": evidence.original_name,
-            "submitted_at": datetime.now().strftime("%d-%m-%Y %H:%M:%S")
-        } for evidence in evidence_data.evidences
+        Evidence(
+            ipfs_hash=evidence.ipfs_hash,
+            description=evidence.description,
+            original_name=evidence.original_name,
+            submitted_at=submitted_at
+        ) for evidence in evidence_data.evidences
     ]
 
-    # Determine if this is a Human-AI case
-    is_human_ai_case = case["lawyer1_type"] == LawyerType.HUMAN and (
-        case["lawyer2_type"] == LawyerType.AI or case["lawyer2_type"] is None
+    # Evidence is routed to lawyer1/lawyer2 and appended atomically in Redis,
+    # so concurrent submissions never overwrite each other
+    lawyer = store.add_evidence(
+        case_id,
+        evidence_data.lawyer_type,
+        evidence_data.lawyer_address,
+        evidence_with_timestamp,
+        submitted_at
     )
+    if lawyer == "not_found":
+        raise HTTPException(status_code=404, detail="Case not found")
+    if lawyer == "forbidden":
+        raise HTTPException(
+            status_code=403,
+            detail="Only registered lawyers can submit evidence"
+        )
 
-    if is_human_ai_case:
-        # For Human-AI cases
-        if evidence_data.lawyer_type == LawyerType.AI:
-            # AI evidence goes to lawyer2
-            case["lawyer2_type"] = LawyerType.AI
-            case["lawyer2_evidences"].extend(evidence_with_timestamp)
-        else:
-            # Human evidence goes to lawyer1
-            case["lawyer1_evidences"].extend(evidence_with_timestamp)
-    else:
-        # For Human-Human cases
-        if evidence_data.lawyer_address == case["lawyer1_address"]:
-            case["lawyer1_evidences"].extend(evidence_with_timestamp)
-        elif not case["lawyer2_address"]:
-            # First submission from lawyer2
-            case["lawyer2_type"] = LawyerType.HUMAN
-            case["lawyer2_address"] = evidence_data.lawyer_address
-            case["lawyer2_evidences"].extend(evidence_with_timestamp)
-        elif evidence_data.lawyer_address == case["lawyer2_address"]:
-            case["lawyer2_evidences"].extend(evidence_with_timestamp)
-        else:
-            raise HTTPException(
-                status_code=403,
-                detail="Only registered lawyers can submit evidence"
-            )
-    
-    case["updated_at"] = datetime.now().strftime("%d-%m-%Y %H:%M:%S")
-    
-    updated_case = redis_client.update_case(case_id, case)
-    generate_case_pdf(case)
-
-
+    # Evidence this side already submitted is not stored or indexed again
+    new_evidence = await asyncio.to_thread(evidence_store.store, case_id, lawyer, evidence_with_timestamp)
 
+    updated_case = store.get_case(case_id).to_dict()
+    publish_changes(case_change("updated", updated_case, {
+        f"{lawyer}_type": updated_case[f"{lawyer}_type"],
+        f"{lawyer}_address": updated_case[f"{lawyer}_address"],
+        f"{lawyer}_evidences": [evidence.to_dict() for evidence in evidence_with_timestamp],
+        "updated_at": updated_case["updated_at"],
+    }))
+    await asyncio.to_thread(generate_case_pdf, updated_case)
+    if new_evidence:
+        await asyncio.to_thread(
+            update_search_index,
+            search_index.index_evidence,
+            updated_case,
+            lawyer,
+            [evidence.to_dict() for evidence in new_evidence]
+        )
 
-    
     return updated_case
 
 @router.patch("/{case_id}/status")
 async def update_case_status(case_id: str, status: dict):
     """Updates the status of a case"""
-    case = redis_client.get_case(case_id)
-    if not case:
+    updated = store.update_case_fields(case_id, {
+        "case_status": status["status"],
+        "updated_at": now()
+    })
+    if not updated:
         raise HTTPException(status_code=404, detail="Case not found")
-    
-    case["case_status"] = status["status"]
-    case["updated_at"] = datetime.now().strftime("%d-%m-%Y %H:%M:%S")
-    
-    updated_case = redis_client.update_case(case_id, case)
-    generate_case_pdf(case)
+
+    updated_case = store.get_case(case_id).to_dict()
+    publish_changes(case_change("updated", updated_case, {
+        "case_status": updated_case["case_status"],
+        "updated_at": updated_case["updated_at"],
+    }))
+    await asyncio.to_thread(generate_case_pdf, updated_case)
     
     return updated_case
\ No newline at end of file
@@ -1,22 +1,66 @@
-from fastapi import APIRouter
-from ...human_ai.hai import Judge, ProcessInputRequest, TurnResponse, ConversationList
+from fastapi import APIRouter, HTTPException, Query
+from typing import Optional
+from ...human_ai.hai import Judge, LawyerContext, ProcessInputRequest, TurnResponse, ConversationList
+from ...db.storage import store
+from ...db.store import valid_turn_id
+from ...human_ai.sessions import sessions
 
 router = APIRouter()
 
-# Create a single judge instance to be used across all routes
-judge = Judge()
+# A single judge instance shared by all routes, created on first use so that
+# importing the router does not pull in the agent stack
+judge: Optional[Judge] = None
+session = None
+# Case of the last evicted judge, resumed by the next request
+evicted_case_id: Optional[str] = None
+
+def release_judge(evicted, reason):
+    global judge, session, evicted_case_id
+    evicted_case_id = evicted.judge.case_id
+    judge = None
+    session = None
+
+def get_judge() -> Judge:
+    global judge, session, evicted_case_id
+    if judge is None:
+        judge = Judge()
+        session = sessions.register("rest", judge, release_judge)
+        if evicted_case_id:
+            saved_state = store.pop_session(evicted_case_id)
+            if saved_state:
+                judge.restore(saved_state)
+            evicted_case_id = None
+    sessions.touch(session)
+    return judge
 
 @router.post("/start-simulation", response_model=TurnResponse)
-async def start_simulation():
+async def start_simulation(case_id: Optional[str] = None):
     """Start a new HAI simulation"""
-    return await judge.start_simulation()
+    return await get_judge().start_simulation(case_id)
 
 @router.post("/process-input", response_model=TurnResponse)
 async def process_input(request: ProcessInputRequest):
     """Process input from either human or AI"""
-    return await judge.process_input(request)
+    return await get_judge().process_input(request)
 
 @router.get("/conversation-history", response_model=ConversationList)
-async def get_conversation_history():
-    """Get the conversation history"""
-    return ConversationList(conversations=judge.conversations) 
\ No newline at end of file
+async def get_conversation_history(
+    case_id: Optional[str] = None,
+    since: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+):
+    """
+    Get the conversation history of a case, `limit` turns after the `since`
+    cursor. Pass the returned `next_cursor` as `since` to poll for new turns.
+    Without a case_id, returns the in-memory tail of the current simulation.
+    """
+    if not case_id:
+        return ConversationList(conversations=list(get_judge().conversations))
+    if since and not valid_turn_id(since):
+        raise HTTPException(status_code=400, detail="Invalid cursor, expected a next_cursor value")
+
+    turns = store.get_turns(case_id, since=since, limit=limit)
+    return ConversationList(
+        conversations=[LawyerContext(**turn) for _, turn in turns],
+        next_cursor=turns[-1][0] if turns else since
+    )
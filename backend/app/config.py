@@ -6,12 +6,58 @@ load_dotenv()
 class Settings(BaseSettings):
     redis_host: str = "localhost"
     redis_port: int = 6379
+    # redis, memory or sqlite; see db/store.py
+    storage_backend: str = "redis"
+    storage_sqlite_path: str = "data/justicechain.sqlite3"
     llm_model_name: str
     galadriel_api_key: str
     galadriel_base_url: str
     openai_api_key: str
     pinata_api_key: str
     pinata_secret_api_key: str
+    search_index_name: str = "idx:evidence"
+    # Local CPU embedding model shared by the case index and search
+    embedding_model: str = "sentence-transformers/all-MiniLM-L6-v2"
+    embedding_batch_size: int = 32
+    embedding_cache_path: str = "model_cache/embeddings.sqlite3"
+    warm_up_models: bool = True
+    # pytorch, pytorch-int8, onnx or onnx-int8, see human_ai/inference.py
+    inference_backend: str = "pytorch"
+    model_cache_dir: str = "model_cache"
+    # Unix socket of the shared inference server (python -m app.human_ai.inference_server);
+    # when empty every worker loads its own models
+    inference_socket: str = ""
+    # /readyz gives up on the inference server after this long
+    inference_status_timeout_seconds: float = 2.0
+    # Courtroom turns a Judge keeps in memory, the full log is in Redis
+    hai_tail_window: int = 20
+    # Courtroom sessions idle this long are persisted and evicted, as are the
+    # least recently active ones while all sessions exceed the memory budget
+    hai_session_idle_seconds: int = 900
+    hai_session_memory_budget_mb: int = 256
+    hai_session_sweep_seconds: int = 30
+    # Chat messages kept in Redis per case; older ones are rolled to disk in
+    # segments of `chat_roll_batch` messages, see db/chat_archive.py
+    chat_hot_messages: int = 500
+    chat_roll_batch: int = 500
+    chat_archive_dir: str = "chat_archive"
+    # Evidence texts stored once by content key, and the per-case inputs
+    # for content verification linked from it
+    evidence_store_dir: str = "evidence_store"
+    verification_cases_dir: str = "content-verification/cases"
+    # Serialized cases and case listings kept per worker, see db/case_cache.py
+    case_cache_size: int = 1024
+    case_list_cache_size: int = 32
+    # Case change feed (GET /cases/changes): keep-alive interval, and how many
+    # undelivered changes a subscriber may hold before it is told to resync
+    change_feed_heartbeat_seconds: int = 15
+    change_feed_queue_size: int = 256
+    # Chat rooms: cached participant sets (also refreshed by the change feed),
+    # and presence entries kept alive by heartbeats from each worker
+    room_auth_ttl_seconds: int = 300
+    room_auth_cache_size: int = 4096
+    room_heartbeat_seconds: int = 10
+    room_presence_ttl_seconds: int = 30
 
     class Config:
         env_file = ".env"
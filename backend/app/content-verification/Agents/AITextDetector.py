@@ -1,12 +1,29 @@
 import os
-from transformers import pipeline
+from functools import lru_cache
+from app.human_ai.chunking import chunk_text, get_tokenizer
+from app.human_ai.inference import CLASSIFIERS, load_text_classifier
 
-def AITextDetection(filepath, chunk_size=512, threshold=0.5):
-    # Load the AI detection model
-    detector = pipeline("text-classification", model="akshayvkt/detect-ai-text")
+@lru_cache(maxsize=None)
+def get_detector():
+    # Use the host-wide inference server when one is running
+    if os.getenv("INFERENCE_SOCKET"):
+        from app.human_ai.inference_client import InferenceClient, RemoteClassifier
+        return RemoteClassifier(InferenceClient(os.environ["INFERENCE_SOCKET"]), "ai_detection")
+
+    # Backend is one of pytorch, pytorch-int8, onnx, onnx-int8
+    task, model_id = CLASSIFIERS["ai_detection"]
+    return load_text_classifier(
+        model_id,
+        task=task,
+        backend=os.getenv("INFERENCE_BACKEND", "pytorch"),
+        cache_dir=os.getenv("MODEL_CACHE_DIR", "model_cache"),
+    )
+
+def AITextDetection(filepath, chunk_size=512, threshold=0.5, output_dir=r'./output'):
+    # Load the AI detection model (once per process)
+    detector = get_detector()
     
     # Check if the output directory exists, if not, create it
-    output_dir = r'./output'
     os.makedirs(output_dir, exist_ok=True)
     
     try:
@@ -16,18 +33,20 @@ def AITextDetection(filepath, chunk_size=512, threshold=0.5):
     except Exception as e:
         return f"Error reading file: {e}"
 
-    # Split the text into chunks
-    chunks = [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
+    # Split the text into sentence-aligned chunks that fit the model
+    # (`chunk_size` characters each if its tokenizer is unavailable)
+    try:
+        tokenizer = get_tokenizer(CLASSIFIERS["ai_detection"][1])
+    except Exception:
+        tokenizer = None
+    chunks = chunk_text(text, max_tokens=512, tokenizer=tokenizer, max_chars=chunk_size) or [text]
     
     ai_generated_count = 0
     human_written_count = 0
     
-    # Process each chunk
-    for chunk in chunks:
-        result = detector(chunk)
-        
-        # Assuming result is in the format [{'label': 'AI', 'score': X}, {'label': 'Human', 'score': Y}]
-        if result[0]['label'] == 'AI':
+    # Process all chunks as one batch, one top-label result per chunk
+    for result in detector(chunks):
+        if result['label'] == 'AI':
             ai_generated_count += 1
         else:
             human_written_count += 1
@@ -4,8 +4,9 @@ from phi.model.openai import OpenAIChat
 from phi.tools.file import FileTools
 from dotenv import load_dotenv
 load_dotenv()
+from app.llm.gateway import llm_gateway, Priority
 
-def FlowAnalysis(filepath):
+def FlowAnalysis(filepath, output_dir=r'./output'):
     # Initialize the Analyzer agent with specified model and tools
     Analyzer = Agent(
         name="Analyzer",
@@ -16,7 +17,6 @@ def FlowAnalysis(filepath):
     )
 
     # Check if the output directory exists, if not, create it
-    output_dir = r'./output'
     os.makedirs(output_dir, exist_ok=True)
 
     try:
@@ -29,7 +29,7 @@ def FlowAnalysis(filepath):
         ).format(filepath=filepath)
 
         # Run the Analyzer agent with the analysis prompt
-        run: RunResponse = Analyzer.run(prompt)
+        run: RunResponse = llm_gateway.run(Analyzer, prompt, priority=Priority.BATCH)
         
         # Prepare output content
         analysis_content = run.content
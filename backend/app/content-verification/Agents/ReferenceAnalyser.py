@@ -4,8 +4,9 @@ from phi.model.openai import OpenAIChat
 from phi.tools.file import FileTools
 from dotenv import load_dotenv
 load_dotenv()
+from app.llm.gateway import llm_gateway, Priority
 
-def ReferenceAnalysis(filepath, references_dir):
+def ReferenceAnalysis(filepath, references_dir, output_dir=r'./output'):
     # Initialize the Reference Analyzer agent with specified model and tools
     ReferenceAnalyzer = Agent(
         name="ReferenceAnalyzer",
@@ -16,7 +17,6 @@ def ReferenceAnalysis(filepath, references_dir):
     )
 
     # Check if the output directory exists, if not, create it
-    output_dir = r'./output'
     os.makedirs(output_dir, exist_ok=True)
 
     try:
@@ -45,7 +45,7 @@ def ReferenceAnalysis(filepath, references_dir):
         )
 
         # Run the Reference Analyzer agent with the analysis prompt
-        run: RunResponse = ReferenceAnalyzer.run(prompt)
+        run: RunResponse = llm_gateway.run(ReferenceAnalyzer, prompt, priority=Priority.BATCH)
         
         # Prepare output content
         analysis_report = run.content
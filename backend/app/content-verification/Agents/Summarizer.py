@@ -4,8 +4,9 @@ from phi.model.openai import OpenAIChat
 from phi.tools.file import FileTools
 from dotenv import load_dotenv
 load_dotenv()
+from app.llm.gateway import llm_gateway, Priority
 
-def Summarize(filepath):
+def Summarize(filepath, output_dir=r'./output'):
     # Initialize the Summariser agent with specified model and tools
     Summariser = Agent(
         name="Summariser",
@@ -16,7 +17,6 @@ def Summarize(filepath):
     )
 
     # Check if the output directory exists, if not, create it
-    output_dir = r'./output'
     os.makedirs(output_dir, exist_ok=True)
 
     try:
@@ -29,7 +29,7 @@ def Summarize(filepath):
         ).format(filepath=filepath)
 
         # Run the Summariser agent with the refined prompt
-        run: RunResponse = Summariser.run(prompt)
+        run: RunResponse = llm_gateway.run(Summariser, prompt, priority=Priority.BATCH)
         
         # Prepare output content
         summary_content = run.content
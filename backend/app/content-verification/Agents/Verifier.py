@@ -3,8 +3,9 @@ from phi.agent import Agent, RunResponse
 from phi.model.openai import OpenAIChat
 from dotenv import load_dotenv
 load_dotenv()
+from app.llm.gateway import llm_gateway, Priority
 
-def Verify(output_dir=r'./output'):
+def Verify(output_dir=r'./output', verified_dir=r'./verified'):
     # Initialize the Verifier agent with specified model and tools
     Verifier = Agent(
         name="Verifier",
@@ -15,7 +16,6 @@ def Verify(output_dir=r'./output'):
     )
 
     # Create a directory for verified reports if it doesn't exist
-    verified_dir = r'./verified'
     os.makedirs(verified_dir, exist_ok=True)
 
     try:
@@ -40,7 +40,7 @@ def Verify(output_dir=r'./output'):
                 ).format(content=content)
 
                 # Run the Verifier agent with the prompt
-                run: RunResponse = Verifier.run(prompt)
+                run: RunResponse = llm_gateway.run(Verifier, prompt, priority=Priority.BATCH)
                 
                 # Prepare report line with filename and recommendation
                 recommendation = run.content.strip()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Make the backend `app` package importable when run from content-verification/
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
@@ -0,0 +1,228 @@
+"""
+Verify many cases in parallel.
+
+    python batch.py cases/ --workers 4
+    python batch.py --case-ids <id> <id> --workers 4
+    python batch.py cases/ --run-dir batch_runs/nightly   # resume a run
+
+A case directory is any directory under the given tree holding a `case.txt`,
+with its evidence in an optional `references/` next to it (the API keeps one
+per case under `content-verification/cases/`). Case ids are read from Redis
+and written out as case directories first.
+
+Each case's reports go to `{run_dir}/cases/{case}/output` and `verified`.
+Finished cases are appended to `{run_dir}/checkpoint.jsonl` with a hash of
+their inputs, so a rerun with the same run directory skips cases whose
+content has not changed (failed cases are retried). When the run ends every
+case result is written to `{run_dir}/results.json`.
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+STEP_ERRORS = ("Error", "An error occurred")
+# Directories inside a case tree that never hold cases
+SKIP_DIRS = {"references", "output", "verified", "batch_runs", "__pycache__"}
+RATE_LIMIT_VARS = ("LLM_REQUESTS_PER_MINUTE", "LLM_TOKENS_PER_MINUTE")
+DEFAULT_RATE_LIMITS = {"LLM_REQUESTS_PER_MINUTE": 500, "LLM_TOKENS_PER_MINUTE": 30000}
+
+
+def find_case_dirs(root):
+    """(case name, case directory) for every case.txt under root"""
+    cases = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if d not in SKIP_DIRS)
+        if "case.txt" in filenames:
+            name = os.path.relpath(dirpath, root).replace(os.sep, "/")
+            cases.append((name if name != "." else os.path.basename(os.path.abspath(root)), dirpath))
+    return cases
+
+
+def case_fingerprint(case_dir):
+    """Hash of a case's briefing and references, independent of file order"""
+    digest = hashlib.sha256()
+    with open(os.path.join(case_dir, "case.txt"), "rb") as f:
+        digest.update(hashlib.sha256(f.read()).digest())
+    references_dir = os.path.join(case_dir, "references")
+    if os.path.isdir(references_dir):
+        references = []
+        for name in os.listdir(references_dir):
+            with open(os.path.join(references_dir, name), "rb") as f:
+                references.append(hashlib.sha256(f.read()).digest())
+        for reference in sorted(references):
+            digest.update(reference)
+    return digest.hexdigest()
+
+
+def export_cases(case_ids, dest):
+    """Write each stored case out as a case directory, returns (case id, directory)"""
+    import Agents  # noqa: F401  puts the backend on sys.path
+    from app.db.evidence_store import evidence_content_key
+    from app.db.storage import store
+
+    # get_cases skips missing ids, so match the results back by id
+    found = {case.case_id: case for case in store.get_cases(case_ids)}
+    cases = []
+    for case_id in case_ids:
+        case = found.get(case_id)
+        if case is None:
+            print(f"Case {case_id} not found, skipping", file=sys.stderr)
+            continue
+        case_dir = os.path.join(dest, case_id)
+        references_dir = os.path.join(case_dir, "references")
+        os.makedirs(references_dir, exist_ok=True)
+        with open(os.path.join(case_dir, "case.txt"), "w", encoding="utf-8") as f:
+            f.write(case.description)
+        for evidence in case.lawyer1_evidences + case.lawyer2_evidences:
+            # Named by content key like the evidence store, so duplicates collapse
+            path = os.path.join(references_dir, f"{evidence_content_key(evidence)}.txt")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(evidence.description)
+        cases.append((case_id, case_dir))
+    return cases
+
+
+def init_worker(workers):
+    # Every worker gets its own LLM gateway, so split the rate limits between
+    # them. Runs before the Agents (and the gateway) are imported.
+    for var in RATE_LIMIT_VARS:
+        limit = int(os.getenv(var, DEFAULT_RATE_LIMITS[var]))
+        os.environ[var] = str(max(1, limit // workers))
+
+
+def verify_case(name, case_dir, work_dir):
+    """Run every verification agent on one case, in a worker process"""
+    from Agents.AITextDetector import AITextDetection
+    from Agents.FlowAnalyser import FlowAnalysis
+    from Agents.ReferenceAnalyser import ReferenceAnalysis
+    from Agents.Summarizer import Summarize
+    from Agents.Verifier import Verify
+
+    started = time.time()
+    file_path = os.path.join(case_dir, "case.txt")
+    references_dir = os.path.join(case_dir, "references")
+    os.makedirs(references_dir, exist_ok=True)
+    output_dir = os.path.join(work_dir, "output")
+    verified_dir = os.path.join(work_dir, "verified")
+
+    steps = {}
+    for step, run in (
+        ("ai_detection", lambda: AITextDetection(file_path, output_dir=output_dir)),
+        ("flow", lambda: FlowAnalysis(file_path, output_dir=output_dir)),
+        ("summary", lambda: Summarize(file_path, output_dir=output_dir)),
+        ("references", lambda: ReferenceAnalysis(file_path, references_dir, output_dir=output_dir)),
+        ("verification", lambda: Verify(output_dir, verified_dir)),
+    ):
+        try:
+            steps[step] = run()
+        except Exception as e:
+            steps[step] = f"An error occurred: {e}"
+
+    report = None
+    report_path = os.path.join(verified_dir, "Verification_Report.txt")
+    if os.path.exists(report_path):
+        with open(report_path, "r", encoding="utf-8") as f:
+            report = f.read()
+
+    failed = [step for step, message in steps.items() if str(message).startswith(STEP_ERRORS)]
+    return {
+        "case": name,
+        "status": "failed" if failed else "ok",
+        "failed_steps": failed,
+        "steps": steps,
+        "output_dir": output_dir,
+        "report": report,
+        "seconds": round(time.time() - started, 2),
+    }
+
+
+def load_checkpoint(path):
+    results = {}
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    result = json.loads(line)
+                    results[result["case"]] = result
+    return results
+
+
+def run(cases, run_dir, workers):
+    os.makedirs(run_dir, exist_ok=True)
+    checkpoint_path = os.path.join(run_dir, "checkpoint.jsonl")
+    results = load_checkpoint(checkpoint_path)
+    fingerprints = {name: case_fingerprint(case_dir) for name, case_dir in cases}
+    todo = [
+        (name, case_dir) for name, case_dir in cases
+        if results.get(name, {}).get("status") != "ok"
+        or results[name].get("fingerprint") != fingerprints[name]
+    ]
+    print(f"{len(cases)} cases, {len(cases) - len(todo)} already verified, {len(todo)} to run with {workers} workers")
+
+    started = time.time()
+    done = 0
+    with open(checkpoint_path, "a", encoding="utf-8") as checkpoint, \
+            ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(workers,)) as pool:
+        futures = {
+            pool.submit(verify_case, name, case_dir, os.path.join(run_dir, "cases", name)): name
+            for name, case_dir in todo
+        }
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {"case": name, "status": "failed", "error": str(e)}
+            result["fingerprint"] = fingerprints[name]
+            results[name] = result
+            checkpoint.write(json.dumps(result) + "\n")
+            checkpoint.flush()
+
+            done += 1
+            elapsed = time.time() - started
+            print(
+                f"[{done}/{len(todo)}] {name}: {result['status']} "
+                f"({done / elapsed * 60:.1f} cases/min, {elapsed:.0f}s elapsed)"
+            )
+
+    names = [name for name, _ in cases]
+    summary = {
+        "total": len(names),
+        "ok": sum(1 for name in names if results.get(name, {}).get("status") == "ok"),
+        "failed": sum(1 for name in names if results.get(name, {}).get("status") == "failed"),
+        "seconds": round(time.time() - started, 2),
+        "cases": [results[name] for name in names if name in results],
+    }
+    results_path = os.path.join(run_dir, "results.json")
+    with open(results_path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+    print(f"{summary['ok']} ok, {summary['failed']} failed, results written to {results_path}")
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verify many cases in parallel")
+    parser.add_argument("root", nargs="?", help="directory tree of case directories")
+    parser.add_argument("--case-ids", nargs="+", help="verify these stored cases instead")
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1))
+    parser.add_argument("--run-dir", default=os.path.join("batch_runs", time.strftime("%Y%m%d-%H%M%S")))
+    args = parser.parse_args()
+
+    if bool(args.root) == bool(args.case_ids):
+        parser.error("give either a directory or --case-ids")
+
+    if args.case_ids:
+        cases = export_cases(args.case_ids, os.path.join(args.run_dir, "inputs"))
+    else:
+        cases = find_case_dirs(args.root)
+
+    summary = run(cases, args.run_dir, max(1, args.workers))
+    sys.exit(1 if summary["failed"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,8 +4,13 @@ from Agents.ReferenceAnalyser import ReferenceAnalysis
 from Agents.Summarizer import Summarize
 from Agents.Verifier import Verify
 
-file_path = r'./case.txt'
-reference_path = r'./references'
+import os
+import sys
+
+# A case directory written by the API (cases/<case_id>), or this directory
+case_dir = sys.argv[1] if len(sys.argv) > 1 else '.'
+file_path = os.path.join(case_dir, 'case.txt')
+reference_path = os.path.join(case_dir, 'references')
 
 def Verification(file_path, reference_path):
     print(AITextDetection(file_path))
@@ -1,30 +1,128 @@
+import asyncio
+import time
+import uuid
+import orjson
 from redis.asyncio import Redis
+from redis.exceptions import ResponseError
 import json
-from typing import List
+from typing import AsyncIterator, Iterable, List, Optional, Tuple
 from ..config import settings
+from ..schema.models import Case
+from .chat_archive import chat_archive
+from .codec import case_from_parts, case_from_dict
+from .layout import CASE_CHANGES_CHANNEL, RELEASE_LOCK_SCRIPT, queue_case_reads
+from .store import RESYNC, AsyncStore
 
-class AsyncRedisClient:
+
+def presence_key(case_id: str) -> str:
+    return f"room:{case_id}:presence"
+
+
+class AsyncRedisClient(AsyncStore):
     def __init__(self):
         self.redis = Redis(
             host=settings.redis_host,
             port=settings.redis_port,
             decode_responses=True
         )
+        self._release_lock = self.redis.register_script(RELEASE_LOCK_SCRIPT)
 
     async def append_chat_message(self, case_id: str, message: dict):
         """Append a chat message to the case's chat history"""
         key = f"chat:{case_id}"
-        await self.redis.rpush(key, json.dumps(message))
+        length = await self.redis.rpush(key, json.dumps(message))
+        if length > settings.chat_hot_messages + settings.chat_roll_batch:
+            try:
+                await self.roll_chat_messages(case_id)
+            except Exception as e:
+                print(f"Error archiving chat for case {case_id}: {e}")
+
+    async def roll_chat_messages(self, case_id: str):
+        """
+        Move everything but the newest `chat_hot_messages` messages into an
+        on-disk segment. The segment is written before the list is trimmed,
+        and `chat:{id}:archived` (how many messages live on disk) moves in
+        the same transaction as the trim, so readers never see a gap.
+        """
+        key = f"chat:{case_id}"
+        archived_key = f"chat:{case_id}:archived"
+        lock_key = f"chat:{case_id}:roll_lock"
+        token = uuid.uuid4().hex
+        if not await self.redis.set(lock_key, token, nx=True, ex=60):
+            return
+        try:
+            count = await self.redis.llen(key) - settings.chat_hot_messages
+            if count <= 0:
+                return
+            messages = await self.redis.lrange(key, 0, count - 1)
+            start = int(await self.redis.get(archived_key) or 0)
+            await asyncio.to_thread(chat_archive.write_segment, case_id, start, messages)
+
+            pipe = self.redis.pipeline(transaction=True)
+            pipe.ltrim(key, len(messages), -1)
+            pipe.incrby(archived_key, len(messages))
+            await pipe.execute()
+        finally:
+            # Only our own lock: if the roll outlived the TTL, another worker may hold it now
+            await self._release_lock(keys=[lock_key], args=[token])
 
-    async def get_chat_messages(self, case_id: str) -> List[dict]:
-        """Get all chat messages for a case"""
+    async def get_chat_messages(self, case_id: str, start: int = 0) -> List[dict]:
+        """Get chat messages for a case from position `start`, across Redis and the archive"""
         key = f"chat:{case_id}"
-        messages = await self.redis.lrange(key, 0, -1)
-        return [json.loads(msg) for msg in messages]
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.get(f"chat:{case_id}:archived")
+        pipe.lrange(key, 0, -1)
+        archived, hot = await pipe.execute()
+        archived = int(archived or 0)
 
-    async def get_case(self, case_id: str):
+        messages = []
+        if start < archived:
+            messages = await asyncio.to_thread(chat_archive.read, case_id, start, archived)
+        messages.extend(json.loads(msg) for msg in hot[max(start - archived, 0):])
+        return messages
+
+    async def get_case(self, case_id: str) -> Optional[Case]:
         """Get case details"""
-        data = await self.redis.get(f"case:{case_id}")
-        return json.loads(data) if data else None
+        pipe = self.redis.pipeline(transaction=False)
+        queue_case_reads(pipe, case_id)
+        try:
+            fields, lawyer1, lawyer2 = await pipe.execute()
+        except ResponseError:
+            # Legacy JSON string layout, not yet migrated
+            data = await self.redis.get(f"case:{case_id}")
+            return case_from_dict(json.loads(data)) if data else None
+        return case_from_parts(fields, lawyer1, lawyer2)
+
+    async def touch_presence(self, members: Iterable[Tuple[str, str]], ttl: float):
+        now = time.time()
+        pipe = self.redis.pipeline(transaction=False)
+        rooms = set()
+        for case_id, member in members:
+            pipe.zadd(presence_key(case_id), {member: now + ttl})
+            rooms.add(case_id)
+        for case_id in rooms:
+            pipe.zremrangebyscore(presence_key(case_id), "-inf", now)
+            pipe.expire(presence_key(case_id), max(int(ttl * 2), 1))
+        if rooms:
+            await pipe.execute()
+
+    async def remove_presence(self, case_id: str, member: str):
+        await self.redis.zrem(presence_key(case_id), member)
+
+    async def get_presence(self, case_id: str) -> List[str]:
+        return await self.redis.zrangebyscore(presence_key(case_id), time.time(), "+inf")
+
+    async def case_changes(self) -> AsyncIterator[dict]:
+        pubsub = self.redis.pubsub()
+        try:
+            await pubsub.subscribe(CASE_CHANGES_CHANNEL)
+            async for message in pubsub.listen():
+                if message["type"] == "message":
+                    yield orjson.loads(message["data"])
+                elif message["type"] == "subscribe":
+                    # Live from here on; anything published earlier was missed
+                    yield RESYNC
+        finally:
+            await pubsub.reset()
 
-async_redis_client = AsyncRedisClient() 
\ No newline at end of file
+async_redis_client = AsyncRedisClient() 
@@ -0,0 +1,104 @@
+"""
+Read-through cache of serialized case views, invalidated by version.
+
+Every write to a case increments its `version` field and the `cases:version`
+counter (see layout.py). A cached case or case list is served after a single
+HGET/GET confirms its version is unchanged; otherwise the case is read and
+serialized again. The versions are also the ETags of `GET /cases/{id}` and
+`GET /cases/`. Cases that have never been versioned (written before
+versioning and not migrated since) are not cached.
+"""
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import orjson
+
+from ..config import settings
+from .storage import store
+
+
+class _LRU:
+    def __init__(self, size: int):
+        self.size = size
+        self.items: "OrderedDict[object, Tuple[int, bytes]]" = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, version: int) -> Optional[bytes]:
+        with self.lock:
+            cached = self.items.get(key)
+            if cached is None or cached[0] != version:
+                return None
+            self.items.move_to_end(key)
+            return cached[1]
+
+    def put(self, key, version: int, body: bytes):
+        with self.lock:
+            self.items[key] = (version, body)
+            self.items.move_to_end(key)
+            while len(self.items) > self.size:
+                self.items.popitem(last=False)
+
+
+class CaseCache:
+    def __init__(self, client, size: int, list_size: int):
+        self.client = client
+        self.cases = _LRU(size)
+        self.lists = _LRU(list_size)
+        self.hits = 0
+        self.misses = 0
+
+    def case_version(self, case_id: str) -> Optional[int]:
+        return self.client.get_case_version(case_id)
+
+    def list_version(self) -> int:
+        return self.client.get_cases_version()
+
+    def get_case(self, case_id: str, version: Optional[int] = None) -> Optional[Tuple[int, bytes]]:
+        """(version, JSON body) of a case, None if it does not exist"""
+        if version is None:
+            version = self.case_version(case_id)
+        if version is not None:
+            body = self.cases.get(case_id, version)
+            if body is not None:
+                self.hits += 1
+                return version, body
+
+        self.misses += 1
+        case = self.client.get_case(case_id)
+        if case is None:
+            return None
+        # The case's own version was read with its data, so it labels it exactly
+        body = orjson.dumps(case.to_dict())
+        if case.version:
+            self.cases.put(case_id, case.version, body)
+        return case.version, body
+
+    def list_cases(self, created_after: Optional[float] = None, created_before: Optional[float] = None,
+                   version: Optional[int] = None) -> Tuple[int, bytes]:
+        """(version, JSON body) of a case listing"""
+        if version is None:
+            version = self.list_version()
+        key = (created_after, created_before)
+        body = self.lists.get(key, version)
+        if body is not None:
+            self.hits += 1
+            return version, body
+
+        # Read after the version, so the listing is never older than its label
+        self.misses += 1
+        cases = self.client.list_cases(created_after=created_after, created_before=created_before)
+        body = orjson.dumps([case.to_dict() for case in cases])
+        self.lists.put(key, version, body)
+        return version, body
+
+    def stats(self) -> dict:
+        return {
+            "cases": len(self.cases.items),
+            "lists": len(self.lists.items),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+case_cache = CaseCache(store, settings.case_cache_size, settings.case_list_cache_size)
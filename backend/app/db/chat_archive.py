@@ -0,0 +1,95 @@
+"""
+Cold tier for chat history.
+
+Older chat messages are rolled out of the `chat:{case_id}` Redis list into
+gzip-compressed, append-only segment files on local disk:
+
+    {root}/{case_id}/seg-{start:012d}.jsonl.gz   one JSON message per line
+    {root}/{case_id}/index.jsonl                 one line per segment
+
+`start` is the position of the segment's first message in the case's whole
+chat history. A segment is only rewritten when a roll is retried before
+Redis was trimmed, and its index entry is replaced along with it.
+"""
+import gzip
+import json
+import os
+import threading
+from typing import List
+
+from ..config import settings
+
+
+class ChatArchive:
+    def __init__(self, root: str):
+        self.root = root
+        self._lock = threading.Lock()
+
+    def _dir(self, case_id: str) -> str:
+        return os.path.join(self.root, case_id)
+
+    def read_index(self, case_id: str) -> List[dict]:
+        path = os.path.join(self._dir(case_id), "index.jsonl")
+        if not os.path.exists(path):
+            return []
+        with open(path, "r", encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def write_segment(self, case_id: str, start: int, messages: List[str]) -> dict:
+        """
+        Store already JSON-encoded messages as the segment starting at `start`.
+        Retrying the same segment (e.g. after a crash before Redis was
+        trimmed) rewrites the file and replaces its index entry, whose
+        `count` must match the file for read() to filter ranges correctly.
+        """
+        directory = self._dir(case_id)
+        os.makedirs(directory, exist_ok=True)
+        filename = f"seg-{start:012d}.jsonl.gz"
+        path = os.path.join(directory, filename)
+
+        tmp_path = path + ".tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            for message in messages:
+                f.write(message)
+                f.write("\n")
+        os.replace(tmp_path, path)
+
+        entry = {
+            "file": filename,
+            "start": start,
+            "count": len(messages),
+            "bytes": os.path.getsize(path),
+        }
+        index_path = os.path.join(directory, "index.jsonl")
+        with self._lock:
+            entries = self.read_index(case_id)
+            if not any(e["start"] == start for e in entries):
+                with open(index_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(entry) + "\n")
+                    f.flush()
+                    os.fsync(f.fileno())
+            else:
+                entries = [entry if e["start"] == start else e for e in entries]
+                tmp_index = index_path + ".tmp"
+                with open(tmp_index, "w", encoding="utf-8") as f:
+                    f.writelines(json.dumps(e) + "\n" for e in entries)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_index, index_path)
+        return entry
+
+    def read(self, case_id: str, start: int, end: int) -> List[dict]:
+        """Archived messages with history positions in [start, end)"""
+        messages = []
+        for entry in self.read_index(case_id):
+            seg_start, seg_end = entry["start"], entry["start"] + entry["count"]
+            if seg_end <= start or seg_start >= end:
+                continue
+            with gzip.open(os.path.join(self._dir(case_id), entry["file"]), "rt", encoding="utf-8") as f:
+                for position, line in enumerate(f, seg_start):
+                    if start <= position < end:
+                        messages.append(json.loads(line))
+        return messages
+
+
+chat_archive = ChatArchive(settings.chat_archive_dir)
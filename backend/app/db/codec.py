@@ -0,0 +1,122 @@
+"""
+Serialization of typed cases to and from their Redis representation.
+
+Evidence items are stored as compact orjson arrays
+`[ipfs_hash, description, original_name, submitted_at]` and timestamps as
+epoch seconds. Values written by older versions (JSON objects and
+"%d-%m-%Y %H:%M:%S" strings) are still decoded.
+"""
+from datetime import datetime
+from enum import Enum
+from typing import List, Optional, Union
+
+import orjson
+
+from ..schema.models import Case, Evidence
+
+LEGACY_TIME_FORMAT = "%d-%m-%Y %H:%M:%S"
+
+CASE_FIELDS = (
+    "case_id",
+    "title",
+    "description",
+    "lawyer1_type",
+    "lawyer1_address",
+    "lawyer2_type",
+    "lawyer2_address",
+    "case_status",
+    "mode",
+    "created_at",
+    "updated_at",
+)
+TIMESTAMP_FIELDS = ("created_at", "updated_at")
+
+
+def parse_timestamp(value) -> Optional[float]:
+    """Epoch seconds from an epoch number/string, ISO 8601 or a legacy formatted string"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        # ISO 8601, as rendered by Case.to_dict() (e.g. in exports)
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        # Legacy timestamps were written with datetime.now(), i.e. local time
+        return datetime.strptime(value, LEGACY_TIME_FORMAT).timestamp()
+
+
+def encode_value(value) -> str:
+    if isinstance(value, Enum):
+        return str(value.value)
+    return str(value)
+
+
+def encode_evidence(evidence: Evidence) -> bytes:
+    return orjson.dumps([
+        evidence.ipfs_hash,
+        evidence.description,
+        evidence.original_name,
+        evidence.submitted_at,
+    ])
+
+
+def evidence_from_dict(data: dict) -> Evidence:
+    return Evidence(
+        ipfs_hash=data["ipfs_hash"],
+        description=data["description"],
+        original_name=data["original_name"],
+        submitted_at=parse_timestamp(data.get("submitted_at")),
+    )
+
+
+def decode_evidence(data: Union[str, bytes]) -> Evidence:
+    item = orjson.loads(data)
+    if isinstance(item, list):
+        return Evidence(*item)
+    return evidence_from_dict(item)
+
+
+def case_to_hash(case: Case) -> dict:
+    """Scalar fields of a case as a Redis hash mapping, dropping None values"""
+    mapping = {}
+    for name in CASE_FIELDS:
+        value = getattr(case, name)
+        if value is not None:
+            mapping[name] = encode_value(value)
+    return mapping
+
+
+def case_from_parts(fields: dict, lawyer1_evidences: List[str],
+                    lawyer2_evidences: List[str]) -> Optional[Case]:
+    """Assemble a case from its hash and evidence lists"""
+    if not fields:
+        return None
+    values = {name: fields.get(name) for name in CASE_FIELDS}
+    for name in TIMESTAMP_FIELDS:
+        values[name] = parse_timestamp(values[name])
+    return Case(
+        **values,
+        lawyer1_evidences=[decode_evidence(e) for e in lawyer1_evidences],
+        lawyer2_evidences=[decode_evidence(e) for e in lawyer2_evidences],
+        version=int(fields.get("version") or 0),
+    )
+
+
+def case_from_dict(data: dict) -> Case:
+    """Build a case from a plain dict, e.g. a legacy JSON blob or an API view"""
+    values = {name: data.get(name) for name in CASE_FIELDS}
+    for name in TIMESTAMP_FIELDS:
+        values[name] = parse_timestamp(values[name])
+    for name in ("lawyer1_type", "lawyer2_type", "case_status", "mode"):
+        if isinstance(values[name], Enum):
+            values[name] = values[name].value
+    return Case(
+        **values,
+        lawyer1_evidences=[evidence_from_dict(e) for e in data.get("lawyer1_evidences") or []],
+        lawyer2_evidences=[evidence_from_dict(e) for e in data.get("lawyer2_evidences") or []],
+    )
@@ -0,0 +1,119 @@
+"""
+Content-addressed evidence store.
+
+Each distinct piece of evidence is kept once, under its IPFS hash or, when it
+has none, the sha256 of its description:
+
+    {root}/{key[-2:]}/{key}.txt   the evidence text, written once
+    evidence:{key}                HASH  original_name, content_hash, first_seen
+    evidence:{key}:links          SET   "{case_id}:{lawyer}" it was submitted to
+
+(the metadata and links as kept by the Redis backend, see Store.link_evidence).
+
+A case's content-verification inputs live in `{cases_dir}/{case_id}/`: its
+`case.txt` briefing and `references/{key}.txt`, hard links to the stored
+texts. Names never collide and identical evidence is written only once.
+"""
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+from typing import Iterable, List
+
+from ..config import settings
+from ..schema.models import Evidence, now
+from .storage import store
+from .store import Store
+
+SAFE_KEY = re.compile(r"^[A-Za-z0-9]{8,128}$")
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+
+def evidence_content_key(evidence: Evidence) -> str:
+    """IPFS hash when it is usable as a file name, else the content hash"""
+    if evidence.ipfs_hash and SAFE_KEY.match(evidence.ipfs_hash):
+        return evidence.ipfs_hash
+    return "sha256-" + content_hash(evidence.description)
+
+
+def _write_once(path: str, text: str) -> bool:
+    """Atomically create `path` with `text` unless it exists, returns whether it was written"""
+    if os.path.exists(path):
+        return False
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(text or "")
+    os.replace(tmp_path, path)
+    return True
+
+
+def _link(src: str, dest: str):
+    if os.path.exists(dest):
+        return
+    try:
+        os.link(src, dest)
+    except OSError:
+        # Different filesystem or no hard link support
+        shutil.copyfile(src, dest)
+
+
+class EvidenceStore:
+    def __init__(self, backend: Store, root: str, cases_dir: str):
+        self.backend = backend
+        self.root = root
+        self.cases_dir = cases_dir
+
+    def blob_path(self, key: str) -> str:
+        return os.path.join(self.root, key[-2:], f"{key}.txt")
+
+    def case_dir(self, case_id: str) -> str:
+        return os.path.join(self.cases_dir, case_id)
+
+    def store(self, case_id: str, lawyer: str, evidences: Iterable[Evidence]) -> List[Evidence]:
+        """
+        Store evidence submitted by one side of a case and link it to the
+        case's verification inputs. Returns only the evidence that is new to
+        this case and side, i.e. what still needs indexing.
+        """
+        evidences = list(evidences)
+        keys = [evidence_content_key(e) for e in evidences]
+
+        references_dir = os.path.join(self.case_dir(case_id), "references")
+        os.makedirs(references_dir, exist_ok=True)
+        for key, evidence in zip(keys, evidences):
+            _write_once(self.blob_path(key), evidence.description)
+            _link(self.blob_path(key), os.path.join(references_dir, f"{key}.txt"))
+
+        linked = self.backend.link_evidence(case_id, lawyer, [
+            (key, {
+                "original_name": evidence.original_name,
+                "content_hash": content_hash(evidence.description),
+                "first_seen": evidence.submitted_at or now(),
+            })
+            for key, evidence in zip(keys, evidences)
+        ])
+
+        new, seen = [], set()
+        for key, evidence, is_new in zip(keys, evidences, linked):
+            if is_new and key not in seen:
+                new.append(evidence)
+            seen.add(key)
+        return new
+
+    def write_case(self, case_id: str, description: str):
+        """Write the case briefing next to its references"""
+        path = os.path.join(self.case_dir(case_id), "case.txt")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(description or "")
+
+    def links(self, key: str) -> List[str]:
+        return self.backend.evidence_links(key)
+
+
+evidence_store = EvidenceStore(store, settings.evidence_store_dir, settings.verification_cases_dir)
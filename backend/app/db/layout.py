@@ -0,0 +1,151 @@
+"""
+Redis layout for cases.
+
+case:{id}                     HASH  scalar fields (a missing field means None) and `version`,
+                                    incremented by every write to the case
+case:{id}:lawyer1_evidences   LIST  evidence items encoded by codec.encode_evidence
+case:{id}:lawyer2_evidences   LIST  evidence items encoded by codec.encode_evidence
+cases                         SET   all case ids
+cases:by_created              ZSET  case ids scored by created_at (epoch seconds)
+cases:version                 STRING incremented by every write to any case
+cases:changes                 CHANNEL compact deltas of case writes, see api/cases/changes.py
+room:{id}:presence            ZSET  "{connection id}|{user address}" of chat connections, scored
+                                    by heartbeat expiry, see websockets/rooms.py
+hai:{id}:turns                STREAM courtroom conversation turns of the case's current trial
+hai:{id}:session              HASH  scores, turn and status of an evicted courtroom session
+cases:pending_render          SET   imported case ids awaiting PDF rendering and indexing
+evidence:{key}                HASH  stored evidence content metadata, see evidence_store.py
+evidence:{key}:links          SET   "{case_id}:{lawyer}" pairs the evidence was submitted to
+"""
+from .codec import case_to_hash, encode_evidence
+from ..schema.models import Case
+
+LAWYERS = ("lawyer1", "lawyer2")
+CASES_VERSION_KEY = "cases:version"
+CASE_CHANGES_CHANNEL = "cases:changes"
+
+# Routes evidence to the right lawyer and appends it in one atomic step.
+# KEYS: case hash, lawyer1 evidence list, lawyer2 evidence list, cases:version
+# ARGV: lawyer_type, lawyer_address ('' for none), updated_at, encoded evidence...
+# Returns the lawyer slot the evidence went to, 'not_found' or 'forbidden'.
+ADD_EVIDENCE_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 'not_found'
+end
+local fields = redis.call('HMGET', KEYS[1], 'lawyer1_type', 'lawyer2_type', 'lawyer1_address', 'lawyer2_address')
+local l1_type, l2_type, l1_addr, l2_addr = fields[1], fields[2], fields[3], fields[4]
+local lawyer_type, lawyer_addr = ARGV[1], ARGV[2]
+local slot
+
+if l1_type == 'Human' and (l2_type == 'AI' or not l2_type) then
+    if lawyer_type == 'AI' then
+        slot = 'lawyer2'
+        redis.call('HSET', KEYS[1], 'lawyer2_type', 'AI')
+    else
+        slot = 'lawyer1'
+    end
+else
+    if lawyer_addr ~= '' and lawyer_addr == l1_addr then
+        slot = 'lawyer1'
+    elseif not l2_addr then
+        slot = 'lawyer2'
+        redis.call('HSET', KEYS[1], 'lawyer2_type', 'Human')
+        if lawyer_addr ~= '' then
+            redis.call('HSET', KEYS[1], 'lawyer2_address', lawyer_addr)
+        end
+    elseif lawyer_addr == l2_addr then
+        slot = 'lawyer2'
+    else
+        return 'forbidden'
+    end
+end
+
+local list_key = KEYS[2]
+if slot == 'lawyer2' then
+    list_key = KEYS[3]
+end
+for i = 4, #ARGV do
+    redis.call('RPUSH', list_key, ARGV[i])
+end
+redis.call('HSET', KEYS[1], 'updated_at', ARGV[3])
+redis.call('HINCRBY', KEYS[1], 'version', 1)
+redis.call('INCR', KEYS[4])
+return slot
+"""
+
+# Sets fields on an existing case only.
+# KEYS: case hash, cases:version. ARGV: field, value, ...
+UPDATE_FIELDS_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+redis.call('HSET', KEYS[1], unpack(ARGV))
+redis.call('HINCRBY', KEYS[1], 'version', 1)
+redis.call('INCR', KEYS[2])
+return 1
+"""
+
+# Deletes a lock only while it still holds the caller's token, so a lock
+# that expired and was taken by another worker is left alone.
+# KEYS: lock key. ARGV: token
+RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def case_key(case_id: str) -> str:
+    return f"case:{case_id}"
+
+
+def evidence_key(case_id: str, lawyer: str) -> str:
+    return f"case:{case_id}:{lawyer}_evidences"
+
+
+def queue_case_reads(pipe, case_id: str):
+    """Queue the commands that read one case, see codec.case_from_parts"""
+    pipe.hgetall(case_key(case_id))
+    for lawyer in LAWYERS:
+        pipe.lrange(evidence_key(case_id, lawyer), 0, -1)
+
+
+def queue_case_write(pipe, case: Case):
+    """Queue the commands that store a complete case, bumping its version"""
+    case_id = case.case_id
+    pipe.hset(case_key(case_id), mapping=case_to_hash(case))
+    pipe.hincrby(case_key(case_id), "version", 1)
+    pipe.incr(CASES_VERSION_KEY)
+    for lawyer in LAWYERS:
+        pipe.delete(evidence_key(case_id, lawyer))
+        evidences = case.evidences(lawyer)
+        if evidences:
+            pipe.rpush(evidence_key(case_id, lawyer), *[encode_evidence(e) for e in evidences])
+    pipe.sadd("cases", case_id)
+    pipe.zadd("cases:by_created", {case_id: case.created_at})
+
+
+def route_evidence(fields: dict, lawyer_type: str, lawyer_address: str) -> str:
+    """
+    ADD_EVIDENCE_SCRIPT's routing for the embedded stores: the lawyer slot
+    for the submission or 'forbidden', assigning lawyer2 in `fields` (the
+    case hash as a dict of strings) as the script does.
+    """
+    l1_type, l2_type = fields.get("lawyer1_type"), fields.get("lawyer2_type")
+    l1_addr, l2_addr = fields.get("lawyer1_address"), fields.get("lawyer2_address")
+    if l1_type == "Human" and (l2_type == "AI" or l2_type is None):
+        if lawyer_type == "AI":
+            fields["lawyer2_type"] = "AI"
+            return "lawyer2"
+        return "lawyer1"
+    if lawyer_address != "" and lawyer_address == l1_addr:
+        return "lawyer1"
+    if l2_addr is None:
+        fields["lawyer2_type"] = "Human"
+        if lawyer_address != "":
+            fields["lawyer2_address"] = lawyer_address
+        return "lawyer2"
+    if lawyer_address == l2_addr:
+        return "lawyer2"
+    return "forbidden"
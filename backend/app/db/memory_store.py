@@ -0,0 +1,216 @@
+"""
+In-memory storage backend, for tests, benchmarks and single-process runs.
+
+Cases are kept as Redis keeps them (hash fields encoded as strings plus
+encoded evidence lists), so reads decode through the same codec and every
+caller gets its own copy. Nothing survives a restart and nothing is shared
+between processes.
+"""
+import itertools
+import json
+import threading
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import orjson
+
+from ..schema.models import Case, Evidence
+from .codec import case_from_parts, case_to_hash, encode_evidence, encode_value
+from .layout import LAWYERS, route_evidence
+from .store import LocalChannel, Store, session_state, turn_sequence
+
+
+class MemoryStore(Store):
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.cases: Dict[str, dict] = {}
+        self.evidence: Dict[Tuple[str, str], List[bytes]] = {}
+        self.cases_version = 0
+        self.pending_render: Set[str] = set()
+        self.evidence_meta: Dict[str, dict] = {}
+        self.evidence_link_sets: Dict[str, Set[str]] = {}
+        self.turns: Dict[str, List[Tuple[int, bytes]]] = {}
+        self.turn_ids = itertools.count(1)
+        self.sessions: Dict[str, dict] = {}
+        self.chat: Dict[str, List[str]] = {}
+        self.presence: Dict[str, Dict[str, float]] = {}
+        self.changes = LocalChannel()
+
+    def _read(self, case_id: str) -> Optional[Case]:
+        fields = self.cases.get(case_id)
+        if fields is None:
+            return None
+        return case_from_parts(
+            dict(fields),
+            list(self.evidence.get((case_id, "lawyer1"), ())),
+            list(self.evidence.get((case_id, "lawyer2"), ())),
+        )
+
+    def _write(self, case: Case) -> int:
+        fields = self.cases.setdefault(case.case_id, {})
+        fields.update(case_to_hash(case))
+        fields["version"] = str(int(fields.get("version", 0)) + 1)
+        for lawyer in LAWYERS:
+            self.evidence[(case.case_id, lawyer)] = [encode_evidence(e) for e in case.evidences(lawyer)]
+        self.cases_version += 1
+        return int(fields["version"])
+
+    def get_case(self, case_id: str) -> Optional[Case]:
+        with self.lock:
+            return self._read(case_id)
+
+    def get_cases(self, case_ids: Iterable[str]) -> List[Case]:
+        with self.lock:
+            return [case for case in map(self._read, case_ids) if case]
+
+    def create_case(self, case_id: str, case_data: Case) -> Case:
+        with self.lock:
+            case_data.version = self._write(case_data)
+        return case_data
+
+    def create_cases(self, cases: List[Case]):
+        with self.lock:
+            for case in cases:
+                case.version = self._write(case)
+
+    def update_case_fields(self, case_id: str, fields: dict) -> bool:
+        with self.lock:
+            stored = self.cases.get(case_id)
+            if stored is None:
+                return False
+            stored.update({field: encode_value(value) for field, value in fields.items()})
+            stored["version"] = str(int(stored.get("version", 0)) + 1)
+            self.cases_version += 1
+            return True
+
+    def add_evidence(self, case_id: str, lawyer_type: str, lawyer_address: Optional[str],
+                     evidences: List[Evidence], updated_at: float) -> str:
+        with self.lock:
+            stored = self.cases.get(case_id)
+            if stored is None:
+                return "not_found"
+            fields = dict(stored)
+            slot = route_evidence(fields, encode_value(lawyer_type), lawyer_address or "")
+            if slot == "forbidden":
+                return slot
+            stored.update(fields)
+            self.evidence.setdefault((case_id, slot), []).extend(encode_evidence(e) for e in evidences)
+            stored["updated_at"] = encode_value(updated_at)
+            stored["version"] = str(int(stored.get("version", 0)) + 1)
+            self.cases_version += 1
+            return slot
+
+    def get_case_version(self, case_id: str) -> Optional[int]:
+        with self.lock:
+            version = self.cases.get(case_id, {}).get("version")
+        return int(version) if version is not None else None
+
+    def get_cases_version(self) -> int:
+        return self.cases_version
+
+    def iter_case_batches(self, batch_size: int = 500) -> Iterator[List[Case]]:
+        case_ids = list(self.cases)
+        for i in range(0, len(case_ids), batch_size):
+            yield self.get_cases(case_ids[i:i + batch_size])
+
+    def list_cases(self, created_after: Optional[float] = None,
+                   created_before: Optional[float] = None) -> List[Case]:
+        cases = self.get_cases(list(self.cases))
+        if created_after is None and created_before is None:
+            return cases
+        return sorted(
+            (
+                case for case in cases
+                if (created_after is None or case.created_at >= created_after)
+                and (created_before is None or case.created_at <= created_before)
+            ),
+            key=lambda case: case.created_at,
+        )
+
+    def add_pending_render(self, case_ids: List[str]):
+        with self.lock:
+            self.pending_render.update(case_ids)
+
+    def pop_pending_render(self, count: int) -> List[str]:
+        with self.lock:
+            return [self.pending_render.pop() for _ in range(min(count, len(self.pending_render)))]
+
+    def publish_case_changes(self, changes: Iterable[dict]):
+        self.changes.publish(changes)
+
+    def link_evidence(self, case_id: str, lawyer: str, entries: List[Tuple[str, dict]]) -> List[bool]:
+        link = f"{case_id}:{lawyer}"
+        new = []
+        with self.lock:
+            for key, meta in entries:
+                stored = self.evidence_meta.setdefault(key, {})
+                for field, value in meta.items():
+                    stored.setdefault(field, str(value))
+                links = self.evidence_link_sets.setdefault(key, set())
+                new.append(link not in links)
+                links.add(link)
+        return new
+
+    def evidence_links(self, key: str) -> List[str]:
+        with self.lock:
+            return sorted(self.evidence_link_sets.get(key, ()))
+
+    def append_turn(self, case_id: str, turn: dict) -> str:
+        with self.lock:
+            seq = next(self.turn_ids)
+            self.turns.setdefault(case_id, []).append((seq, orjson.dumps(turn)))
+        return f"{seq}-0"
+
+    def get_turns(self, case_id: str, since: Optional[str] = None,
+                  limit: int = 50) -> List[Tuple[str, dict]]:
+        after = turn_sequence(since)
+        with self.lock:
+            entries = [entry for entry in self.turns.get(case_id, ()) if entry[0] > after][:limit]
+        return [(f"{seq}-0", orjson.loads(data)) for seq, data in entries]
+
+    def get_last_turns(self, case_id: str, count: int) -> List[Tuple[str, dict]]:
+        with self.lock:
+            entries = self.turns.get(case_id, [])[-count:] if count > 0 else []
+        return [(f"{seq}-0", orjson.loads(data)) for seq, data in entries]
+
+    def clear_turns(self, case_id: str):
+        with self.lock:
+            self.turns.pop(case_id, None)
+
+    def save_session(self, case_id: str, state: dict):
+        with self.lock:
+            self.sessions.setdefault(case_id, {}).update(session_state(state))
+
+    def pop_session(self, case_id: str) -> Optional[dict]:
+        with self.lock:
+            return self.sessions.pop(case_id, None) or None
+
+    # Chat and presence, served to websockets through EmbeddedAsyncStore
+
+    def append_chat_message(self, case_id: str, message: dict):
+        with self.lock:
+            self.chat.setdefault(case_id, []).append(json.dumps(message))
+
+    def get_chat_messages(self, case_id: str, start: int = 0) -> List[dict]:
+        with self.lock:
+            messages = self.chat.get(case_id, [])[start:]
+        return [json.loads(message) for message in messages]
+
+    def touch_presence(self, members: List[Tuple[str, str]], ttl: float):
+        now = time.time()
+        with self.lock:
+            for case_id, member in members:
+                self.presence.setdefault(case_id, {})[member] = now + ttl
+            for case_id in {case_id for case_id, _ in members}:
+                room = self.presence[case_id]
+                for member in [m for m, expires in room.items() if expires <= now]:
+                    del room[member]
+
+    def remove_presence(self, case_id: str, member: str):
+        with self.lock:
+            self.presence.get(case_id, {}).pop(member, None)
+
+    def get_presence(self, case_id: str) -> List[str]:
+        now = time.time()
+        with self.lock:
+            return [member for member, expires in self.presence.get(case_id, {}).items() if expires > now]
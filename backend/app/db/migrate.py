@@ -0,0 +1,31 @@
+"""
+Rewrite every stored case in the current layout and encoding.
+
+Legacy JSON string cases are converted to the hash layout, timestamps become
+epoch seconds, evidence items are re-encoded compactly and the created_at
+index is populated. Safe to run more than once.
+
+    python -m app.db.migrate
+"""
+from .layout import queue_case_write
+from .redis_db import redis_client
+
+BATCH_SIZE = 500
+
+
+def migrate_all():
+    migrated = 0
+    for case_id in redis_client.redis.sscan_iter("cases", count=BATCH_SIZE):
+        # get_case converts legacy JSON strings and decodes legacy timestamps
+        case = redis_client.get_case(case_id)
+        if not case:
+            continue
+        pipe = redis_client.redis.pipeline(transaction=True)
+        queue_case_write(pipe, case)
+        pipe.execute()
+        migrated += 1
+    print(f"Migrated {migrated} cases")
+
+
+if __name__ == "__main__":
+    migrate_all()
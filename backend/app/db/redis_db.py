@@ -1,36 +1,230 @@
 import json
+import orjson
 from redis import Redis
+from redis.exceptions import ResponseError, WatchError
 from ..config import settings
-from typing import List
+from typing import Iterable, Iterator, List, Optional, Tuple
+from ..schema.models import Case, Evidence
+from .codec import encode_value, encode_evidence, case_from_parts, case_from_dict
+from .store import Store
+from .layout import (
+    LAWYERS,
+    CASES_VERSION_KEY,
+    CASE_CHANGES_CHANNEL,
+    ADD_EVIDENCE_SCRIPT,
+    UPDATE_FIELDS_SCRIPT,
+    case_key,
+    evidence_key,
+    queue_case_reads,
+    queue_case_write,
+)
 
-class RedisClient:
+class RedisClient(Store):
     def __init__(self):
         self.redis = Redis(
             host=settings.redis_host,
             port=settings.redis_port,
             decode_responses=True
         )
+        self._add_evidence = self.redis.register_script(ADD_EVIDENCE_SCRIPT)
+        self._update_fields = self.redis.register_script(UPDATE_FIELDS_SCRIPT)
 
-    def get_case(self, case_id: str):
-        data = self.redis.get(f"case:{case_id}")
-        return json.loads(data) if data else None
+    def migrate_legacy_case(self, case_id: str):
+        """Convert a case stored as a single JSON string into the hash layout"""
+        key = case_key(case_id)
+        with self.redis.pipeline() as pipe:
+            try:
+                pipe.watch(key)
+                if pipe.type(key) != "string":
+                    return
+                case = case_from_dict(json.loads(pipe.get(key)))
+                pipe.multi()
+                pipe.delete(key)
+                queue_case_write(pipe, case)
+                pipe.execute()
+            except WatchError:
+                # Another worker migrated it first
+                pass
 
-    def create_case(self, case_id: str, case_data: dict):
-        self.redis.set(f"case:{case_id}", json.dumps(case_data))
-        self.redis.sadd("cases", case_id)
-        return case_data
+    def get_case(self, case_id: str) -> Optional[Case]:
+        pipe = self.redis.pipeline(transaction=False)
+        queue_case_reads(pipe, case_id)
+        try:
+            fields, lawyer1, lawyer2 = pipe.execute()
+        except ResponseError:
+            self.migrate_legacy_case(case_id)
+            pipe = self.redis.pipeline(transaction=False)
+            queue_case_reads(pipe, case_id)
+            fields, lawyer1, lawyer2 = pipe.execute()
+        return case_from_parts(fields, lawyer1, lawyer2)
 
-    def update_case(self, case_id: str, case_data: dict):
-        self.redis.set(f"case:{case_id}", json.dumps(case_data))
+    def create_case(self, case_id: str, case_data: Case) -> Case:
+        pipe = self.redis.pipeline(transaction=True)
+        queue_case_write(pipe, case_data)
+        # The version is the reply to the HINCRBY after the HSET
+        case_data.version = pipe.execute()[1]
         return case_data
 
-    def list_cases(self):
-        case_ids = self.redis.smembers("cases")
-        cases = []
+    def update_case_fields(self, case_id: str, fields: dict) -> bool:
+        """Set scalar fields on an existing case, returns False if it does not exist"""
+        args = []
+        for field, value in fields.items():
+            args.extend([field, encode_value(value)])
+        try:
+            return bool(self._update_fields(keys=[case_key(case_id), CASES_VERSION_KEY], args=args))
+        except ResponseError:
+            self.migrate_legacy_case(case_id)
+            return bool(self._update_fields(keys=[case_key(case_id), CASES_VERSION_KEY], args=args))
+
+    def add_evidence(self, case_id: str, lawyer_type: str, lawyer_address: Optional[str],
+                     evidences: List[Evidence], updated_at: float) -> str:
+        """
+        Atomically append evidence to the submitting lawyer's list.
+
+        Returns the lawyer slot ('lawyer1' or 'lawyer2') the evidence was added
+        to, 'not_found' if the case does not exist or 'forbidden' if the
+        address is not one of the case's lawyers.
+        """
+        keys = [case_key(case_id)] + [evidence_key(case_id, lawyer) for lawyer in LAWYERS] + [CASES_VERSION_KEY]
+        args = [
+            encode_value(lawyer_type),
+            lawyer_address or "",
+            encode_value(updated_at),
+            *[encode_evidence(e) for e in evidences],
+        ]
+        try:
+            return self._add_evidence(keys=keys, args=args)
+        except ResponseError:
+            self.migrate_legacy_case(case_id)
+            return self._add_evidence(keys=keys, args=args)
+
+    def get_case_version(self, case_id: str) -> Optional[int]:
+        """The case's version, None if it does not exist or has never been versioned"""
+        try:
+            version = self.redis.hget(case_key(case_id), "version")
+        except ResponseError:
+            # Legacy JSON string case
+            return None
+        return int(version) if version is not None else None
+
+    def get_cases_version(self) -> int:
+        """Incremented by every write to any case"""
+        return int(self.redis.get(CASES_VERSION_KEY) or 0)
+
+    def get_cases(self, case_ids: Iterable[str]) -> List[Case]:
+        """Fetch several cases in one pipelined round trip"""
+        case_ids = list(case_ids)
+        pipe = self.redis.pipeline(transaction=False)
         for case_id in case_ids:
-            case_data = self.get_case(case_id)
-            if case_data:
-                cases.append(case_data)
+            queue_case_reads(pipe, case_id)
+        results = pipe.execute(raise_on_error=False)
+
+        cases = []
+        for i, case_id in enumerate(case_ids):
+            fields, lawyer1, lawyer2 = results[3 * i:3 * i + 3]
+            if isinstance(fields, ResponseError):
+                case = self.get_case(case_id)
+            else:
+                case = case_from_parts(fields, lawyer1, lawyer2)
+            if case:
+                cases.append(case)
         return cases
 
-redis_client = RedisClient() 
\ No newline at end of file
+    def create_cases(self, cases: List[Case]):
+        """Store many cases with one pipelined round trip"""
+        pipe = self.redis.pipeline(transaction=False)
+        positions = []
+        for case in cases:
+            positions.append(len(pipe) + 1)
+            queue_case_write(pipe, case)
+        results = pipe.execute()
+        for case, position in zip(cases, positions):
+            case.version = results[position]
+
+    def iter_case_batches(self, batch_size: int = 500) -> Iterator[List[Case]]:
+        """SSCAN the case ids and yield cases in batches, holding one batch at a time"""
+        cursor = 0
+        while True:
+            cursor, case_ids = self.redis.sscan("cases", cursor, count=batch_size)
+            if case_ids:
+                yield self.get_cases(case_ids)
+            if cursor == 0:
+                break
+
+    def list_cases(self, created_after: Optional[float] = None,
+                   created_before: Optional[float] = None) -> List[Case]:
+        """All cases, or those created within a time range, oldest first when ranged"""
+        if created_after is None and created_before is None:
+            return self.get_cases(self.redis.smembers("cases"))
+        case_ids = self.redis.zrangebyscore(
+            "cases:by_created",
+            created_after if created_after is not None else "-inf",
+            created_before if created_before is not None else "+inf",
+        )
+        return self.get_cases(case_ids)
+
+    def add_pending_render(self, case_ids: List[str]):
+        if case_ids:
+            self.redis.sadd("cases:pending_render", *case_ids)
+
+    def pop_pending_render(self, count: int) -> List[str]:
+        return self.redis.spop("cases:pending_render", count) or []
+
+    def link_evidence(self, case_id: str, lawyer: str, entries: List[Tuple[str, dict]]) -> List[bool]:
+        pipe = self.redis.pipeline(transaction=False)
+        for key, meta in entries:
+            for field, value in meta.items():
+                pipe.hsetnx(f"evidence:{key}", field, value)
+            pipe.sadd(f"evidence:{key}:links", f"{case_id}:{lawyer}")
+        results = pipe.execute()
+
+        # The SADD closes each entry's replies, 1 when the link is new
+        new, position = [], 0
+        for _, meta in entries:
+            position += len(meta) + 1
+            new.append(bool(results[position - 1]))
+        return new
+
+    def evidence_links(self, key: str) -> List[str]:
+        return sorted(self.redis.smembers(f"evidence:{key}:links"))
+
+    def publish_case_changes(self, changes: Iterable[dict]):
+        """Publish case deltas to the change feed in one round trip"""
+        pipe = self.redis.pipeline(transaction=False)
+        for change in changes:
+            pipe.publish(CASE_CHANGES_CHANNEL, orjson.dumps(change))
+        pipe.execute()
+
+    def append_turn(self, case_id: str, turn: dict) -> str:
+        """Append a courtroom turn to the case's conversation stream, returns its id"""
+        return self.redis.xadd(f"hai:{case_id}:turns", {"data": orjson.dumps(turn)})
+
+    def get_turns(self, case_id: str, since: Optional[str] = None,
+                  limit: int = 50) -> List[Tuple[str, dict]]:
+        """Turns after the `since` stream id (exclusive), oldest first"""
+        start = f"({since}" if since else "-"
+        entries = self.redis.xrange(f"hai:{case_id}:turns", min=start, max="+", count=limit)
+        return [(entry_id, orjson.loads(fields["data"])) for entry_id, fields in entries]
+
+    def get_last_turns(self, case_id: str, count: int) -> List[Tuple[str, dict]]:
+        """The newest `count` turns, oldest first"""
+        entries = self.redis.xrevrange(f"hai:{case_id}:turns", max="+", min="-", count=count)
+        return [(entry_id, orjson.loads(fields["data"])) for entry_id, fields in reversed(entries)]
+
+    def clear_turns(self, case_id: str):
+        """Empty the case's conversation stream, keeping its last id so new ids still grow"""
+        self.redis.xtrim(f"hai:{case_id}:turns", maxlen=0, approximate=False)
+
+    def save_session(self, case_id: str, state: dict):
+        """Persist an evicted courtroom session so it can be resumed"""
+        self.redis.hset(f"hai:{case_id}:session", mapping=state)
+
+    def pop_session(self, case_id: str) -> Optional[dict]:
+        """Take the persisted session state of a case, if any"""
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.hgetall(f"hai:{case_id}:session")
+        pipe.delete(f"hai:{case_id}:session")
+        state, _ = pipe.execute()
+        return state or None
+
+redis_client = RedisClient()
@@ -0,0 +1,300 @@
+"""
+Embedded SQLite storage backend, for single-node deployments without Redis.
+
+One database file (`STORAGE_SQLITE_PATH`) in WAL mode, with a connection per
+thread. Case fields are stored as the Redis hash would hold them (a JSON
+object of strings) and evidence items as encoded rows, so cases decode
+through the same codec. Writes that read first (evidence routing, version
+bumps) run in `BEGIN IMMEDIATE` transactions, which makes them atomic across
+threads and processes. The change channel only reaches this process.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+import orjson
+
+from ..schema.models import Case, Evidence
+from .codec import case_from_parts, case_to_hash, encode_evidence, encode_value
+from .layout import LAWYERS, route_evidence
+from .store import LocalChannel, Store, session_state, turn_sequence
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cases (case_id TEXT PRIMARY KEY, fields TEXT NOT NULL, created_at REAL);
+CREATE INDEX IF NOT EXISTS cases_by_created ON cases (created_at);
+CREATE TABLE IF NOT EXISTS evidence (id INTEGER PRIMARY KEY AUTOINCREMENT, case_id TEXT NOT NULL,
+                                     lawyer TEXT NOT NULL, data BLOB NOT NULL);
+CREATE INDEX IF NOT EXISTS evidence_by_case ON evidence (case_id, lawyer, id);
+CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS pending_render (case_id TEXT PRIMARY KEY);
+CREATE TABLE IF NOT EXISTS evidence_meta (key TEXT NOT NULL, field TEXT NOT NULL, value TEXT,
+                                          PRIMARY KEY (key, field));
+CREATE TABLE IF NOT EXISTS evidence_links (key TEXT NOT NULL, link TEXT NOT NULL, PRIMARY KEY (key, link));
+CREATE TABLE IF NOT EXISTS turns (id INTEGER PRIMARY KEY AUTOINCREMENT, case_id TEXT NOT NULL, data BLOB NOT NULL);
+CREATE INDEX IF NOT EXISTS turns_by_case ON turns (case_id, id);
+CREATE TABLE IF NOT EXISTS sessions (case_id TEXT PRIMARY KEY, state TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS chat (id INTEGER PRIMARY KEY AUTOINCREMENT, case_id TEXT NOT NULL, data TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS chat_by_case ON chat (case_id, id);
+CREATE TABLE IF NOT EXISTS presence (case_id TEXT NOT NULL, member TEXT NOT NULL, expires REAL NOT NULL,
+                                     PRIMARY KEY (case_id, member));
+"""
+
+
+class SQLiteStore(Store):
+    def __init__(self, path: str):
+        self.path = path
+        self.local = threading.local()
+        self.changes = LocalChannel()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _fields(self, conn, case_id: str) -> Optional[dict]:
+        row = conn.execute("SELECT fields FROM cases WHERE case_id = ?", (case_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _read(self, conn, case_id: str) -> Optional[Case]:
+        fields = self._fields(conn, case_id)
+        if fields is None:
+            return None
+        evidence = {lawyer: [] for lawyer in LAWYERS}
+        for lawyer, data in conn.execute(
+            "SELECT lawyer, data FROM evidence WHERE case_id = ? ORDER BY id", (case_id,)
+        ):
+            evidence[lawyer].append(data)
+        return case_from_parts(fields, evidence["lawyer1"], evidence["lawyer2"])
+
+    def _bump(self, conn, fields: dict) -> int:
+        fields["version"] = str(int(fields.get("version", 0)) + 1)
+        conn.execute(
+            "INSERT INTO counters (name, value) VALUES ('cases', 1) "
+            "ON CONFLICT (name) DO UPDATE SET value = value + 1"
+        )
+        return int(fields["version"])
+
+    def _save_fields(self, conn, case_id: str, fields: dict):
+        conn.execute(
+            "INSERT INTO cases (case_id, fields, created_at) VALUES (?, ?, ?) "
+            "ON CONFLICT (case_id) DO UPDATE SET fields = excluded.fields, created_at = excluded.created_at",
+            (case_id, json.dumps(fields), float(fields["created_at"]) if fields.get("created_at") else None),
+        )
+
+    def _write(self, conn, case: Case) -> int:
+        fields = self._fields(conn, case.case_id) or {}
+        fields.update(case_to_hash(case))
+        version = self._bump(conn, fields)
+        self._save_fields(conn, case.case_id, fields)
+        conn.execute("DELETE FROM evidence WHERE case_id = ?", (case.case_id,))
+        conn.executemany(
+            "INSERT INTO evidence (case_id, lawyer, data) VALUES (?, ?, ?)",
+            [(case.case_id, lawyer, encode_evidence(e)) for lawyer in LAWYERS for e in case.evidences(lawyer)],
+        )
+        return version
+
+    def get_case(self, case_id: str) -> Optional[Case]:
+        return self._read(self._conn(), case_id)
+
+    def get_cases(self, case_ids: Iterable[str]) -> List[Case]:
+        conn = self._conn()
+        return [case for case in (self._read(conn, case_id) for case_id in case_ids) if case]
+
+    def create_case(self, case_id: str, case_data: Case) -> Case:
+        with self._transaction() as conn:
+            case_data.version = self._write(conn, case_data)
+        return case_data
+
+    def create_cases(self, cases: List[Case]):
+        with self._transaction() as conn:
+            for case in cases:
+                case.version = self._write(conn, case)
+
+    def update_case_fields(self, case_id: str, fields: dict) -> bool:
+        with self._transaction() as conn:
+            stored = self._fields(conn, case_id)
+            if stored is None:
+                return False
+            stored.update({field: encode_value(value) for field, value in fields.items()})
+            self._bump(conn, stored)
+            self._save_fields(conn, case_id, stored)
+            return True
+
+    def add_evidence(self, case_id: str, lawyer_type: str, lawyer_address: Optional[str],
+                     evidences: List[Evidence], updated_at: float) -> str:
+        with self._transaction() as conn:
+            fields = self._fields(conn, case_id)
+            if fields is None:
+                return "not_found"
+            slot = route_evidence(fields, encode_value(lawyer_type), lawyer_address or "")
+            if slot == "forbidden":
+                return slot
+            conn.executemany(
+                "INSERT INTO evidence (case_id, lawyer, data) VALUES (?, ?, ?)",
+                [(case_id, slot, encode_evidence(e)) for e in evidences],
+            )
+            fields["updated_at"] = encode_value(updated_at)
+            self._bump(conn, fields)
+            self._save_fields(conn, case_id, fields)
+            return slot
+
+    def get_case_version(self, case_id: str) -> Optional[int]:
+        fields = self._fields(self._conn(), case_id)
+        if fields is None or fields.get("version") is None:
+            return None
+        return int(fields["version"])
+
+    def get_cases_version(self) -> int:
+        row = self._conn().execute("SELECT value FROM counters WHERE name = 'cases'").fetchone()
+        return row[0] if row else 0
+
+    def iter_case_batches(self, batch_size: int = 500) -> Iterator[List[Case]]:
+        last = ""
+        while True:
+            case_ids = [row[0] for row in self._conn().execute(
+                "SELECT case_id FROM cases WHERE case_id > ? ORDER BY case_id LIMIT ?", (last, batch_size)
+            )]
+            if not case_ids:
+                break
+            yield self.get_cases(case_ids)
+            last = case_ids[-1]
+
+    def list_cases(self, created_after: Optional[float] = None,
+                   created_before: Optional[float] = None) -> List[Case]:
+        if created_after is None and created_before is None:
+            rows = self._conn().execute("SELECT case_id FROM cases")
+        else:
+            rows = self._conn().execute(
+                "SELECT case_id FROM cases WHERE created_at >= ? AND created_at <= ? ORDER BY created_at",
+                (
+                    created_after if created_after is not None else float("-inf"),
+                    created_before if created_before is not None else float("inf"),
+                ),
+            )
+        return self.get_cases([row[0] for row in rows.fetchall()])
+
+    def add_pending_render(self, case_ids: List[str]):
+        with self._transaction() as conn:
+            conn.executemany("INSERT OR IGNORE INTO pending_render (case_id) VALUES (?)", [(i,) for i in case_ids])
+
+    def pop_pending_render(self, count: int) -> List[str]:
+        with self._transaction() as conn:
+            case_ids = [row[0] for row in conn.execute("SELECT case_id FROM pending_render LIMIT ?", (count,))]
+            conn.executemany("DELETE FROM pending_render WHERE case_id = ?", [(i,) for i in case_ids])
+        return case_ids
+
+    def publish_case_changes(self, changes: Iterable[dict]):
+        self.changes.publish(changes)
+
+    def link_evidence(self, case_id: str, lawyer: str, entries: List[Tuple[str, dict]]) -> List[bool]:
+        link = f"{case_id}:{lawyer}"
+        new = []
+        with self._transaction() as conn:
+            for key, meta in entries:
+                conn.executemany(
+                    "INSERT OR IGNORE INTO evidence_meta (key, field, value) VALUES (?, ?, ?)",
+                    [(key, field, str(value)) for field, value in meta.items()],
+                )
+                cursor = conn.execute("INSERT OR IGNORE INTO evidence_links (key, link) VALUES (?, ?)", (key, link))
+                new.append(cursor.rowcount == 1)
+        return new
+
+    def evidence_links(self, key: str) -> List[str]:
+        return [row[0] for row in self._conn().execute(
+            "SELECT link FROM evidence_links WHERE key = ? ORDER BY link", (key,)
+        )]
+
+    def append_turn(self, case_id: str, turn: dict) -> str:
+        cursor = self._conn().execute(
+            "INSERT INTO turns (case_id, data) VALUES (?, ?)", (case_id, orjson.dumps(turn))
+        )
+        return f"{cursor.lastrowid}-0"
+
+    def get_turns(self, case_id: str, since: Optional[str] = None,
+                  limit: int = 50) -> List[Tuple[str, dict]]:
+        rows = self._conn().execute(
+            "SELECT id, data FROM turns WHERE case_id = ? AND id > ? ORDER BY id LIMIT ?",
+            (case_id, turn_sequence(since), limit),
+        )
+        return [(f"{seq}-0", orjson.loads(data)) for seq, data in rows]
+
+    def get_last_turns(self, case_id: str, count: int) -> List[Tuple[str, dict]]:
+        rows = self._conn().execute(
+            "SELECT id, data FROM turns WHERE case_id = ? ORDER BY id DESC LIMIT ?", (case_id, count)
+        ).fetchall()
+        return [(f"{seq}-0", orjson.loads(data)) for seq, data in reversed(rows)]
+
+    def clear_turns(self, case_id: str):
+        # AUTOINCREMENT never reuses ids, so later turns still sort after any cursor
+        self._conn().execute("DELETE FROM turns WHERE case_id = ?", (case_id,))
+
+    def save_session(self, case_id: str, state: dict):
+        with self._transaction() as conn:
+            row = conn.execute("SELECT state FROM sessions WHERE case_id = ?", (case_id,)).fetchone()
+            merged = {**(json.loads(row[0]) if row else {}), **session_state(state)}
+            conn.execute(
+                "INSERT INTO sessions (case_id, state) VALUES (?, ?) "
+                "ON CONFLICT (case_id) DO UPDATE SET state = excluded.state",
+                (case_id, json.dumps(merged)),
+            )
+
+    def pop_session(self, case_id: str) -> Optional[dict]:
+        with self._transaction() as conn:
+            row = conn.execute("SELECT state FROM sessions WHERE case_id = ?", (case_id,)).fetchone()
+            conn.execute("DELETE FROM sessions WHERE case_id = ?", (case_id,))
+        return (json.loads(row[0]) or None) if row else None
+
+    # Chat and presence, served to websockets through EmbeddedAsyncStore
+
+    def append_chat_message(self, case_id: str, message: dict):
+        self._conn().execute("INSERT INTO chat (case_id, data) VALUES (?, ?)", (case_id, json.dumps(message)))
+
+    def get_chat_messages(self, case_id: str, start: int = 0) -> List[dict]:
+        rows = self._conn().execute(
+            "SELECT data FROM chat WHERE case_id = ? ORDER BY id LIMIT -1 OFFSET ?", (case_id, start)
+        )
+        return [json.loads(row[0]) for row in rows]
+
+    def touch_presence(self, members: List[Tuple[str, str]], ttl: float):
+        now = time.time()
+        with self._transaction() as conn:
+            conn.executemany(
+                "INSERT INTO presence (case_id, member, expires) VALUES (?, ?, ?) "
+                "ON CONFLICT (case_id, member) DO UPDATE SET expires = excluded.expires",
+                [(case_id, member, now + ttl) for case_id, member in members],
+            )
+            conn.executemany(
+                "DELETE FROM presence WHERE case_id = ? AND expires <= ?",
+                [(case_id, now) for case_id in {case_id for case_id, _ in members}],
+            )
+
+    def remove_presence(self, case_id: str, member: str):
+        self._conn().execute("DELETE FROM presence WHERE case_id = ? AND member = ?", (case_id, member))
+
+    def get_presence(self, case_id: str) -> List[str]:
+        rows = self._conn().execute(
+            "SELECT member FROM presence WHERE case_id = ? AND expires > ?", (case_id, time.time())
+        )
+        return [row[0] for row in rows]
@@ -0,0 +1,29 @@
+"""
+The storage backend selected by `STORAGE_BACKEND` (redis, memory or sqlite),
+see store.py. Search (RediSearch) and `python -m app.db.migrate` are
+Redis-specific and always use Redis.
+"""
+from ..config import settings
+from .store import AsyncStore, EmbeddedAsyncStore, Store
+
+
+def create_stores(backend: str, sqlite_path: str = ""):
+    """(Store, AsyncStore) for a backend name"""
+    if backend == "redis":
+        from .async_redis import async_redis_client
+        from .redis_db import redis_client
+        return redis_client, async_redis_client
+    if backend == "memory":
+        from .memory_store import MemoryStore
+        memory = MemoryStore()
+        return memory, EmbeddedAsyncStore(memory, threaded=False)
+    if backend == "sqlite":
+        from .sqlite_store import SQLiteStore
+        sqlite = SQLiteStore(sqlite_path)
+        return sqlite, EmbeddedAsyncStore(sqlite, threaded=True)
+    raise ValueError(f"Unknown storage backend {backend!r}, expected redis, memory or sqlite")
+
+
+store: Store
+async_store: AsyncStore
+store, async_store = create_stores(settings.storage_backend, settings.storage_sqlite_path)
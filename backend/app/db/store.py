@@ -0,0 +1,217 @@
+"""
+Storage interfaces for cases, chat and courtroom session data.
+
+`Store` is the synchronous side used by the API routes, the Judge and the
+batch scripts; `AsyncStore` is the side used by websockets. Backends:
+
+    redis   RedisClient / AsyncRedisClient (redis_db.py, async_redis.py)
+    memory  MemoryStore (memory_store.py), process-local, nothing persisted
+    sqlite  SQLiteStore (sqlite_store.py), one embedded database file
+
+and `storage.py` picks one with `STORAGE_BACKEND`. The embedded backends
+follow the Redis semantics (case hash fields encoded as strings, evidence
+routing, versions, turn ids that only grow) so the same conformance suite,
+`python -m benchmarks.storage_suite`, runs against all of them. Their change
+channel only reaches subscribers in the same process.
+"""
+import asyncio
+import re
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from ..schema.models import Case, Evidence
+
+# Yielded by case_changes() once its subscription is live, and whenever
+# changes may have been missed
+RESYNC = {"type": "resync"}
+
+# Turn ids, as returned by append_turn: Redis stream ids or "{n}-0"
+TURN_ID = re.compile(r"^\d+-\d+$")
+
+
+class Store(ABC):
+    # Cases
+
+    @abstractmethod
+    def get_case(self, case_id: str) -> Optional[Case]: ...
+
+    @abstractmethod
+    def get_cases(self, case_ids: Iterable[str]) -> List[Case]:
+        """The cases that exist, in the order asked for"""
+
+    @abstractmethod
+    def create_case(self, case_id: str, case_data: Case) -> Case:
+        """Store a complete case, setting `case_data.version`"""
+
+    @abstractmethod
+    def create_cases(self, cases: List[Case]): ...
+
+    @abstractmethod
+    def update_case_fields(self, case_id: str, fields: dict) -> bool:
+        """Set scalar fields on an existing case, False if it does not exist"""
+
+    @abstractmethod
+    def add_evidence(self, case_id: str, lawyer_type: str, lawyer_address: Optional[str],
+                     evidences: List[Evidence], updated_at: float) -> str:
+        """Append evidence, returns the lawyer slot, 'not_found' or 'forbidden'"""
+
+    @abstractmethod
+    def get_case_version(self, case_id: str) -> Optional[int]: ...
+
+    @abstractmethod
+    def get_cases_version(self) -> int: ...
+
+    @abstractmethod
+    def iter_case_batches(self, batch_size: int = 500) -> Iterator[List[Case]]: ...
+
+    @abstractmethod
+    def list_cases(self, created_after: Optional[float] = None,
+                   created_before: Optional[float] = None) -> List[Case]: ...
+
+    @abstractmethod
+    def add_pending_render(self, case_ids: List[str]):
+        """Imported cases whose PDF and search entries are still to be made"""
+
+    @abstractmethod
+    def pop_pending_render(self, count: int) -> List[str]: ...
+
+    @abstractmethod
+    def publish_case_changes(self, changes: Iterable[dict]): ...
+
+    # Evidence content, see evidence_store.py
+
+    @abstractmethod
+    def link_evidence(self, case_id: str, lawyer: str, entries: List[Tuple[str, dict]]) -> List[bool]:
+        """
+        Record (content key, metadata) entries submitted by a case's lawyer.
+        Metadata fields already set are kept. Returns per entry whether the
+        link from the key to "{case_id}:{lawyer}" is new.
+        """
+
+    @abstractmethod
+    def evidence_links(self, key: str) -> List[str]: ...
+
+    # Courtroom turns and sessions
+
+    @abstractmethod
+    def append_turn(self, case_id: str, turn: dict) -> str:
+        """Append a turn, returns its id; ids of a case only grow"""
+
+    @abstractmethod
+    def get_turns(self, case_id: str, since: Optional[str] = None,
+                  limit: int = 50) -> List[Tuple[str, dict]]: ...
+
+    @abstractmethod
+    def get_last_turns(self, case_id: str, count: int) -> List[Tuple[str, dict]]: ...
+
+    @abstractmethod
+    def clear_turns(self, case_id: str):
+        """Drop the turns of a case's previous trial; later ids still grow"""
+
+    @abstractmethod
+    def save_session(self, case_id: str, state: dict): ...
+
+    @abstractmethod
+    def pop_session(self, case_id: str) -> Optional[dict]: ...
+
+
+class AsyncStore(ABC):
+    @abstractmethod
+    async def get_case(self, case_id: str) -> Optional[Case]: ...
+
+    @abstractmethod
+    async def append_chat_message(self, case_id: str, message: dict): ...
+
+    @abstractmethod
+    async def get_chat_messages(self, case_id: str, start: int = 0) -> List[dict]: ...
+
+    @abstractmethod
+    async def touch_presence(self, members: Iterable[Tuple[str, str]], ttl: float):
+        """Mark (case_id, member) entries present for `ttl` seconds, pruning expired ones"""
+
+    @abstractmethod
+    async def remove_presence(self, case_id: str, member: str): ...
+
+    @abstractmethod
+    async def get_presence(self, case_id: str) -> List[str]:
+        """Members of the case's room that have not expired"""
+
+    @abstractmethod
+    def case_changes(self) -> AsyncIterator[dict]:
+        """
+        Every case change published from now on, preceded by RESYNC once the
+        subscription is live (changes published before that are not seen)
+        """
+
+
+class LocalChannel:
+    """Process-local stand-in for the Redis change channel"""
+    def __init__(self):
+        self.queues: List[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]] = []
+
+    def publish(self, changes: Iterable[dict]):
+        # Publishers may be worker threads, so hand over through each loop
+        for change in changes:
+            for loop, queue in list(self.queues):
+                loop.call_soon_threadsafe(queue.put_nowait, change)
+
+    async def listen(self) -> AsyncIterator[dict]:
+        entry = (asyncio.get_running_loop(), asyncio.Queue())
+        self.queues.append(entry)
+        try:
+            yield RESYNC
+            while True:
+                yield await entry[1].get()
+        finally:
+            self.queues.remove(entry)
+
+
+class EmbeddedAsyncStore(AsyncStore):
+    """AsyncStore over an embedded Store; `threaded` runs its calls off the event loop"""
+    def __init__(self, store, threaded: bool):
+        self.store = store
+        self.threaded = threaded
+
+    async def _call(self, fn, *args):
+        if self.threaded:
+            return await asyncio.to_thread(fn, *args)
+        return fn(*args)
+
+    async def get_case(self, case_id: str) -> Optional[Case]:
+        return await self._call(self.store.get_case, case_id)
+
+    async def append_chat_message(self, case_id: str, message: dict):
+        await self._call(self.store.append_chat_message, case_id, message)
+
+    async def get_chat_messages(self, case_id: str, start: int = 0) -> List[dict]:
+        return await self._call(self.store.get_chat_messages, case_id, start)
+
+    async def touch_presence(self, members: Iterable[Tuple[str, str]], ttl: float):
+        await self._call(self.store.touch_presence, list(members), ttl)
+
+    async def remove_presence(self, case_id: str, member: str):
+        await self._call(self.store.remove_presence, case_id, member)
+
+    async def get_presence(self, case_id: str) -> List[str]:
+        return await self._call(self.store.get_presence, case_id)
+
+    def case_changes(self) -> AsyncIterator[dict]:
+        return self.store.changes.listen()
+
+
+def valid_turn_id(turn_id: str) -> bool:
+    return bool(TURN_ID.match(turn_id))
+
+
+def turn_sequence(turn_id: Optional[str]) -> int:
+    """Sequence number of an embedded store's "{n}-0" turn id"""
+    if not turn_id:
+        return 0
+    if not valid_turn_id(turn_id):
+        raise ValueError(f"Invalid turn id {turn_id!r}")
+    return int(turn_id.split("-")[0])
+
+
+def session_state(state: Dict) -> Dict[str, str]:
+    # Stored as Redis hash values are, so restore() sees the same types
+    return {key: str(value) for key, value in state.items()}
@@ -0,0 +1,92 @@
+"""
+Per-case vector indexes over the case reports.
+
+Each case's report (`case_reports/case_{case_id}.pdf`) gets its own small
+index, tagged with `case_id` metadata, so retrieval for one case never sees
+another case's passages and costs the same however many cases exist. Built
+indexes are kept for the most recently used cases and rebuilt when the
+report changes. The report text comes from what was captured when the PDF
+was rendered (see report_text.py), so PDFs are not parsed back.
+"""
+import os
+import threading
+from collections import OrderedDict
+from typing import List, Tuple
+
+from ..config import settings
+from .chunking import chunk_texts, get_tokenizer
+from .report_text import parse_pdf_text, pdf_path, read_sections, report_version
+
+MAX_CACHED_INDEXES = 32
+# Window size in embedding-model tokens
+CHUNK_TOKENS = 512
+
+_indexes: "OrderedDict[str, Tuple[tuple, object]]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def load_case_documents(case_id: str) -> List:
+    """The case's report as llama_index documents tagged with its case_id"""
+    from llama_index.core import Document
+
+    sections = read_sections(case_id)
+    if sections is not None:
+        return [
+            Document(text=section["text"], metadata={"case_id": case_id, "section": section["section"]})
+            for section in sections
+        ]
+
+    # Reports rendered before text capture, or replaced by hand
+    path = pdf_path(case_id)
+    if not os.path.exists(path):
+        return []
+    return [Document(text=parse_pdf_text(path), metadata={"case_id": case_id, "section": "report"})]
+
+
+def _build_index(case_id: str):
+    from llama_index.core import VectorStoreIndex
+    from llama_index.core.schema import TextNode
+    from .embeddings import get_embed_model
+
+    # Sentence-aligned windows from the shared chunker and a local embedding
+    # model, so index builds never call a remote API and unchanged chunks are
+    # served from the embedding cache
+    documents = load_case_documents(case_id)
+    windows = chunk_texts(
+        [document.text for document in documents],
+        max_tokens=CHUNK_TOKENS,
+        tokenizer=get_tokenizer(settings.embedding_model),
+    )
+    nodes = [
+        TextNode(text=window, metadata=document.metadata)
+        for document, document_windows in zip(documents, windows)
+        for window in document_windows
+    ]
+    return VectorStoreIndex(nodes, embed_model=get_embed_model())
+
+
+def get_case_index(case_id: str):
+    """The case's vector index, rebuilt only when its report has changed"""
+    version = report_version(case_id)
+    with _lock:
+        cached = _indexes.get(case_id)
+        if cached is not None and cached[0] == version:
+            _indexes.move_to_end(case_id)
+            return cached[1]
+
+    index = _build_index(case_id)
+    with _lock:
+        _indexes[case_id] = (version, index)
+        _indexes.move_to_end(case_id)
+        while len(_indexes) > MAX_CACHED_INDEXES:
+            _indexes.popitem(last=False)
+    return index
+
+
+def get_case_retriever(case_id: str):
+    """Retriever over one case's documents only"""
+    from llama_index.core.vector_stores import ExactMatchFilter, MetadataFilters
+
+    return get_case_index(case_id).as_retriever(
+        filters=MetadataFilters(filters=[ExactMatchFilter(key="case_id", value=case_id)])
+    )
@@ -0,0 +1,181 @@
+"""
+Sentence-aware chunking shared by every text analysis step.
+
+Texts are split into sentences with spaCy's rule-based sentencizer (a regex
+fallback is used when spaCy is not installed), then sentences are packed
+greedily into windows that fit a model's tokenizer limit. A sentence longer
+than a window is cut at token boundaries. Batches of texts are segmented
+with `nlp.pipe` and tokenized in one tokenizer call, and both the sentences
+and the windows are cached by text hash, so a text that is analysed more
+than once (sentiment, coherence, indexing) is segmented once.
+
+Like inference.py this module does not import the app settings, so the
+content-verification scripts can use it.
+"""
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import List, Optional, Sequence, Tuple
+
+# Split after sentence-ending punctuation followed by whitespace
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+')
+
+CACHE_SIZE = 4096
+
+
+class _LRU:
+    def __init__(self, size: int):
+        self.size = size
+        self.items: "OrderedDict[tuple, object]" = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            value = self.items.get(key)
+            if value is not None:
+                self.items.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self.lock:
+            self.items[key] = value
+            self.items.move_to_end(key)
+            while len(self.items) > self.size:
+                self.items.popitem(last=False)
+
+
+_sentences = _LRU(CACHE_SIZE)
+_windows = _LRU(CACHE_SIZE)
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+@lru_cache(maxsize=1)
+def _sentencizer():
+    try:
+        import spacy
+    except ImportError:
+        return None
+    nlp = spacy.blank("en")
+    nlp.add_pipe("sentencizer")
+    return nlp
+
+
+@lru_cache(maxsize=None)
+def get_tokenizer(model_id: str):
+    """The (fast) tokenizer of a model, loaded once per process"""
+    from transformers import AutoTokenizer
+    return AutoTokenizer.from_pretrained(model_id)
+
+
+def split_sentences_batch(texts: Sequence[str]) -> List[List[str]]:
+    """Non-empty sentences of each text"""
+    texts = [text or "" for text in texts]
+    keys = [text_hash(text) for text in texts]
+    result: List[Optional[List[str]]] = [_sentences.get(key) for key in keys]
+
+    missing = list(dict.fromkeys(i for i, sentences in enumerate(result) if sentences is None))
+    if missing:
+        nlp = _sentencizer()
+        if nlp is not None:
+            docs = nlp.pipe((texts[i] for i in missing), batch_size=64)
+            segmented = [[s.text.strip() for s in doc.sents if s.text.strip()] for doc in docs]
+        else:
+            segmented = [
+                [s.strip() for s in SENTENCE_BOUNDARY.split(texts[i]) if s.strip()] for i in missing
+            ]
+        for i, sentences in zip(missing, segmented):
+            _sentences.put(keys[i], sentences)
+            result[i] = sentences
+    return result
+
+
+def split_sentences(text: str) -> List[str]:
+    return split_sentences_batch([text])[0]
+
+
+def _pack(pieces: List[Tuple[str, int]], budget: int) -> List[str]:
+    """Greedily join (text, size) pieces into windows of at most `budget`"""
+    windows, current, size = [], [], 0
+    for piece, piece_size in pieces:
+        if current and size + piece_size > budget:
+            windows.append(" ".join(current))
+            current, size = [], 0
+        current.append(piece)
+        size += piece_size
+    if current:
+        windows.append(" ".join(current))
+    return windows
+
+
+def _token_pieces(sentences: List[str], tokenizer, budget: int) -> List[List[Tuple[str, int]]]:
+    """(text, token count) pieces per sentence, oversized sentences cut at token boundaries"""
+    if not sentences:
+        return []
+    encoded = tokenizer(sentences, add_special_tokens=False, return_offsets_mapping=True)
+    pieces = []
+    for sentence, offsets in zip(sentences, encoded["offset_mapping"]):
+        if len(offsets) <= budget:
+            pieces.append([(sentence, len(offsets))])
+            continue
+        cut = []
+        for i in range(0, len(offsets), budget):
+            part = offsets[i:i + budget]
+            cut.append((sentence[part[0][0]:part[-1][1]], len(part)))
+        pieces.append(cut)
+    return pieces
+
+
+def chunk_texts(texts: Sequence[str], max_tokens: int = 512, tokenizer=None,
+                max_chars: int = 500) -> List[List[str]]:
+    """
+    Sentence-aligned windows for each text: at most `max_tokens` tokens
+    (including the model's special tokens) with `tokenizer`, else at most
+    `max_chars` characters. An empty text gives no windows.
+    """
+    texts = [text or "" for text in texts]
+    if tokenizer is not None:
+        budget = max(1, max_tokens - tokenizer.num_special_tokens_to_add(pair=False))
+        config = (getattr(tokenizer, "name_or_path", type(tokenizer).__name__), budget)
+    else:
+        budget = max_chars
+        config = ("chars", budget)
+
+    keys = [(text_hash(text), config) for text in texts]
+    result: List[Optional[List[str]]] = [_windows.get(key) for key in keys]
+    missing = list(dict.fromkeys(i for i, windows in enumerate(result) if windows is None))
+    if not missing:
+        return result
+
+    sentences = split_sentences_batch([texts[i] for i in missing])
+    if tokenizer is not None:
+        # One tokenizer call for every sentence of every text
+        flat = [s for text_sentences in sentences for s in text_sentences]
+        flat_pieces = _token_pieces(flat, tokenizer, budget)
+        per_text, offset = [], 0
+        for text_sentences in sentences:
+            per_text.append([p for pieces in flat_pieces[offset:offset + len(text_sentences)] for p in pieces])
+            offset += len(text_sentences)
+    else:
+        per_text = [
+            [
+                (s[j:j + budget], len(s[j:j + budget]))
+                for s in text_sentences
+                for j in range(0, len(s), budget)
+            ]
+            for text_sentences in sentences
+        ]
+
+    for i, pieces in zip(missing, per_text):
+        windows = _pack(pieces, budget)
+        _windows.put(keys[i], windows)
+        result[i] = windows
+    return result
+
+
+def chunk_text(text: str, max_tokens: int = 512, tokenizer=None, max_chars: int = 500) -> List[str]:
+    return chunk_texts([text], max_tokens=max_tokens, tokenizer=tokenizer, max_chars=max_chars)[0]
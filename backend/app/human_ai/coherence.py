@@ -0,0 +1,98 @@
+import sys
+from collections import OrderedDict
+from typing import Callable, List, Tuple
+
+# Sentences are cached by text hash, so a turn scored for sentiment is not
+# segmented again here
+from .chunking import split_sentences
+
+
+class CoherenceScorer:
+    """
+    Scores how well a new turn follows the previous one using an NLI model.
+
+    Every sentence of the new turn (hypothesis) is paired with the closing
+    sentences of the previous turn (premise) and all pairs are classified in
+    a single batch. Sentence token ids are cached for the lifetime of the
+    session, so a turn that becomes the next premise is not tokenized again.
+    The model still runs over every pair: a cross-encoder encodes premise and
+    hypothesis together, so there is no per-sentence encoding to reuse.
+    """
+    def __init__(self, get_classifier: Callable, max_premises: int = 8, max_pairs: int = 64,
+                 max_length: int = 256, cache_size: int = 2048):
+        # Callable returning the NLI text-classification pipeline, so the
+        # model is only resolved when the first score is requested
+        self.get_classifier = get_classifier
+        self.max_premises = max_premises
+        self.max_pairs = max_pairs
+        self.max_length = max_length
+        self.cache_size = cache_size
+        self._token_ids: "OrderedDict[str, List[int]]" = OrderedDict()
+
+    def reset(self):
+        """Drop cached token ids, e.g. when a new simulation starts"""
+        self._token_ids.clear()
+
+    def memory_footprint(self) -> int:
+        """Approximate bytes held by the token id cache"""
+        return sum(
+            sys.getsizeof(sentence) + sys.getsizeof(ids) + 28 * len(ids)
+            for sentence, ids in self._token_ids.items()
+        )
+
+    def _tokenize(self, sentences: List[str]) -> List[List[int]]:
+        """Return token ids for each sentence, tokenizing only unseen ones"""
+        missing = list(dict.fromkeys(s for s in sentences if s not in self._token_ids))
+        if missing:
+            token_ids = self.get_classifier().tokenizer(missing, add_special_tokens=False)["input_ids"]
+            self._token_ids.update(zip(missing, token_ids))
+
+        ids = []
+        for sentence in sentences:
+            self._token_ids.move_to_end(sentence)
+            ids.append(self._token_ids[sentence])
+
+        while len(self._token_ids) > self.cache_size:
+            self._token_ids.popitem(last=False)
+        return ids
+
+    def build_pairs(self, previous_turn: str, response: str) -> List[Tuple[str, str]]:
+        """Build premise/hypothesis sentence pairs across the two turns"""
+        premises = split_sentences(previous_turn)[-self.max_premises:]
+        hypotheses = split_sentences(response)
+        pairs = [(p, h) for h in hypotheses for p in premises]
+        return pairs[:self.max_pairs]
+
+    def score(self, previous_turn: str, response: str) -> float:
+        """Mean NLI confidence over all sentence pairs, 0 if there are none"""
+        pairs = self.build_pairs(previous_turn, response)
+        if not pairs:
+            return 0.0
+        scores = self.pair_scores(pairs)
+        return sum(scores) / len(scores)
+
+    def pair_scores(self, pairs: List[Tuple[str, str]]) -> List[float]:
+        """Top-label NLI confidence for each (premise, hypothesis) pair, in one batch"""
+        import torch
+
+        classifier = self.get_classifier()
+        tokenizer = classifier.tokenizer
+        model = classifier.model
+        premise_ids = self._tokenize([p for p, _ in pairs])
+        hypothesis_ids = self._tokenize([h for _, h in pairs])
+
+        features = [
+            tokenizer.prepare_for_model(
+                p_ids, h_ids,
+                truncation="longest_first",
+                max_length=self.max_length,
+            )
+            for p_ids, h_ids in zip(premise_ids, hypothesis_ids)
+        ]
+        batch = tokenizer.pad(features, return_tensors="pt").to(classifier.device)
+
+        with torch.no_grad():
+            logits = model(**batch).logits
+
+        # Same scale as the pipeline's top-label score used elsewhere
+        return logits.softmax(dim=-1).max(dim=-1).values.tolist()
@@ -0,0 +1,122 @@
+"""
+Local CPU embedding model with an on-disk cache keyed by content hash.
+
+Only import this module where embeddings are needed: it pulls in llama_index.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+from array import array
+from typing import Dict, List, Optional
+
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.embeddings import BaseEmbedding
+
+from ..config import settings
+
+
+class EmbeddingCache:
+    """SQLite table of float32 vectors keyed by sha256(model name + text)"""
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def key(model_name: str, text: str) -> str:
+        return hashlib.sha256(f"{model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        found = {}
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit
+            for i in range(0, len(keys), 500):
+                batch = keys[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})",
+                    batch,
+                ).fetchall()
+                for key, blob in rows:
+                    vector = array("f")
+                    vector.frombytes(blob)
+                    found[key] = vector.tolist()
+        return found
+
+    def put_many(self, items: Dict[str, List[float]]):
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, vector) VALUES (?, ?)",
+                [(key, array("f", vector).tobytes()) for key, vector in items.items()],
+            )
+            self._conn.commit()
+
+
+class CachedEmbedding(BaseEmbedding):
+    """
+    Wraps a llama_index embedding model so that every text is embedded at
+    most once: vectors are looked up in the cache by content hash and only
+    the misses reach the model.
+    """
+    _inner: BaseEmbedding = PrivateAttr()
+    _cache: EmbeddingCache = PrivateAttr()
+
+    def __init__(self, inner: BaseEmbedding, cache: EmbeddingCache, **kwargs):
+        super().__init__(model_name=inner.model_name, embed_batch_size=inner.embed_batch_size, **kwargs)
+        self._inner = inner
+        self._cache = cache
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CachedEmbedding"
+
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        keys = [EmbeddingCache.key(self.model_name, text) for text in texts]
+        cached = self._cache.get_many(keys)
+
+        missing = {key: text for key, text in zip(keys, texts) if key not in cached}
+        if missing:
+            vectors = self._inner._get_text_embeddings(list(missing.values()))
+            new = dict(zip(missing.keys(), vectors))
+            self._cache.put_many(new)
+            cached.update(new)
+
+        return [cached[key] for key in keys]
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._embed([text])[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return self._embed(texts)
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return self._inner._get_query_embedding(query)
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return self._get_query_embedding(query)
+
+
+_embed_model: Optional[CachedEmbedding] = None
+_lock = threading.Lock()
+
+
+def get_embed_model() -> CachedEmbedding:
+    """Process-wide cached local embedding model configured by settings"""
+    global _embed_model
+    if _embed_model is None:
+        with _lock:
+            if _embed_model is None:
+                from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+
+                inner = HuggingFaceEmbedding(
+                    model_name=settings.embedding_model,
+                    device="cpu",
+                    embed_batch_size=settings.embedding_batch_size,
+                )
+                _embed_model = CachedEmbedding(inner, EmbeddingCache(settings.embedding_cache_path))
+    return _embed_model
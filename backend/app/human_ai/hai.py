@@ -1,30 +1,26 @@
 from fastapi import FastAPI, HTTPException
-from transformers import pipeline, AutoTokenizer
 from pydantic import BaseModel
 from typing import List, Optional
+from collections import deque
+import asyncio
 import os
+import sys
 from dotenv import load_dotenv
-from llama_index.core import SimpleDirectoryReader, VectorStoreIndex, Settings
 from ..config import settings
+from ..llm.gateway import llm_gateway, Priority
+from ..db.storage import store
+from . import model_registry
+from .case_index import get_case_retriever
+from .chunking import chunk_text
+from .report_files import MultipartFileBody
+from .report_text import append_sections, seed_sections, turn_section
 import random
-import spacy
-from dotenv import load_dotenv
-from phi.agent import Agent, RunResponse
-from phi.knowledge.llamaindex import LlamaIndexKnowledgeBase
-from phi.model.openai import OpenAIChat
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib import colors
-from reportlab.lib.units import inch
-from io import BytesIO
 import requests
 
-load_dotenv()
+# transformers, llama_index, phi and reportlab are imported where they are
+# used so that importing this module (and starting the app) stays fast
 
-# Configure OpenAI settings
-Settings.chunk_size = 512
-Settings.chunk_overlap = 50
+load_dotenv()
 
 # Pydantic Models
 class LawyerContext(BaseModel):
@@ -50,27 +46,28 @@ class ProcessInputRequest(BaseModel):
 
 class ConversationList(BaseModel):
     conversations: List[LawyerContext]
+    next_cursor: Optional[str] = None
 
 class VectorDBMixin:
     """Base class for vector database functionality"""
-    def __init__(self):
-        # Initialize vector database
-        if not os.path.exists('case_reports'):
-            raise Exception("case_reports directory not found")
-            
-        documents = SimpleDirectoryReader(input_dir='case_reports').load_data()
-        self.index = VectorStoreIndex.from_documents(documents)
-        self.retriever = self.index.as_retriever()
+    def __init__(self, case_id: str):
+        # Retrieval is scoped to this case's own report, see case_index.py
+        self.case_id = case_id
+        self.retriever = get_case_retriever(case_id)
 
 class HumanAssistant(VectorDBMixin):
-    def __init__(self):
-        super().__init__()
+    def __init__(self, case_id: str):
+        super().__init__(case_id)
+        from phi.agent import Agent
+        from phi.knowledge.llamaindex import LlamaIndexKnowledgeBase
+        from phi.model.openai import OpenAIChat
+
         self.knowledge_base = LlamaIndexKnowledgeBase(retriever=self.retriever)
         self.summarising_agent = Agent(model=OpenAIChat(id="gpt-4o"),knowledge_base=self.knowledge_base, search_knowledge=True, debug_mode=True, show_tool_calls=True)
         self.context_checker = Agent(model=OpenAIChat(id="gpt-4o"),markdown=True,)
 
-    def ask(self,user_input):
-        context_needed = self.check_context_need(user_input)
+    async def ask(self,user_input):
+        context_needed = await self.check_context_need(user_input)
 
         if context_needed:
             prompt = (
@@ -78,32 +75,36 @@ class HumanAssistant(VectorDBMixin):
                 "Ensure that your response is thorough, well-organized, and tailored to the specific legal issues at hand."
                 "Also make sure to include as much context and evidence as possible."
             )
-            run: RunResponse = self.summarising_agent.run(prompt)
+            run: RunResponse = await llm_gateway.arun(self.summarising_agent, prompt, priority=Priority.LIVE)
             summarized_response = run.content
             return [user_input,summarized_response]
         else:
             return [user_input,"No context needed"]
         
-    def check_context_need(self, user_input):
+    async def check_context_need(self, user_input):
         prompt = (
             "You are an intelligent assistant to a lawyer. "
             "Based on the following statement by a lawyer, determine if additional legal context is needed:\n"
             f"'{user_input}'\n"
             "As long as the sentence is not a casual conversation sentence respond with 'yes' else 'no'"
         )
-        run: RunResponse = self.context_checker.run(prompt)
+        run: RunResponse = await llm_gateway.arun(self.context_checker, prompt, priority=Priority.LIVE)
         decision = run.content
         return decision[:3] == "Yes"
 
 class AILawyer(VectorDBMixin):
-    def __init__(self):
-        super().__init__()  # Initialize vector database
+    def __init__(self, case_id: str):
+        super().__init__(case_id)  # Initialize vector database
+        from phi.agent import Agent
+        from phi.knowledge.llamaindex import LlamaIndexKnowledgeBase
+        from phi.model.openai import OpenAIChat
+
         self.knowledge_base = LlamaIndexKnowledgeBase(retriever=self.retriever)
         self.RagAgent = Agent(model=OpenAIChat(id="gpt-4o"),knowledge_base=self.knowledge_base, search_knowledge=True, debug_mode=True, show_tool_calls=True)
 
-    def respond(self, query):
+    async def respond(self, query):
         # Generate response using insights
-        generated_response = self.generate_response_with_insights(query)
+        generated_response = await self.generate_response_with_insights(query)
         
         return {
             "input": "AI Lawyer's Argument",
@@ -111,7 +112,7 @@ class AILawyer(VectorDBMixin):
             "speaker": "ai"
         }
 
-    def generate_response_with_insights(self, query):
+    async def generate_response_with_insights(self, query):
         prompt = (
             "You are an experienced lawyer who is famous for being sharp and witty. "
             f"Now assuming that you are fighting a case in a court of law, respond to the following statement: {query}"
@@ -119,17 +120,17 @@ class AILawyer(VectorDBMixin):
             "If he is talking to you in a casual manner, you should respond in a casual manner too."
         )
 
-        run: RunResponse = self.RagAgent.run(prompt)
+        run: RunResponse = await llm_gateway.arun(self.RagAgent, prompt, priority=Priority.LIVE)
 
         return run.content
 
 class HumanLawyer:
-    def __init__(self):
-        self.assistant = HumanAssistant()
+    def __init__(self, case_id: str):
+        self.assistant = HumanAssistant(case_id)
 
-    def ask(self):
+    async def ask(self):
         argument = input("Human Lawyer: ")  # Prompt for user input #here is the post request part about how the input will be taken in the case of the user 
-        response = self.assistant.ask(argument)
+        response = await self.assistant.ask(argument)
         
         # Format output with input and context
         output = f"Input: {response[0]}. Context: {response[1]}."
@@ -139,40 +140,65 @@ class HumanLawyer:
 
 class Judge:
     def __init__(self):
-        self.conversations = []
+        # Only a short tail of the conversation is kept in memory; the full
+        # log lives in the case's Redis stream (see record_turn)
+        self.conversations = deque(maxlen=settings.hai_tail_window)
+        self.case_id = None
+        self._unlogged = []
+        # Set by start_simulation: the previous trial's turns are dropped
+        # before the first turn of the new one is logged
+        self._new_trial = False
         self.human1_score = 0
         self.human2_score = 0
         
-        # Initialize sentiment analysis pipelines
-        self.sentiment_analyzer = pipeline("sentiment-analysis", model="distilbert/distilbert-base-uncased-finetuned-sst-2-english")
-        self.coherence_model = pipeline("text-classification", model="textattack/bert-base-uncased-snli")
-        self.tokenizer = AutoTokenizer.from_pretrained("distilbert-base-uncased")
+        # Sentiment and coherence pipelines are shared across sessions and
+        # loaded by the model registry (warmed up in the background at startup),
+        # or served by the host-wide inference server when one is configured
+        self.coherence_scorer = model_registry.coherence_scorer()
         self.current_turn = None  # Track whose turn it is
+        self.case_status = "open"
+        self.winner = None
+        # Where the transcript PDF is written and turns are logged; the
+        # replay harness (benchmarks/trial_replay.py) points these at local stand-ins
+        self.reports_dir = "case_reports"
+        self.turn_log = store
+        # Score lead that ends the case after a human / AI turn
+        self.human_winning_margin = 0.1
+        self.ai_winning_margin = 0.2
+
+        from phi.agent import Agent
+        from phi.model.openai import OpenAIChat
         self.judge = Agent(model=OpenAIChat(id="gpt-4o"),markdown=True,)
 
+    @property
+    def sentiment_analyzer(self):
+        return model_registry.get_model("sentiment")
+
+    @property
+    def sentiment_tokenizer(self):
+        return model_registry.get_tokenizer("sentiment")
+
+    @property
+    def coherence_model(self):
+        return model_registry.get_model("coherence")
+
     def analyze_response(self, response, is_human):
         """Enhanced response analysis with chunking"""
-        def analyze_in_chunks(text, analyzer):
-            if len(text) > 500:
-                chunks = [text[i:i + 500] for i in range(0, len(text), 500)]
-                scores = []
-                for chunk in chunks:
-                    result = analyzer(chunk)
-                    scores.append(result[0]['score'])
-                return sum(scores) / len(scores)
-            else:
-                result = analyzer(text)
-                return result[0]['score']
+        def analyze_in_chunks(text, analyzer, tokenizer):
+            # Sentence-aligned windows that fit the model, as one batch
+            chunks = chunk_text(text, max_tokens=512, tokenizer=tokenizer, max_chars=500) or [text]
+            results = analyzer(chunks)
+            return sum(result['score'] for result in results) / len(results)
 
         # Calculate expression score
-        expression_score = analyze_in_chunks(response, self.sentiment_analyzer)
+        expression_score = analyze_in_chunks(response, self.sentiment_analyzer, self.sentiment_tokenizer)
 
-        # Calculate coherence score
+        # Calculate coherence score against the previous turn, sentence by sentence
         coherence_score = 0
         if len(self.conversations) > 1:
-            previous_response = self.conversations[-2].input + self.conversations[-2].context
-            coherence_input = f"{previous_response} {response}"
-            coherence_score = analyze_in_chunks(coherence_input, self.coherence_model)
+            previous = self.conversations[-2]
+            previous_response = f"{previous.input} {previous.context}"
+            coherence_score = self.coherence_scorer.score(previous_response, response)
 
         final_score = (expression_score + coherence_score) / 2
 
@@ -183,11 +209,91 @@ class Judge:
             
         return final_score
 
-    async def start_simulation(self):
+    def record_turn(self, turn: LawyerContext, case_id: Optional[str] = None):
+        """Add a turn to the in-memory tail and the case's conversation stream"""
+        self.conversations.append(turn)
+        if case_id:
+            self.case_id = case_id
+        if not self.case_id:
+            # The REST flow may start a simulation before naming the case
+            self._unlogged.append(turn)
+            return
+        try:
+            if self._new_trial:
+                self.turn_log.clear_turns(self.case_id)
+                self._new_trial = False
+            for pending in self._unlogged:
+                self.turn_log.append_turn(self.case_id, pending.dict())
+            self._unlogged = []
+            self.turn_log.append_turn(self.case_id, turn.dict())
+        except Exception as e:
+            print(f"Error logging conversation turn: {e}")
+
+    def memory_footprint(self) -> int:
+        """Approximate bytes held by this session's own state, shared models excluded"""
+        turns = list(self.conversations) + self._unlogged
+        return (
+            sys.getsizeof(self.conversations)
+            + sum(sys.getsizeof(t.input) + sys.getsizeof(t.context) + sys.getsizeof(t.speaker) for t in turns)
+            + self.coherence_scorer.memory_footprint()
+        )
+
+    def snapshot(self) -> dict:
+        """Scores, turn and status needed to resume this session; the turns are in the stream"""
+        return {
+            "case_id": self.case_id or "",
+            "human_score": getattr(self, "human_score", 0),
+            "ai_score": getattr(self, "ai_score", 0),
+            "current_turn": self.current_turn or "",
+            "case_status": self.case_status,
+            "winner": self.winner or "",
+        }
+
+    def restore(self, state: dict) -> TurnResponse:
+        """Resume a session from `snapshot()` state and the case's logged turns"""
+        self.case_id = state.get("case_id") or None
+        self.human_score = float(state.get("human_score") or 0)
+        self.ai_score = float(state.get("ai_score") or 0)
+        self.current_turn = state.get("current_turn") or None
+        self.case_status = state.get("case_status") or "open"
+        self.winner = state.get("winner") or None
+        if self.case_status == "closed":
+            self.current_turn = None
+        self._unlogged = []
+        self._new_trial = False
+        self.conversations.clear()
+        self.coherence_scorer.reset()
+        if self.case_id:
+            for _, turn in self.turn_log.get_last_turns(self.case_id, self.conversations.maxlen):
+                self.conversations.append(LawyerContext(**turn))
+
+        closed = self.case_status == "closed"
+        return TurnResponse(
+            next_turn="none" if closed else self.current_turn or "human",
+            case_status=self.case_status,
+            winner=self.winner,
+            score_difference=abs(self.human_score - self.ai_score) if closed else None,
+            current_response=self.conversations[-1] if self.conversations else LawyerContext(
+                input="The court is back in session.",
+                context="Please continue with your argument.",
+                speaker="judge",
+                score=0.0
+            ),
+            human_score=self.human_score,
+            ai_score=self.ai_score
+        )
+
+    async def start_simulation(self, case_id: Optional[str] = None):
         """Initialize a new simulation and return initial state"""
-        self.conversations = []
+        self.conversations.clear()
+        self.case_id = case_id
+        self._unlogged = []
+        self._new_trial = True
+        self.case_status = "open"
+        self.winner = None
         self.human_score = 0
         self.ai_score = 0
+        self.coherence_scorer.reset()
         
         # Create opening statement
         opening_statement = LawyerContext(
@@ -198,7 +304,7 @@ class Judge:
         )
         
         # Add to conversation history
-        self.conversations.append(opening_statement)
+        self.record_turn(opening_statement)
 
         # Randomly decide first turn
         self.current_turn = "human" 
@@ -212,7 +318,7 @@ class Judge:
         )
         
         # Add to conversation history
-        self.conversations.append(first_directive)
+        self.record_turn(first_directive)
         
         return TurnResponse(
             next_turn=self.current_turn,
@@ -224,11 +330,15 @@ class Judge:
 
     def append_to_case_pdf(self, case_id: str, conversation: LawyerContext):
         """Append a single conversation entry to the case PDF"""
+        from reportlab.lib.pagesizes import letter
+        from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+        from reportlab.lib.styles import getSampleStyleSheet
+
         try:
-            pdf_filename = f'case_reports/case_{case_id}.pdf'
+            pdf_filename = os.path.join(self.reports_dir, f'case_{case_id}.pdf')
             
             # Create temporary PDF for new content
-            temp_pdf = f'case_reports/temp_{case_id}.pdf'
+            temp_pdf = os.path.join(self.reports_dir, f'temp_{case_id}.pdf')
             doc = SimpleDocTemplate(temp_pdf, pagesize=letter)
             styles = getSampleStyleSheet()
             
@@ -244,6 +354,9 @@ class Judge:
             # Build PDF
             doc.build(story)
             
+            # Reports rendered before text capture are captured whole first
+            seed_sections(case_id, reports_dir=self.reports_dir)
+
             # Merge with existing PDF
             from PyPDF2 import PdfMerger, PdfReader
             merger = PdfMerger()
@@ -255,17 +368,28 @@ class Judge:
             # Add new content
             merger.append(PdfReader(open(temp_pdf, 'rb')))
             
-            # Write final PDF
-            with open(pdf_filename, 'wb') as output_file:
+            # Write the merged PDF beside the original and swap it in, so
+            # downloads that have the old one open keep reading it whole
+            merged_pdf = os.path.join(self.reports_dir, f'merged_{case_id}.pdf')
+            with open(merged_pdf, 'wb') as output_file:
                 merger.write(output_file)
+            merger.close()
+            os.replace(merged_pdf, pdf_filename)
             
             # Clean up temp file
             os.remove(temp_pdf)
+
+            # Keep the text alongside, so the case index never parses the PDF
+            append_sections(case_id, [turn_section(
+                conversation.speaker, conversation.input, conversation.context, conversation.score
+            )], reports_dir=self.reports_dir)
             
         except Exception as e:
             print(f"Error appending to PDF: {e}")
 
     async def process_input(self, request: ProcessInputRequest):
+        if self.case_status == "closed":
+            raise HTTPException(status_code=400, detail="The case is closed")
         if request.turn_type != self.current_turn:
             raise HTTPException(status_code=400, detail="Not your turn to speak")
 
@@ -274,9 +398,9 @@ class Judge:
                 if not request.input_text:
                     raise HTTPException(status_code=400, detail="Human input required")
                 
-                human_lawyer = HumanLawyer()
-                response = human_lawyer.assistant.ask(request.input_text)
-                score = self.analyze_response(response[1], is_human=True)
+                human_lawyer = self.new_human_lawyer(request.case_id)
+                response = await human_lawyer.assistant.ask(request.input_text)
+                score = await asyncio.to_thread(self.analyze_response, response[1], is_human=True)
                 
                 # Create human's response
                 human_response = LawyerContext(
@@ -287,18 +411,18 @@ class Judge:
                 )
                 
                 # Add to conversation and PDF
-                self.conversations.append(human_response)
+                self.record_turn(human_response, request.case_id)
                 self.append_to_case_pdf(request.case_id, human_response)
                 
                 # Generate and add judge's commentary
-                judge_comment = self.generate_judge_comment(human_response)
-                self.conversations.append(judge_comment)
+                judge_comment = await self.generate_judge_comment(human_response)
+                self.record_turn(judge_comment, request.case_id)
                 self.append_to_case_pdf(request.case_id, judge_comment)
 
                 # Check scores
                 score_difference = abs(self.human_score - self.ai_score)
-                if score_difference >= 0.1:
-                    return self.end_case(request.case_id)
+                if score_difference >= self.human_winning_margin:
+                    return await self.end_case(request.case_id)
                 
                 self.current_turn = "ai"
                 return TurnResponse(
@@ -310,9 +434,9 @@ class Judge:
                 )
                 
             else:  # AI turn
-                ai_lawyer = AILawyer()
-                ai_response_data = ai_lawyer.respond("Present your argument to the court")
-                score = self.analyze_response(ai_response_data["context"], is_human=False)
+                ai_lawyer = self.new_ai_lawyer(request.case_id)
+                ai_response_data = await ai_lawyer.respond("Present your argument to the court")
+                score = await asyncio.to_thread(self.analyze_response, ai_response_data["context"], is_human=False)
                 
                 # Create AI's response
                 ai_response = LawyerContext(
@@ -323,18 +447,18 @@ class Judge:
                 )
                 
                 # Add to conversation and PDF
-                self.conversations.append(ai_response)
+                self.record_turn(ai_response, request.case_id)
                 self.append_to_case_pdf(request.case_id, ai_response)
                 
                 # Generate and add judge's commentary
-                judge_comment = self.generate_judge_comment(ai_response)
-                self.conversations.append(judge_comment)
+                judge_comment = await self.generate_judge_comment(ai_response)
+                self.record_turn(judge_comment, request.case_id)
                 self.append_to_case_pdf(request.case_id, judge_comment)
 
                 # Check scores
                 score_difference = abs(self.human_score - self.ai_score)
-                if score_difference >= 0.2:
-                    return self.end_case(request.case_id)
+                if score_difference >= self.ai_winning_margin:
+                    return await self.end_case(request.case_id)
                 
                 self.current_turn = "human"
                 return TurnResponse(
@@ -352,35 +476,24 @@ class Judge:
                 detail=f"Error processing input: {str(e)}"
             )
 
-    def end_case(self, case_id: str):
+    def new_human_lawyer(self, case_id: str) -> HumanLawyer:
+        return HumanLawyer(case_id)
+
+    def new_ai_lawyer(self, case_id: str) -> AILawyer:
+        return AILawyer(case_id)
+
+    async def end_case(self, case_id: str):
         """Helper method to handle case ending"""
         winner = "Human Lawyer" if self.human_score > self.ai_score else "AI Lawyer"
         score_difference = abs(self.human_score - self.ai_score)
         
-        closing_statement = self.generate_closing_statement(winner, score_difference)
-        self.conversations.append(closing_statement)
-
-        # Create PDF file data to upload
-        pdf_data = BytesIO()
-        with open(f"case_reports/case_{case_id}.pdf", 'rb') as pdf_file:
-            pdf_data.write(pdf_file.read())
-        pdf_data.seek(0)
-        
-        files = {
-            'file': ('case_record.pdf', pdf_data, 'application/pdf')
-        }
-        
-        response = requests.post(
-            "https://api.pinata.cloud/pinning/pinFileToIPFS",
-            files=files,
-            headers={
-                'pinata_api_key': settings.pinata_api_key,
-                'pinata_secret_api_key': settings.pinata_secret_api_key
-            }
-        )
-        res = response.json()
+        closing_statement = await self.generate_closing_statement(winner, score_difference)
+        self.record_turn(closing_statement, case_id)
+        self.case_status = "closed"
+        self.winner = winner
+        self.current_turn = None
 
-        ipfs_hash = f"https://ipfs.io/ipfs/{res['IpfsHash']}"
+        ipfs_hash = await asyncio.to_thread(self.pin_case_record, os.path.join(self.reports_dir, f"case_{case_id}.pdf"))
 
         return TurnResponse(
             next_turn="none",
@@ -392,9 +505,26 @@ class Judge:
             ai_score=self.ai_score,
             ipfs_hash=ipfs_hash
         )
+
+    def pin_case_record(self, pdf_path: str) -> str:
+        """Upload the transcript PDF to IPFS through Pinata, returns its gateway URL"""
+        # The PDF is streamed from disk as the request is sent
+        with MultipartFileBody('file', 'case_record.pdf', pdf_path, 'application/pdf') as body:
+            response = requests.post(
+                "https://api.pinata.cloud/pinning/pinFileToIPFS",
+                data=body,
+                headers={
+                    'Content-Type': body.content_type,
+                    'pinata_api_key': settings.pinata_api_key,
+                    'pinata_secret_api_key': settings.pinata_secret_api_key
+                }
+            )
+        res = response.json()
+
+        return f"https://ipfs.io/ipfs/{res['IpfsHash']}"
       
 
-    def generate_judge_comment(self, last_response: LawyerContext) -> LawyerContext:
+    async def generate_judge_comment(self, last_response: LawyerContext) -> LawyerContext:
         """Generate judge's commentary after each argument"""
         prompt = (
             "You are an experienced judge presiding over a case. "
@@ -404,7 +534,7 @@ class Judge:
         )
         
         try:
-            run: RunResponse = self.judge.run(prompt)
+            run: RunResponse = await llm_gateway.arun(self.judge, prompt, priority=Priority.LIVE)
             comment = run.content
             next_speaker = "AI" if self.current_turn == "ai" else "Human"
             
@@ -423,7 +553,7 @@ class Judge:
                 score=0.0
             )
 
-    def generate_closing_statement(self, winner: str, score_difference: float) -> LawyerContext:
+    async def generate_closing_statement(self, winner: str, score_difference: float) -> LawyerContext:
         """Generate judge's closing statement"""
         prompt = (
             "You are an experienced judge presiding over a case. "
@@ -433,11 +563,11 @@ class Judge:
         )
         
         try:
-            run: RunResponse = self.judge.run(prompt)
+            run: RunResponse = await llm_gateway.arun(self.judge, prompt, priority=Priority.LIVE)
             response = run.content
             
             return LawyerContext(
-                input=response.choices[0].message.content,
+                input=response,
                 context="The court has reached a decision.",
                 speaker="judge",
                 score=0.0
@@ -0,0 +1,95 @@
+"""
+Inference backends for the text-classification models.
+
+    pytorch       transformers pipeline, fp32 (default)
+    pytorch-int8  same pipeline with Linear layers dynamically quantized to int8
+    onnx          model exported once to ONNX and run with ONNX Runtime
+    onnx-int8     the ONNX export, dynamically quantized to int8
+
+ONNX exports are written once under `cache_dir` and reused by every process.
+This module avoids importing the app settings so it can also be used by the
+content-verification scripts.
+"""
+import os
+import shutil
+import tempfile
+
+BACKENDS = ("pytorch", "pytorch-int8", "onnx", "onnx-int8")
+
+# Classifiers used across the backend: name -> (pipeline task, model id)
+CLASSIFIERS = {
+    "sentiment": ("sentiment-analysis", "distilbert/distilbert-base-uncased-finetuned-sst-2-english"),
+    "coherence": ("text-classification", "textattack/bert-base-uncased-snli"),
+    "ai_detection": ("text-classification", "akshayvkt/detect-ai-text"),
+}
+
+ONNX_FILE = "model.onnx"
+QUANTIZED_ONNX_FILE = "model_quantized.onnx"
+
+
+def _export_dir(model_id: str, cache_dir: str) -> str:
+    return os.path.join(cache_dir, model_id.replace("/", "--"), "onnx")
+
+
+def export_onnx(model_id: str, cache_dir: str, quantize: bool = False) -> str:
+    """Export (and optionally quantize) a model to ONNX once, returns its directory"""
+    from optimum.onnxruntime import ORTModelForSequenceClassification, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    from transformers import AutoTokenizer
+
+    export_dir = _export_dir(model_id, cache_dir)
+    if not os.path.exists(os.path.join(export_dir, ONNX_FILE)):
+        # Export into a temporary directory and move it into place, so
+        # concurrent workers never load a half-written model
+        os.makedirs(os.path.dirname(export_dir), exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(dir=os.path.dirname(export_dir))
+        model = ORTModelForSequenceClassification.from_pretrained(model_id, export=True)
+        model.save_pretrained(tmp_dir)
+        AutoTokenizer.from_pretrained(model_id).save_pretrained(tmp_dir)
+        try:
+            os.rename(tmp_dir, export_dir)
+        except OSError:
+            # Another worker finished the export first
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    if quantize and not os.path.exists(os.path.join(export_dir, QUANTIZED_ONNX_FILE)):
+        quantizer = ORTQuantizer.from_pretrained(export_dir, file_name=ONNX_FILE)
+        qconfig = AutoQuantizationConfig.avx2(is_static=False, per_channel=False)
+        tmp_dir = tempfile.mkdtemp(dir=os.path.dirname(export_dir))
+        quantizer.quantize(save_dir=tmp_dir, quantization_config=qconfig)
+        os.replace(os.path.join(tmp_dir, QUANTIZED_ONNX_FILE), os.path.join(export_dir, QUANTIZED_ONNX_FILE))
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    return export_dir
+
+
+def load_text_classifier(model_id: str, task: str = "text-classification",
+                         backend: str = "pytorch", cache_dir: str = "model_cache"):
+    """Return a transformers pipeline for `model_id` running on the chosen backend"""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend {backend!r}, expected one of {BACKENDS}")
+
+    from transformers import AutoTokenizer, pipeline
+
+    if backend == "pytorch":
+        return pipeline(task, model=model_id)
+
+    if backend == "pytorch-int8":
+        import torch
+
+        classifier = pipeline(task, model=model_id)
+        classifier.model = torch.quantization.quantize_dynamic(
+            classifier.model, {torch.nn.Linear}, dtype=torch.qint8
+        )
+        return classifier
+
+    from optimum.onnxruntime import ORTModelForSequenceClassification
+
+    quantize = backend == "onnx-int8"
+    export_dir = export_onnx(model_id, cache_dir, quantize=quantize)
+    model = ORTModelForSequenceClassification.from_pretrained(
+        export_dir,
+        file_name=QUANTIZED_ONNX_FILE if quantize else ONNX_FILE,
+    )
+    tokenizer = AutoTokenizer.from_pretrained(export_dir)
+    return pipeline(task, model=model, tokenizer=tokenizer)
@@ -0,0 +1,94 @@
+"""
+Clients for the inference sidecar (see inference_server.py).
+
+`RemoteClassifier` is called like a transformers text-classification
+pipeline and `RemoteCoherenceScorer` like a CoherenceScorer, so callers work
+the same whether models run in-process or in the sidecar. This module does
+not import the app settings.
+"""
+import socket
+import threading
+from typing import List, Optional, Tuple, Union
+
+import msgpack
+
+from .coherence import CoherenceScorer
+from .inference_server import HEADER, pack_message
+
+
+class InferenceError(RuntimeError):
+    pass
+
+
+class InferenceClient:
+    """Blocking client with one connection per thread, reconnecting after errors"""
+    def __init__(self, socket_path: str, timeout: float = 60.0):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self) -> socket.socket:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            conn.settimeout(self.timeout)
+            conn.connect(self.socket_path)
+            self._local.conn = conn
+        return conn
+
+    def _recv_exactly(self, conn: socket.socket, size: int) -> bytes:
+        data = bytearray()
+        while len(data) < size:
+            chunk = conn.recv(size - len(data))
+            if not chunk:
+                raise ConnectionError("Inference server closed the connection")
+            data.extend(chunk)
+        return bytes(data)
+
+    def request(self, message: dict, timeout: Optional[float] = None) -> dict:
+        """Send one request; `timeout` overrides the client's for this request only"""
+        try:
+            conn = self._connection()
+            conn.settimeout(timeout or self.timeout)
+            conn.sendall(pack_message(message))
+            (length,) = HEADER.unpack(self._recv_exactly(conn, HEADER.size))
+            response = msgpack.unpackb(self._recv_exactly(conn, length), raw=False)
+        except OSError:
+            conn = getattr(self._local, "conn", None)
+            if conn is not None:
+                conn.close()
+            self._local.conn = None
+            raise
+        if "error" in response:
+            raise InferenceError(response["error"])
+        return response
+
+    def classify(self, model: str, texts: List[str]) -> List[dict]:
+        return self.request({"op": "classify", "model": model, "texts": texts})["results"]
+
+    def score_pairs(self, model: str, pairs: List[Tuple[str, str]]) -> List[float]:
+        return self.request({"op": "pairs", "model": model, "pairs": [list(p) for p in pairs]})["scores"]
+
+    def status(self, timeout: Optional[float] = None) -> dict:
+        return self.request({"op": "status"}, timeout=timeout)
+
+
+class RemoteClassifier:
+    """Pipeline-like callable: a string or list of strings in, top-label dicts out"""
+    def __init__(self, client: InferenceClient, model: str):
+        self.client = client
+        self.model = model
+
+    def __call__(self, texts: Union[str, List[str]], **kwargs) -> List[dict]:
+        return self.client.classify(self.model, [texts] if isinstance(texts, str) else list(texts))
+
+
+class RemoteCoherenceScorer(CoherenceScorer):
+    """CoherenceScorer whose NLI batches run in the sidecar"""
+    def __init__(self, client: InferenceClient, model: str = "coherence", **kwargs):
+        super().__init__(get_classifier=None, **kwargs)
+        self.client = client
+        self.model = model
+
+    def pair_scores(self, pairs: List[Tuple[str, str]]) -> List[float]:
+        return self.client.score_pairs(self.model, pairs)
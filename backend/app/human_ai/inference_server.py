@@ -0,0 +1,211 @@
+"""
+Host-wide inference sidecar.
+
+Loads each classifier once and serves every API worker (and the
+content-verification scripts) on the host over a Unix socket:
+
+    python -m app.human_ai.inference_server --socket /tmp/justicechain-inference.sock
+
+Requests from all connections for the same model are queued together and
+run as one batch once `--max-batch` inputs are waiting or `--max-wait-ms`
+has passed since the first one arrived. Messages are msgpack maps, each
+prefixed with its length as a 4-byte big-endian integer:
+
+    {"op": "classify", "model": "sentiment", "texts": [...]}  -> {"results": [{"label", "score"}, ...]}
+    {"op": "pairs", "model": "coherence", "pairs": [[premise, hypothesis], ...]}  -> {"scores": [...]}
+    {"op": "status"}  -> {"models": {name: "loaded" | "loading" | "error: ..."}}
+
+Errors come back as {"error": "..."}. Like inference.py this module does not
+import the app settings.
+"""
+import argparse
+import asyncio
+import os
+import struct
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Tuple
+
+import msgpack
+
+from .coherence import CoherenceScorer
+from .inference import BACKENDS, CLASSIFIERS, load_text_classifier
+
+DEFAULT_SOCKET = "/tmp/justicechain-inference.sock"
+HEADER = struct.Struct(">I")
+# Models that also score (premise, hypothesis) pairs
+PAIR_MODELS = ("coherence",)
+
+
+async def read_message(reader: asyncio.StreamReader) -> dict:
+    (length,) = HEADER.unpack(await reader.readexactly(HEADER.size))
+    return msgpack.unpackb(await reader.readexactly(length), raw=False)
+
+
+def pack_message(message: dict) -> bytes:
+    body = msgpack.packb(message, use_bin_type=True)
+    return HEADER.pack(len(body)) + body
+
+
+class Batcher:
+    """
+    Collects inputs from concurrent requests and runs them through
+    `run_batch` together. Batches run one at a time on a dedicated thread,
+    so the model is never called concurrently.
+    """
+    def __init__(self, run_batch: Callable[[list], list], max_batch: int, max_wait: float):
+        self.run_batch = run_batch
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.queue: "asyncio.Queue[Tuple[list, asyncio.Future]]" = asyncio.Queue()
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.stats = {"batches": 0, "inputs": 0, "requests": 0}
+
+    async def submit(self, inputs: list) -> list:
+        if not inputs:
+            return []
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((inputs, future))
+        return await future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            requests = [await self.queue.get()]
+            size = len(requests[0][0])
+            deadline = loop.time() + self.max_wait
+            while size < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    request = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                requests.append(request)
+                size += len(request[0])
+
+            inputs = [item for batch, _ in requests for item in batch]
+            try:
+                outputs = await loop.run_in_executor(self.executor, self.run_batch, inputs)
+            except Exception as e:
+                for _, future in requests:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.stats["batches"] += 1
+            self.stats["inputs"] += len(inputs)
+            self.stats["requests"] += len(requests)
+            offset = 0
+            for batch, future in requests:
+                if not future.done():
+                    future.set_result(outputs[offset:offset + len(batch)])
+                offset += len(batch)
+
+
+class InferenceServer:
+    def __init__(self, models: List[str], backend: str, cache_dir: str, max_batch: int, max_wait: float):
+        self.models = models
+        self.backend = backend
+        self.cache_dir = cache_dir
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.status: Dict[str, str] = {name: "loading" for name in models}
+        self.batchers: Dict[Tuple[str, str], Batcher] = {}
+        self._tasks: List[asyncio.Task] = []
+
+    def _load(self, name: str):
+        task, model_id = CLASSIFIERS[name]
+        started = time.time()
+        classifier = load_text_classifier(model_id, task=task, backend=self.backend, cache_dir=self.cache_dir)
+        print(f"Loaded {name} ({model_id}, {self.backend}) in {time.time() - started:.1f}s")
+        return classifier
+
+    async def load_models(self):
+        loop = asyncio.get_running_loop()
+        for name in self.models:
+            try:
+                classifier = await asyncio.to_thread(self._load, name)
+            except Exception as e:
+                self.status[name] = f"error: {e}"
+                print(f"Error loading model {name}: {e}")
+                continue
+
+            def classify(texts, classifier=classifier):
+                return [
+                    {"label": r["label"], "score": float(r["score"])}
+                    for r in classifier(texts, batch_size=len(texts), truncation=True)
+                ]
+
+            ops = {"classify": classify}
+            if name in PAIR_MODELS:
+                # One scorer per host, so its sentence token id cache is shared by every worker
+                scorer = CoherenceScorer(lambda classifier=classifier: classifier, cache_size=16384)
+                ops["pairs"] = scorer.pair_scores
+            for op, run_batch in ops.items():
+                batcher = Batcher(run_batch, self.max_batch, self.max_wait)
+                self.batchers[(op, name)] = batcher
+                self._tasks.append(loop.create_task(batcher.run()))
+            self.status[name] = "loaded"
+
+    async def handle(self, request: dict) -> dict:
+        op = request.get("op")
+        if op == "status":
+            return {
+                "models": self.status,
+                "batches": {f"{kind}:{name}": b.stats for (kind, name), b in self.batchers.items()},
+            }
+
+        batcher = self.batchers.get((op, request.get("model")))
+        if batcher is None:
+            return {"error": f"{op} not available for model {request.get('model')!r} ({self.status})"}
+        if op == "classify":
+            return {"results": await batcher.submit(list(request["texts"]))}
+        return {"scores": await batcher.submit([tuple(pair) for pair in request["pairs"]])}
+
+    async def serve_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    request = await read_message(reader)
+                except asyncio.IncompleteReadError:
+                    break
+                try:
+                    response = await self.handle(request)
+                except Exception as e:
+                    response = {"error": str(e)}
+                writer.write(pack_message(response))
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self, socket_path: str):
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        server = await asyncio.start_unix_server(self.serve_connection, path=socket_path)
+        print(f"Inference server listening on {socket_path}")
+        await self.load_models()
+        async with server:
+            await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared inference server for the text classifiers")
+    parser.add_argument("--socket", default=os.getenv("INFERENCE_SOCKET") or DEFAULT_SOCKET)
+    parser.add_argument("--models", nargs="+", default=list(CLASSIFIERS), choices=list(CLASSIFIERS))
+    parser.add_argument("--backend", default=os.getenv("INFERENCE_BACKEND", "pytorch"), choices=BACKENDS)
+    parser.add_argument("--cache-dir", default=os.getenv("MODEL_CACHE_DIR", "model_cache"))
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    server = InferenceServer(args.models, args.backend, args.cache_dir, args.max_batch, args.max_wait_ms / 1000)
+    try:
+        asyncio.run(server.serve(args.socket))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+import threading
+from functools import lru_cache
+from typing import Dict, Optional
+from ..config import settings
+from .coherence import CoherenceScorer
+from .chunking import get_tokenizer as load_tokenizer
+from .inference import CLASSIFIERS, load_text_classifier
+from .inference_client import InferenceClient, RemoteClassifier, RemoteCoherenceScorer
+
+# Models shared by every Judge in this process, see inference.CLASSIFIERS
+MODELS = ("sentiment", "coherence")
+
+_models: Dict[str, object] = {}
+_errors: Dict[str, str] = {}
+_lock = threading.Lock()
+
+# Set when the models are served by the host-wide inference server
+_client: Optional[InferenceClient] = (
+    InferenceClient(settings.inference_socket) if settings.inference_socket else None
+)
+
+
+def get_model(name: str):
+    """Return the named pipeline, loading it on first use"""
+    if _client is not None:
+        return RemoteClassifier(_client, name)
+
+    model = _models.get(name)
+    if model is not None:
+        return model
+
+    with _lock:
+        if name not in _models:
+            task, model_id = CLASSIFIERS[name]
+            try:
+                _models[name] = load_text_classifier(
+                    model_id,
+                    task=task,
+                    backend=settings.inference_backend,
+                    cache_dir=settings.model_cache_dir,
+                )
+                _errors.pop(name, None)
+            except Exception as e:
+                _errors[name] = str(e)
+                raise
+        return _models[name]
+
+
+@lru_cache(maxsize=None)
+def get_tokenizer(name: str):
+    """Tokenizer of the named model for chunking, None if it cannot be loaded"""
+    try:
+        return load_tokenizer(CLASSIFIERS[name][1])
+    except Exception as e:
+        print(f"Error loading tokenizer {name}, chunking by characters: {e}")
+        return None
+
+
+def coherence_scorer() -> CoherenceScorer:
+    """A per-session coherence scorer backed by the shared NLI model"""
+    if _client is not None:
+        return RemoteCoherenceScorer(_client)
+    return CoherenceScorer(lambda: get_model("coherence"))
+
+
+def warm_up():
+    """Load every model, meant to run in a background thread at startup"""
+    if _client is not None:
+        # The inference server loads the models
+        return
+    for name in MODELS:
+        try:
+            get_model(name)
+        except Exception as e:
+            print(f"Error loading model {name}: {e}")
+
+
+def is_ready(models: Optional[dict] = None) -> bool:
+    """Whether every model is loaded, from `models` (a status() result) when given"""
+    return all(state == "loaded" for state in (models or status()).values())
+
+
+def status() -> dict:
+    """
+    Per-model load state for the readiness endpoint. With an inference server
+    this is a blocking round trip, bounded by inference_status_timeout_seconds.
+    """
+    if _client is not None:
+        try:
+            models = _client.status(timeout=settings.inference_status_timeout_seconds)["models"]
+        except Exception as e:
+            return {name: f"error: inference server unavailable ({e})" for name in MODELS}
+        return {name: models.get(name, "error: not served") for name in MODELS}
+
+    return {
+        name: "loaded" if name in _models else ("error: " + _errors[name] if name in _errors else "loading")
+        for name in MODELS
+    }
@@ -0,0 +1,152 @@
+"""
+Serving and uploading the case report PDFs without buffering them.
+
+Reports are replaced atomically (rendered to a temporary file, then moved
+into place), so a download or upload that has the file open keeps reading
+one consistent version. `generate_case_pdf` records the case version it
+rendered in `case_reports/case_{case_id}.rendered`; a report is stale once
+the case has been written since.
+"""
+import os
+import re
+import uuid
+from email.utils import formatdate, parsedate_to_datetime
+from io import BytesIO
+from typing import BinaryIO, Iterator, Optional, Tuple
+
+from .report_text import REPORTS_DIR, pdf_path
+
+CHUNK_SIZE = 64 * 1024
+# A single range: "bytes=first-last", "bytes=first-" or "bytes=-suffix"
+BYTE_RANGE = re.compile(r"^bytes=\s*(\d*)-(\d*)\s*$", re.IGNORECASE)
+
+
+def rendered_path(case_id: str, reports_dir: str = REPORTS_DIR) -> str:
+    return os.path.join(reports_dir, f"case_{case_id}.rendered")
+
+
+def write_rendered_version(case_id: str, version: int, reports_dir: str = REPORTS_DIR):
+    path = rendered_path(case_id, reports_dir)
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(str(version))
+    os.replace(tmp_path, path)
+
+
+def is_stale(case_id: str, version: int, updated_at: Optional[float], reports_dir: str = REPORTS_DIR) -> bool:
+    """Whether the report is missing or older than the case"""
+    try:
+        mtime = os.path.getmtime(pdf_path(case_id, reports_dir))
+    except FileNotFoundError:
+        return True
+    try:
+        with open(rendered_path(case_id, reports_dir)) as f:
+            return int(f.read() or 0) < version
+    except (FileNotFoundError, ValueError):
+        # Rendered before versions were recorded
+        return updated_at is not None and updated_at > mtime
+
+
+def file_etag(stat: os.stat_result) -> str:
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def http_date(timestamp: float) -> str:
+    return formatdate(timestamp, usegmt=True)
+
+
+def not_modified(if_none_match: Optional[str], if_modified_since: Optional[str],
+                 etag: str, mtime: float) -> bool:
+    """Conditional GET check; If-Modified-Since only counts without If-None-Match"""
+    if if_none_match:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or etag in tags
+    if if_modified_since:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    The inclusive (start, end) of a single `bytes=` range, None to send the
+    whole file: no header, several ranges, or a header that is not valid
+    range syntax (which RFC 9110 says to ignore). Raises ValueError when a
+    valid range cannot be satisfied.
+    """
+    match = BYTE_RANGE.match(header or "")
+    if not match or not (match.group(1) or match.group(2)):
+        return None
+    start, end = match.groups()
+    if not start:
+        # Suffix range: the last `end` bytes
+        length = int(end)
+        if length == 0 or size == 0:
+            raise ValueError(header)
+        return max(size - length, 0), size - 1
+    start = int(start)
+    if end and int(end) < start:
+        # last-pos before first-pos makes the range invalid, not unsatisfiable
+        return None
+    if start >= size:
+        raise ValueError(header)
+    return start, min(int(end), size - 1) if end else size - 1
+
+
+def iter_file(f: BinaryIO, start: int, end: int, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """Bytes start..end (inclusive) of an open file in chunks, closing it afterwards"""
+    try:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        f.close()
+
+
+class MultipartFileBody:
+    """
+    A multipart/form-data body with one file field, read from disk while it
+    is sent. `requests` streams file-like bodies and takes the
+    Content-Length from `len()`.
+    """
+    def __init__(self, field: str, filename: str, path: str, content_type: str):
+        boundary = uuid.uuid4().hex
+        self.content_type = f"multipart/form-data; boundary={boundary}"
+        head = (
+            f"--{boundary}\r\n"
+            f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+            f"Content-Type: {content_type}\r\n\r\n"
+        ).encode()
+        tail = f"\r\n--{boundary}--\r\n".encode()
+        self.file = open(path, "rb")
+        self.length = len(head) + os.fstat(self.file.fileno()).st_size + len(tail)
+        self.parts = [BytesIO(head), self.file, BytesIO(tail)]
+
+    def __len__(self) -> int:
+        return self.length
+
+    def read(self, size: int = -1) -> bytes:
+        data = b""
+        while self.parts and (size < 0 or len(data) < size):
+            chunk = self.parts[0].read(-1 if size < 0 else size - len(data))
+            if not chunk:
+                self.parts.pop(0)
+                continue
+            data += chunk
+        return data
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
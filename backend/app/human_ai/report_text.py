@@ -0,0 +1,141 @@
+"""
+Text of the case report PDFs, captured when they are rendered.
+
+`generate_case_pdf` and `Judge.append_to_case_pdf` write the same content
+they put in the PDF, unabridged, to `case_reports/case_{case_id}.jsonl`
+(one `{"section", "text"}` object per line), so the case index never has to
+parse a PDF back. The capture is only trusted if it is at least as new as
+the PDF; otherwise the PDF is parsed once and its text cached by path,
+mtime and size. Reports rendered before text capture get one, seeded from
+the parsed PDF, the first time something is appended to them.
+"""
+import hashlib
+import json
+import os
+import tempfile
+from typing import Iterable, List, Optional, Tuple
+
+from ..config import settings
+
+REPORTS_DIR = "case_reports"
+PARSED_CACHE_DIR = os.path.join(settings.model_cache_dir, "parsed_reports")
+
+Section = Tuple[str, str]
+
+
+def pdf_path(case_id: str, reports_dir: str = REPORTS_DIR) -> str:
+    return os.path.join(reports_dir, f"case_{case_id}.pdf")
+
+
+def text_path(case_id: str, reports_dir: str = REPORTS_DIR) -> str:
+    return os.path.join(reports_dir, f"case_{case_id}.jsonl")
+
+
+def _lines(sections: Iterable[Section]) -> str:
+    return "".join(json.dumps({"section": name, "text": text}) + "\n" for name, text in sections)
+
+
+def write_sections(case_id: str, sections: Iterable[Section], reports_dir: str = REPORTS_DIR):
+    """Replace the captured text, after the PDF has been (re)rendered"""
+    path = text_path(case_id, reports_dir)
+    fd, tmp_path = tempfile.mkstemp(dir=reports_dir)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(_lines(sections))
+    os.replace(tmp_path, path)
+
+
+def seed_sections(case_id: str, reports_dir: str = REPORTS_DIR):
+    """Capture the text of a PDF rendered without one, before appending to it"""
+    path = pdf_path(case_id, reports_dir)
+    if os.path.exists(text_path(case_id, reports_dir)) or not os.path.exists(path):
+        return
+    write_sections(case_id, [("report", parse_pdf_text(path))], reports_dir)
+
+
+def append_sections(case_id: str, sections: Iterable[Section], reports_dir: str = REPORTS_DIR):
+    """
+    Add text appended to the PDF. Without a capture to add to, nothing is
+    written: a file holding only the appended text would be trusted in place
+    of the whole report.
+    """
+    path = text_path(case_id, reports_dir)
+    if not os.path.exists(path):
+        return
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(_lines(sections))
+
+
+def case_sections(case: dict) -> List[Section]:
+    """Sections of a case report as rendered by generate_case_pdf"""
+    sections = [
+        ("title", f"Case Report: {case.get('title')}"),
+        ("details", "\n".join([
+            f"Case ID: {case.get('case_id')}",
+            f"Description: {case.get('description')}",
+            f"Status: {case.get('case_status')}",
+            f"Created At: {case.get('created_at')}",
+            f"Updated At: {case.get('updated_at')}",
+        ])),
+    ]
+    for lawyer in ("lawyer1", "lawyer2"):
+        if not case.get(f"{lawyer}_type"):
+            continue
+        sections.append((lawyer, "\n".join([
+            f"Lawyer Type: {case.get(f'{lawyer}_type')}",
+            f"Lawyer Address: {case.get(f'{lawyer}_address')}",
+        ])))
+        for evidence in case.get(f"{lawyer}_evidences") or []:
+            sections.append((f"{lawyer}_evidence", "\n".join([
+                f"IPFS Hash: {evidence.get('ipfs_hash')}",
+                f"Description: {evidence.get('description')}",
+                f"Original Name: {evidence.get('original_name')}",
+                f"Submitted At: {evidence.get('submitted_at')}",
+            ])))
+    return sections
+
+
+def turn_section(speaker: str, input: str, context: str, score: float) -> Section:
+    return ("turn", f"Speaker: {speaker}\nInput: {input}\nContext: {context}\nScore: {score}")
+
+
+def read_sections(case_id: str, reports_dir: str = REPORTS_DIR) -> Optional[List[dict]]:
+    """Captured sections, or None when missing or older than the PDF"""
+    path = text_path(case_id, reports_dir)
+    try:
+        if os.path.getmtime(path) < os.path.getmtime(pdf_path(case_id, reports_dir)):
+            return None
+    except FileNotFoundError:
+        if not os.path.exists(path):
+            return None
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def parse_pdf_text(path: str) -> str:
+    """Text of a PDF, parsed once per version of the file"""
+    stat = os.stat(path)
+    key = hashlib.sha256(f"{os.path.abspath(path)}\0{stat.st_mtime_ns}\0{stat.st_size}".encode()).hexdigest()
+    cache_path = os.path.join(PARSED_CACHE_DIR, f"{key}.txt")
+    if os.path.exists(cache_path):
+        with open(cache_path, "r", encoding="utf-8") as f:
+            return f.read()
+
+    from PyPDF2 import PdfReader
+
+    text = "\n".join(page.extract_text() or "" for page in PdfReader(path).pages)
+    os.makedirs(PARSED_CACHE_DIR, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=PARSED_CACHE_DIR)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, cache_path)
+    return text
+
+
+def report_version(case_id: str, reports_dir: str = REPORTS_DIR) -> Tuple[Optional[int], Optional[int]]:
+    """Changes whenever the PDF or its captured text changes"""
+    def mtime(path):
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+    return mtime(pdf_path(case_id, reports_dir)), mtime(text_path(case_id, reports_dir))
@@ -0,0 +1,131 @@
+"""
+Registry of live courtroom sessions in this worker.
+
+Every Judge in use (one per HAI websocket, plus the one shared by the REST
+routes) is registered with its last activity and an estimate of the memory
+its own state holds. A periodic sweep persists and evicts sessions that have
+been idle for `hai_session_idle_seconds`, then the least recently active ones
+while the total is over `hai_session_memory_budget_mb`. Evicted sessions are
+resumed from Redis when their case is opened again.
+"""
+import asyncio
+import itertools
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+from ..config import settings
+from ..db.storage import store
+from ..schema.models import to_iso
+
+
+@dataclass(slots=True)
+class Session:
+    session_id: str
+    kind: str  # "websocket" or "rest"
+    judge: object
+    case_id: Optional[str]
+    user_address: Optional[str]
+    on_evict: Callable[["Session", str], object]
+    created_at: float = field(default_factory=time.time)
+    last_activity: float = field(default_factory=time.time)
+
+    def footprint(self) -> int:
+        try:
+            return self.judge.memory_footprint()
+        except Exception:
+            return 0
+
+    def to_dict(self, now: float) -> dict:
+        return {
+            "session_id": self.session_id,
+            "kind": self.kind,
+            "case_id": self.judge.case_id or self.case_id,
+            "user_address": self.user_address,
+            "created_at": to_iso(self.created_at),
+            "last_activity": to_iso(self.last_activity),
+            "idle_seconds": round(now - self.last_activity, 1),
+            "footprint_bytes": self.footprint(),
+        }
+
+
+class SessionRegistry:
+    def __init__(self, idle_seconds: float, budget_bytes: int):
+        self.idle_seconds = idle_seconds
+        self.budget_bytes = budget_bytes
+        self.sessions: Dict[str, Session] = {}
+        self.evictions = 0
+        self._ids = itertools.count(1)
+
+    def register(self, kind: str, judge, on_evict: Callable[[Session, str], object],
+                 case_id: Optional[str] = None, user_address: Optional[str] = None) -> Session:
+        session = Session(f"{kind}-{next(self._ids)}", kind, judge, case_id, user_address, on_evict)
+        self.sessions[session.session_id] = session
+        return session
+
+    def touch(self, session: Session):
+        session.last_activity = time.time()
+
+    def unregister(self, session: Session):
+        self.sessions.pop(session.session_id, None)
+
+    async def evict(self, session: Session, reason: str):
+        """Persist the session's state, drop it and let its owner release it"""
+        if self.sessions.pop(session.session_id, None) is None:
+            return
+        case_id = session.judge.case_id or session.case_id
+        if case_id:
+            try:
+                await asyncio.to_thread(store.save_session, case_id, session.judge.snapshot())
+            except Exception as e:
+                print(f"Error persisting session {session.session_id}: {e}")
+        self.evictions += 1
+        try:
+            result = session.on_evict(session, reason)
+            if asyncio.iscoroutine(result):
+                await result
+        except Exception as e:
+            print(f"Error evicting session {session.session_id}: {e}")
+
+    async def sweep(self):
+        now = time.time()
+        for session in list(self.sessions.values()):
+            if now - session.last_activity > self.idle_seconds:
+                await self.evict(session, "idle")
+
+        by_activity = sorted(self.sessions.values(), key=lambda s: s.last_activity)
+        total = sum(s.footprint() for s in by_activity)
+        for session in by_activity:
+            if total <= self.budget_bytes:
+                break
+            total -= session.footprint()
+            await self.evict(session, "memory budget")
+
+    async def run(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.sweep()
+            except Exception as e:
+                print(f"Error sweeping sessions: {e}")
+
+    def status(self) -> dict:
+        now = time.time()
+        sessions: List[dict] = sorted(
+            (s.to_dict(now) for s in self.sessions.values()),
+            key=lambda s: s["footprint_bytes"],
+            reverse=True,
+        )
+        return {
+            "sessions": sessions,
+            "total_bytes": sum(s["footprint_bytes"] for s in sessions),
+            "budget_bytes": self.budget_bytes,
+            "idle_seconds": self.idle_seconds,
+            "evictions": self.evictions,
+        }
+
+
+sessions = SessionRegistry(
+    settings.hai_session_idle_seconds,
+    settings.hai_session_memory_budget_mb * 1024 * 1024,
+)
@@ -0,0 +1 @@
+# Shared gateway for all OpenAI agent calls
@@ -0,0 +1,255 @@
+"""
+Single gateway for every LLM agent call in the process.
+
+- Token buckets cap requests per minute and (estimated) tokens per minute.
+- Callers wait in priority order: live courtroom turns go ahead of batch
+  verification work.
+- Identical prompts that are already in flight are coalesced: followers wait
+  for the leader's response instead of sending the request again.
+
+Limits come from the environment so the content-verification scripts can use
+the gateway without the app settings:
+
+    LLM_REQUESTS_PER_MINUTE        default 500
+    LLM_TOKENS_PER_MINUTE          default 30000
+    LLM_COMPLETION_TOKEN_ESTIMATE  default 512, added to each prompt's estimate
+"""
+import asyncio
+import hashlib
+import heapq
+import itertools
+import os
+import threading
+import time
+from concurrent.futures import Future
+from enum import IntEnum
+from typing import Dict, Optional
+
+# Upper bounds (seconds) of the queue-wait histogram buckets
+WAIT_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 2, 5, 10, 30, 60)
+
+
+class Priority(IntEnum):
+    LIVE = 0         # courtroom turns a user is waiting on
+    INTERACTIVE = 1  # other request/response work
+    BATCH = 2        # offline verification
+
+
+class TokenBucket:
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def time_until(self, amount: float) -> float:
+        """Seconds until `amount` is available, 0 if it already is"""
+        return max(0.0, (amount - self.level) / self.rate)
+
+
+class LLMGateway:
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int,
+                 completion_token_estimate: int):
+        self.completion_token_estimate = completion_token_estimate
+        self._requests = TokenBucket(requests_per_minute)
+        self._tokens = TokenBucket(tokens_per_minute)
+        self._cond = threading.Condition()
+        self._waiting = []
+        self._async_waiters = []
+        self._seq = itertools.count()
+        self._inflight: Dict[str, Future] = {}
+        self._inflight_lock = threading.Lock()
+        self._metrics = {
+            p.name.lower(): {
+                "requests": 0,
+                "coalesced": 0,
+                "errors": 0,
+                "wait_seconds_total": 0.0,
+                "wait_seconds_max": 0.0,
+                "wait_histogram": [0] * (len(WAIT_BUCKETS) + 1),
+            }
+            for p in Priority
+        }
+
+    def estimate_tokens(self, prompt: str) -> int:
+        # Roughly four characters per token for English text
+        return len(prompt) // 4 + self.completion_token_estimate
+
+    def _coalesce_key(self, agent, prompt: str) -> str:
+        # Agents without knowledge or tools give the same answer for the same
+        # prompt, so their calls can be shared across agent instances. Agents
+        # that retrieve context are only coalesced with themselves.
+        if getattr(agent, "knowledge", None) is None and not getattr(agent, "tools", None):
+            identity = f"{agent.model.id}:{getattr(agent, 'markdown', False)}"
+        else:
+            identity = f"agent:{id(agent)}"
+        return hashlib.sha256(f"{identity}\0{prompt}".encode("utf-8")).hexdigest()
+
+    def _try_take(self, ticket, cost: float) -> Optional[float]:
+        """
+        Called with the condition held: 0 when `ticket` was admitted, the
+        seconds until the buckets allow it when it is first in line, None
+        when others are ahead of it
+        """
+        now = time.monotonic()
+        self._requests.refill(now)
+        self._tokens.refill(now)
+        if self._waiting[0] != ticket:
+            return None
+        delay = max(self._requests.time_until(1), self._tokens.time_until(cost))
+        if delay == 0:
+            heapq.heappop(self._waiting)
+            self._requests.level -= 1
+            self._tokens.level -= cost
+            self._notify()
+        return delay
+
+    def _notify(self):
+        """Wake sync and async waiters, called with the condition held"""
+        self._cond.notify_all()
+        for loop, event in self._async_waiters:
+            loop.call_soon_threadsafe(event.set)
+
+    def _acquire(self, priority: Priority, cost: int) -> float:
+        """Block until this caller is first in line and both buckets allow it"""
+        cost = min(cost, self._tokens.capacity)
+        ticket = (int(priority), next(self._seq))
+        start = time.monotonic()
+        with self._cond:
+            heapq.heappush(self._waiting, ticket)
+            while True:
+                delay = self._try_take(ticket, cost)
+                if delay == 0:
+                    return time.monotonic() - start
+                self._cond.wait(timeout=delay)
+
+    async def _aacquire(self, priority: Priority, cost: int) -> float:
+        """_acquire() for the event loop: waits on an asyncio.Event instead of blocking"""
+        cost = min(cost, self._tokens.capacity)
+        ticket = (int(priority), next(self._seq))
+        start = time.monotonic()
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self._cond:
+            heapq.heappush(self._waiting, ticket)
+            self._async_waiters.append(waiter)
+        admitted = False
+        try:
+            while True:
+                with self._cond:
+                    waiter[1].clear()
+                    delay = self._try_take(ticket, cost)
+                if delay == 0:
+                    admitted = True
+                    return time.monotonic() - start
+                try:
+                    await asyncio.wait_for(waiter[1].wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            with self._cond:
+                self._async_waiters.remove(waiter)
+                if not admitted:
+                    # Cancelled while queued: give up the place in line
+                    self._waiting.remove(ticket)
+                    heapq.heapify(self._waiting)
+                    self._notify()
+
+    def _record(self, priority: Priority, waited: Optional[float] = None,
+                coalesced: bool = False, error: bool = False):
+        with self._cond:
+            stats = self._metrics[priority.name.lower()]
+            stats["requests"] += 1
+            stats["coalesced"] += coalesced
+            stats["errors"] += error
+            if waited is not None:
+                stats["wait_seconds_total"] += waited
+                stats["wait_seconds_max"] = max(stats["wait_seconds_max"], waited)
+                bucket = next((i for i, bound in enumerate(WAIT_BUCKETS) if waited <= bound), len(WAIT_BUCKETS))
+                stats["wait_histogram"][bucket] += 1
+
+    def run(self, agent, prompt: str, priority: Priority = Priority.INTERACTIVE):
+        """Run `agent.run(prompt)` through the limiter, sharing identical in-flight calls"""
+        key = self._coalesce_key(agent, prompt)
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+
+        if not leader:
+            self._record(priority, coalesced=True)
+            return future.result()
+
+        waited = None
+        try:
+            waited = self._acquire(priority, self.estimate_tokens(prompt))
+            response = agent.run(prompt)
+            future.set_result(response)
+            self._record(priority, waited)
+            return response
+        except Exception as e:
+            future.set_exception(e)
+            self._record(priority, waited, error=True)
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+
+    async def arun(self, agent, prompt: str, priority: Priority = Priority.INTERACTIVE):
+        """
+        run() for the event loop: queues without blocking it and runs the
+        agent in a worker thread, so other requests are served meanwhile
+        """
+        key = self._coalesce_key(agent, prompt)
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+
+        if not leader:
+            self._record(priority, coalesced=True)
+            # Shielded: a follower that goes away must not cancel the shared call
+            return await asyncio.shield(asyncio.wrap_future(future))
+
+        waited = None
+        try:
+            waited = await self._aacquire(priority, self.estimate_tokens(prompt))
+            response = await asyncio.to_thread(agent.run, prompt)
+            future.set_result(response)
+            self._record(priority, waited)
+            return response
+        except BaseException as e:
+            future.set_exception(e if isinstance(e, Exception) else RuntimeError("LLM call cancelled"))
+            self._record(priority, waited, error=True)
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+
+    def metrics(self) -> dict:
+        with self._cond:
+            return {
+                "queue_depth": len(self._waiting),
+                "in_flight": len(self._inflight),
+                "requests_available": round(self._requests.level, 2),
+                "tokens_available": round(self._tokens.level, 2),
+                "wait_buckets": list(WAIT_BUCKETS) + ["+Inf"],
+                "by_priority": {
+                    name: {**stats, "wait_histogram": list(stats["wait_histogram"])}
+                    for name, stats in self._metrics.items()
+                },
+            }
+
+
+llm_gateway = LLMGateway(
+    requests_per_minute=int(os.getenv("LLM_REQUESTS_PER_MINUTE", "500")),
+    tokens_per_minute=int(os.getenv("LLM_TOKENS_PER_MINUTE", "30000")),
+    completion_token_estimate=int(os.getenv("LLM_COMPLETION_TOKEN_ESTIMATE", "512")),
+)
@@ -1,10 +1,39 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from app.api.cases.changes import change_feed
 from app.api.cases.routes import router as cases_router
 from app.websockets.routes import router as websocket_router
 from app.api.hai.routes import router as hai_router
+from app.config import settings
+from app.human_ai import model_registry
+from app.human_ai.sessions import sessions
+from app.llm.gateway import llm_gateway
+from app.websockets.connection_manager import manager as chat_manager
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the BERT pipelines in the background so the server binds right away;
+    # /readyz reports when they are available
+    warm_up = None
+    if settings.warm_up_models:
+        warm_up = asyncio.create_task(asyncio.to_thread(model_registry.warm_up))
+    # Persist and evict idle courtroom sessions, and keep them within the memory budget
+    session_sweeper = asyncio.create_task(sessions.run(settings.hai_session_sweep_seconds))
+    # Keep this worker's chat connections visible in the shared room presence
+    presence_heartbeats = asyncio.create_task(chat_manager.run_heartbeats(settings.room_heartbeat_seconds))
+    # Relay case changes to this worker's SSE streams and caches
+    change_feed.start()
+    yield
+    session_sweeper.cancel()
+    presence_heartbeats.cancel()
+    await change_feed.stop()
+    if warm_up is not None and not warm_up.done():
+        warm_up.cancel()
+
+app = FastAPI(lifespan=lifespan)
 
 # CORS configuration
 app.add_middleware(
@@ -18,4 +47,56 @@ app.add_middleware(
 # Include routers
 app.include_router(cases_router, prefix="/cases", tags=["cases"])
 app.include_router(websocket_router, tags=["websocket"])
-app.include_router(hai_router, prefix="/api/hai", tags=["hai"])
\ No newline at end of file
+app.include_router(hai_router, prefix="/api/hai", tags=["hai"])
+
+@app.get("/healthz", tags=["health"])
+async def healthz():
+    """Liveness: the worker is up and serving requests"""
+    return {"status": "ok"}
+
+@app.get("/readyz", tags=["health"])
+async def readyz():
+    """Readiness: the courtroom models have finished loading"""
+    # One status read per probe, off the event loop: with an inference
+    # server it is a socket round trip
+    models = await asyncio.to_thread(model_registry.status)
+    ready = model_registry.is_ready(models)
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"ready": ready, "models": models},
+    )
+
+@app.get("/metrics/llm", tags=["health"])
+async def llm_metrics():
+    """Queue depth, coalescing and queue-wait statistics of the LLM gateway"""
+    return llm_gateway.metrics()
+
+@app.get("/metrics/websockets", tags=["health"])
+async def websocket_metrics():
+    """Frames, messages and bytes sent on chat websockets by this worker"""
+    return {
+        "rooms": len(chat_manager.active_rooms),
+        "connections": sum(len(room["connections"]) for room in chat_manager.active_rooms.values()),
+        **chat_manager.stats,
+        **chat_manager.rooms.status(),
+    }
+
+@app.get("/metrics/changes", tags=["health"])
+async def change_feed_metrics():
+    """Case change feed subscribers in this worker and deltas delivered to them"""
+    return change_feed.status()
+
+@app.get("/admin/sessions", tags=["admin"])
+async def list_sessions():
+    """Live courtroom sessions in this worker with their memory footprint and last activity"""
+    return sessions.status()
+
+@app.delete("/admin/sessions/{session_id}", tags=["admin"])
+async def evict_session(session_id: str):
+    """Persist and evict a courtroom session now"""
+    session = sessions.sessions.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    await sessions.evict(session, "admin")
+    return {"evicted": session_id}
+
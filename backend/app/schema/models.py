@@ -0,0 +1,74 @@
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import List, Optional
+import time
+
+
+def now() -> float:
+    """Current time as epoch seconds, the format all stored timestamps use"""
+    return time.time()
+
+
+def to_iso(timestamp: Optional[float]) -> Optional[str]:
+    """Render an epoch timestamp as an ISO 8601 UTC string for API responses"""
+    if timestamp is None:
+        return None
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).isoformat()
+
+
+@dataclass(slots=True)
+class Evidence:
+    ipfs_hash: str
+    description: str
+    original_name: str
+    submitted_at: float
+
+    def to_dict(self) -> dict:
+        return {
+            "ipfs_hash": self.ipfs_hash,
+            "description": self.description,
+            "original_name": self.original_name,
+            "submitted_at": to_iso(self.submitted_at),
+        }
+
+
+@dataclass(slots=True)
+class Case:
+    case_id: str
+    title: str
+    description: str
+    lawyer1_type: str
+    lawyer1_address: str
+    case_status: str
+    mode: str
+    created_at: float
+    updated_at: float
+    lawyer2_type: Optional[str] = None
+    lawyer2_address: Optional[str] = None
+    lawyer1_evidences: List[Evidence] = field(default_factory=list)
+    lawyer2_evidences: List[Evidence] = field(default_factory=list)
+    # Incremented by every write, 0 for cases not written since versioning
+    version: int = 0
+
+    def evidences(self, lawyer: str) -> List[Evidence]:
+        """Evidence list for 'lawyer1' or 'lawyer2'"""
+        return self.lawyer1_evidences if lawyer == "lawyer1" else self.lawyer2_evidences
+
+    def to_dict(self) -> dict:
+        """Plain dict view of the case as returned by the API"""
+        return {
+            "case_id": self.case_id,
+            "title": self.title,
+            "description": self.description,
+            "lawyer1_type": self.lawyer1_type,
+            "lawyer1_address": self.lawyer1_address,
+            "lawyer1_evidences": [e.to_dict() for e in self.lawyer1_evidences],
+            "lawyer2_type": self.lawyer2_type,
+            "lawyer2_address": self.lawyer2_address,
+            "lawyer2_evidences": [e.to_dict() for e in self.lawyer2_evidences],
+            "case_status": self.case_status,
+            "mode": self.mode,
+            "created_at": to_iso(self.created_at),
+            "updated_at": to_iso(self.updated_at),
+            "version": self.version,
+        }
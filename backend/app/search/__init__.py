@@ -0,0 +1 @@
+# Cross-case search over case descriptions and evidence
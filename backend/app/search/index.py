@@ -0,0 +1,217 @@
+import re
+from array import array
+from typing import Iterable, List, Optional, Tuple
+
+from redis import Redis
+from redis.exceptions import ResponseError
+from redis.commands.search.field import TagField, TextField, VectorField
+from redis.commands.search.indexDefinition import IndexDefinition, IndexType
+from redis.commands.search.query import Query
+
+from ..config import settings
+from ..db.redis_db import redis_client
+
+DOC_PREFIX = "search:doc:"
+RETURN_FIELDS = [
+    "kind", "case_id", "lawyer", "lawyer_address", "title",
+    "name", "text", "ipfs_hash", "submitted_at",
+]
+# Reciprocal rank fusion constant used to merge keyword and vector rankings
+RRF_K = 60
+MAX_CANDIDATES = 1000
+
+TAG_SPECIAL = re.compile(r'([^A-Za-z0-9_])')
+WORD = re.compile(r'\w+')
+
+
+def escape_tag(value: str) -> str:
+    """Escape a value for use inside a RediSearch TAG filter"""
+    return TAG_SPECIAL.sub(r'\\\1', value)
+
+
+class CaseSearchIndex:
+    """
+    Keyword (inverted) and vector index over case descriptions and evidence.
+
+    Every case and every evidence item is stored as a hash under
+    `search:doc:`; a RediSearch index provides BM25 over the text fields and
+    KNN over the embedding, with TAG fields for filtering.
+    """
+    def __init__(self, redis: Redis, index_name: str = settings.search_index_name):
+        self.redis = redis
+        self.index_name = index_name
+        self._index_ready = False
+
+    @property
+    def embed_model(self):
+        # Shared local embedding model with the on-disk embedding cache
+        from ..human_ai.embeddings import get_embed_model
+        return get_embed_model()
+
+    def embed(self, texts: List[str]) -> List[bytes]:
+        """Embed texts as float32 byte strings suitable for a VECTOR field"""
+        vectors = self.embed_model.get_text_embedding_batch(texts)
+        return [array("f", vector).tobytes() for vector in vectors]
+
+    def ensure_index(self):
+        """Create the RediSearch index if it does not exist yet"""
+        if self._index_ready:
+            return
+        ft = self.redis.ft(self.index_name)
+        try:
+            ft.info()
+        except ResponseError:
+            dim = len(self.embed_model.get_query_embedding("dimension probe"))
+            ft.create_index(
+                [
+                    TagField("kind"),
+                    TagField("case_id"),
+                    TagField("lawyer"),
+                    TagField("lawyer_address"),
+                    TextField("title", weight=2.0),
+                    TextField("name", weight=2.0),
+                    TextField("text"),
+                    TagField("ipfs_hash"),
+                    VectorField("embedding", "HNSW", {
+                        "TYPE": "FLOAT32",
+                        "DIM": dim,
+                        "DISTANCE_METRIC": "COSINE",
+                    }),
+                ],
+                definition=IndexDefinition(prefix=[DOC_PREFIX], index_type=IndexType.HASH),
+            )
+        self._index_ready = True
+
+    def _write_docs(self, docs: List[dict]):
+        if not docs:
+            return
+        self.ensure_index()
+        embeddings = self.embed([f"{doc['name']}\n{doc['text']}" for doc in docs])
+
+        pipe = self.redis.pipeline(transaction=False)
+        for doc, embedding in zip(docs, embeddings):
+            key = f"{DOC_PREFIX}{doc.pop('doc_id')}"
+            pipe.hset(key, mapping={**{k: v or "" for k, v in doc.items()}, "embedding": embedding})
+        pipe.execute()
+
+    def index_case(self, case: dict):
+        """Index a case description along with all of its evidence"""
+        docs = [{
+            "doc_id": f"{case['case_id']}:case",
+            "kind": "case",
+            "case_id": case["case_id"],
+            "lawyer": "lawyer1",
+            "lawyer_address": case.get("lawyer1_address"),
+            "title": case.get("title"),
+            "name": case.get("title"),
+            "text": case.get("description"),
+            "ipfs_hash": None,
+            "submitted_at": case.get("created_at"),
+        }]
+        self._write_docs(docs)
+        for lawyer in ("lawyer1", "lawyer2"):
+            self.index_evidence(case, lawyer, case.get(f"{lawyer}_evidences") or [])
+
+    def index_evidence(self, case: dict, lawyer: str, evidences: Iterable[dict]):
+        """Index newly submitted evidence for one side of a case"""
+        docs = [{
+            "doc_id": f"{case['case_id']}:{lawyer}:{evidence['ipfs_hash']}",
+            "kind": "evidence",
+            "case_id": case["case_id"],
+            "lawyer": lawyer,
+            "lawyer_address": case.get(f"{lawyer}_address"),
+            "title": case.get("title"),
+            "name": evidence.get("original_name"),
+            "text": evidence.get("description"),
+            "ipfs_hash": evidence.get("ipfs_hash"),
+            "submitted_at": evidence.get("submitted_at"),
+        } for evidence in evidences]
+        self._write_docs(docs)
+
+    def _filter_clause(self, case_id: Optional[str], kind: Optional[str],
+                       lawyer_address: Optional[str]) -> str:
+        clauses = []
+        if case_id:
+            clauses.append(f"@case_id:{{{escape_tag(case_id)}}}")
+        if kind:
+            clauses.append(f"@kind:{{{escape_tag(kind)}}}")
+        if lawyer_address:
+            clauses.append(f"@lawyer_address:{{{escape_tag(lawyer_address)}}}")
+        return " ".join(clauses)
+
+    def _keyword_search(self, text: str, filters: str, num: int) -> Tuple[int, List[dict]]:
+        """(number of matching documents, the top `num` of them)"""
+        terms = WORD.findall(text)
+        if not terms:
+            return 0, []
+        query_str = f"({'|'.join(terms)}) {filters}".strip()
+        query = Query(query_str).return_fields(*RETURN_FIELDS).paging(0, num).dialect(2)
+        result = self.redis.ft(self.index_name).search(query)
+        return result.total, [{"id": doc.id, **{f: getattr(doc, f, "") for f in RETURN_FIELDS}} for doc in result.docs]
+
+    def _vector_search(self, text: str, filters: str, num: int) -> List[dict]:
+        base = f"({filters})" if filters else "*"
+        query = (
+            Query(f"{base}=>[KNN {num} @embedding $vec AS vector_score]")
+            .sort_by("vector_score")
+            .return_fields(*RETURN_FIELDS, "vector_score")
+            .paging(0, num)
+            .dialect(2)
+        )
+        vector = array("f", self.embed_model.get_query_embedding(text)).tobytes()
+        result = self.redis.ft(self.index_name).search(query, query_params={"vec": vector})
+        return [{"id": doc.id, **{f: getattr(doc, f, "") for f in RETURN_FIELDS}} for doc in result.docs]
+
+    def search(self, text: str, mode: str = "hybrid", case_id: Optional[str] = None,
+               kind: Optional[str] = None, lawyer_address: Optional[str] = None,
+               offset: int = 0, limit: int = 10) -> dict:
+        """
+        Search indexed documents; mode is 'keyword', 'semantic' or 'hybrid'.
+
+        `total` is the number of documents matching the keywords. Vector
+        search ranks every document, so it is None in semantic mode.
+        """
+        self.ensure_index()
+        filters = self._filter_clause(case_id, kind, lawyer_address)
+        num = min(offset + limit, MAX_CANDIDATES)
+
+        rankings, total = [], None
+        if mode in ("keyword", "hybrid"):
+            total, ranking = self._keyword_search(text, filters, num)
+            rankings.append(ranking)
+        if mode in ("semantic", "hybrid"):
+            rankings.append(self._vector_search(text, filters, num))
+
+        # Merge rankings with reciprocal rank fusion
+        scores, docs = {}, {}
+        for ranking in rankings:
+            for rank, doc in enumerate(ranking):
+                scores[doc["id"]] = scores.get(doc["id"], 0.0) + 1.0 / (RRF_K + rank + 1)
+                docs.setdefault(doc["id"], doc)
+
+        ordered = sorted(scores, key=scores.get, reverse=True)
+        results = []
+        for doc_id in ordered[offset:offset + limit]:
+            doc = docs[doc_id]
+            doc.pop("id")
+            doc.pop("vector_score", None)
+            results.append({**doc, "score": scores[doc_id]})
+
+        return {
+            "total": total,
+            "offset": offset,
+            "limit": limit,
+            "results": results,
+        }
+
+    def rebuild(self):
+        """Re-index every case in Redis, e.g. after the index is dropped"""
+        for case in redis_client.list_cases():
+            self.index_case(case.to_dict())
+
+
+search_index = CaseSearchIndex(redis_client.redis)
+
+
+if __name__ == "__main__":
+    search_index.rebuild()
@@ -1,50 +1,110 @@
+import asyncio
 from fastapi import WebSocket, WebSocketDisconnect, HTTPException
-from typing import Dict, List
-from ..db.async_redis import async_redis_client
+from typing import Dict, Iterable, List, Optional, Set
+from ..api.cases.changes import change_feed
+from ..config import settings
+from ..db.storage import async_store
+from .framing import PROTOCOLS, Connection, EncodedMessage, negotiate
+from .rooms import RoomRegistry
 import json
 from datetime import datetime
 
 class ConnectionManager:
     def __init__(self):
+        # room_id -> {"connections": {websocket: Connection}, "members": {websocket: presence member}}
         self.active_rooms: Dict[str, dict] = {}
+        # Wire counters across all rooms, see framing.Connection
+        self.stats = {"frames": 0, "messages": 0, "bytes": 0}
+        self.rooms = RoomRegistry(
+            settings.room_auth_ttl_seconds,
+            settings.room_auth_cache_size,
+            settings.room_presence_ttl_seconds,
+        )
+        change_feed.add_listener(self.rooms.on_case_change)
+        self._presence_tasks: Set[asyncio.Task] = set()
         
-    async def connect(self, websocket: WebSocket, room_id: str, user_address: str):
-        # Verify case exists and user has access using Okto user ID
-        case = await async_redis_client.get_case(room_id)
-        if not case:
+    async def connect(self, websocket: WebSocket, room_id: str, user_address: str,
+                      protocols: Iterable[str] = PROTOCOLS) -> Connection:
+        # Verify the case exists and the user is one of its lawyers, from
+        # the cached participant set (kept current by the change feed)
+        participants = await self.rooms.authorized(room_id)
+        if participants is None:
             raise HTTPException(status_code=404, detail="Case not found")
-        
-        # Check if the Okto user ID matches the lawyer1_address
-        if user_address != case["lawyer1_address"]:
+        if user_address not in participants:
             raise HTTPException(status_code=403, detail="Not authorized to join this chat")
-            
-        await websocket.accept()
-        if room_id not in self.active_rooms:
-            self.active_rooms[room_id] = {
-                "connections": []
-            }
-        self.active_rooms[room_id]["connections"].append((websocket, user_address))
+
+        protocol, subprotocol = negotiate(websocket, protocols)
+        await websocket.accept(subprotocol=subprotocol)
+        room = self.active_rooms.setdefault(room_id, {"connections": {}, "members": {}})
+        connection = Connection(websocket, user_address, protocol, self.stats)
+        member = self.rooms.member(user_address)
+        room["connections"][websocket] = connection
+        room["members"][websocket] = member
+        try:
+            await self.rooms.join(room_id, member)
+        except Exception as e:
+            print(f"Error recording presence in room {room_id}: {e}")
+        return connection
+
+    def get_connection(self, websocket: WebSocket, room_id: str) -> Optional[Connection]:
+        return self.active_rooms.get(room_id, {}).get("connections", {}).get(websocket)
     
     def disconnect(self, websocket: WebSocket, room_id: str):
-        if room_id in self.active_rooms:
-            self.active_rooms[room_id]["connections"] = [
-                conn for conn in self.active_rooms[room_id]["connections"] 
-                if conn[0] != websocket
+        room = self.active_rooms.get(room_id)
+        if room is None:
+            return
+        connection = room["connections"].pop(websocket, None)
+        if connection is not None:
+            connection.close()
+        member = room["members"].pop(websocket, None)
+        if member is not None:
+            task = asyncio.create_task(self._leave(room_id, member))
+            self._presence_tasks.add(task)
+            task.add_done_callback(self._presence_tasks.discard)
+        if not room["connections"]:
+            del self.active_rooms[room_id]
+
+    async def _leave(self, room_id: str, member: str):
+        try:
+            await self.rooms.leave(room_id, member)
+        except Exception as e:
+            print(f"Error clearing presence in room {room_id}: {e}")
+
+    async def run_heartbeats(self, interval: float):
+        """Refresh the presence of this worker's connections"""
+        while True:
+            await asyncio.sleep(interval)
+            members = [
+                (room_id, member)
+                for room_id, room in list(self.active_rooms.items())
+                for member in list(room["members"].values())
             ]
-            if not self.active_rooms[room_id]["connections"]:
-                del self.active_rooms[room_id]
+            try:
+                await self.rooms.heartbeat(members)
+            except Exception as e:
+                print(f"Error sending presence heartbeats: {e}")
+
+    async def get_presence(self, room_id: str) -> List[str]:
+        """Addresses connected to the room on any worker"""
+        return await self.rooms.present(room_id)
     
     async def broadcast_to_room(self, message: dict, room_id: str):
         if room_id in self.active_rooms:
             # Store message in Redis
-            await async_redis_client.append_chat_message(room_id, message)
+            await async_store.append_chat_message(room_id, message)
             
-            # Broadcast to all connections in the room
-            for connection, _ in self.active_rooms[room_id]["connections"]:
-                await connection.send_json(message)
+            # Encode once, then send (or batch) to all connections in the room
+            encoded = EncodedMessage(message)
+            for connection in list(self.active_rooms.get(room_id, {}).get("connections", {}).values()):
+                await connection.send(encoded)
     
     async def get_room_messages(self, room_id: str) -> List[dict]:
         """Get chat history from Redis"""
-        return await async_redis_client.get_chat_messages(room_id)
+        return await async_store.get_chat_messages(room_id)
+
+    async def send_history(self, connection: Connection, room_id: str):
+        """Replay the room's chat history to one connection"""
+        messages = await self.get_room_messages(room_id)
+        await connection.send_many([EncodedMessage(message) for message in messages])
 
-manager = ConnectionManager() 
\ No newline at end of file
+manager = ConnectionManager() 
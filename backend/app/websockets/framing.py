@@ -0,0 +1,151 @@
+"""
+Wire protocols for the chat websockets.
+
+Clients pick a protocol with the `Sec-WebSocket-Protocol` header
+(`justicechain.<name>`) or a `?protocol=<name>` query parameter:
+
+    json        one JSON text frame per message (default, for old clients)
+    json-batch  JSON text frames holding an array of messages
+    msgpack     binary frames holding a msgpack array of messages
+
+Batched protocols coalesce messages sent to a connection within a short
+window into one frame. Compression is left to the permessage-deflate
+extension negotiated by the server. Each message is encoded once per format
+and the bytes are shared by every recipient.
+"""
+import asyncio
+import struct
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import msgpack
+import orjson
+from fastapi import WebSocket
+
+JSON = "json"
+JSON_BATCH = "json-batch"
+MSGPACK = "msgpack"
+PROTOCOLS = (MSGPACK, JSON_BATCH, JSON)
+SUBPROTOCOL_PREFIX = "justicechain."
+
+BATCH_WINDOW_SECONDS = 0.02
+MAX_BATCH_SIZE = 256
+
+
+def negotiate(websocket: WebSocket, allowed: Iterable[str] = PROTOCOLS) -> Tuple[str, Optional[str]]:
+    """Return (protocol, subprotocol to echo in the handshake) for a new connection"""
+    allowed = tuple(allowed)
+    offered = [
+        p.strip() for p in websocket.headers.get("sec-websocket-protocol", "").split(",") if p.strip()
+    ]
+    for subprotocol in offered:
+        name = subprotocol[len(SUBPROTOCOL_PREFIX):] if subprotocol.startswith(SUBPROTOCOL_PREFIX) else None
+        if name in allowed:
+            return name, subprotocol
+
+    name = websocket.query_params.get("protocol")
+    if name in allowed:
+        return name, None
+    return JSON, None
+
+
+def msgpack_array_header(length: int) -> bytes:
+    if length < 16:
+        return bytes([0x90 | length])
+    if length < 0x10000:
+        return b"\xdc" + struct.pack(">H", length)
+    return b"\xdd" + struct.pack(">I", length)
+
+
+class EncodedMessage:
+    """A message plus its encodings, computed at most once per format"""
+    __slots__ = ("message", "_json", "_msgpack")
+
+    def __init__(self, message: dict):
+        self.message = message
+        self._json = None
+        self._msgpack = None
+
+    @property
+    def json(self) -> bytes:
+        if self._json is None:
+            self._json = orjson.dumps(self.message)
+        return self._json
+
+    @property
+    def msgpack(self) -> bytes:
+        if self._msgpack is None:
+            self._msgpack = msgpack.packb(self.message, use_bin_type=True)
+        return self._msgpack
+
+
+class Connection:
+    """One websocket in a room, with its protocol and pending outgoing batch"""
+    def __init__(self, websocket: WebSocket, user_address: str, protocol: str,
+                 stats: Dict[str, int], window: float = BATCH_WINDOW_SECONDS):
+        self.websocket = websocket
+        self.user_address = user_address
+        self.protocol = protocol
+        self.window = window
+        self.stats = stats
+        self._pending: List[EncodedMessage] = []
+        self._flush_task: Optional[asyncio.Task] = None
+
+    async def _send_frame(self, messages: List[EncodedMessage]):
+        if self.protocol == MSGPACK:
+            frame = msgpack_array_header(len(messages)) + b"".join(m.msgpack for m in messages)
+            await self.websocket.send_bytes(frame)
+        elif self.protocol == JSON_BATCH:
+            frame = b"[" + b",".join(m.json for m in messages) + b"]"
+            await self.websocket.send_text(frame.decode())
+        else:
+            frame = messages[0].json
+            await self.websocket.send_text(frame.decode())
+        self.stats["frames"] += 1
+        self.stats["messages"] += len(messages)
+        self.stats["bytes"] += len(frame)
+
+    async def send(self, message: EncodedMessage):
+        """Send now (json) or queue into the current batch (batched protocols)"""
+        if self.protocol == JSON:
+            await self._send_frame([message])
+            return
+        self._pending.append(message)
+        if len(self._pending) >= MAX_BATCH_SIZE:
+            await self.flush()
+        elif self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def send_many(self, messages: List[EncodedMessage]):
+        """Send a backlog (e.g. chat history) in as few frames as the protocol allows"""
+        if self.protocol == JSON:
+            for message in messages:
+                await self._send_frame([message])
+            return
+        await self.flush()
+        for i in range(0, len(messages), MAX_BATCH_SIZE):
+            await self._send_frame(messages[i:i + MAX_BATCH_SIZE])
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.window)
+        self._flush_task = None
+        await self.flush()
+
+    async def flush(self):
+        if self._flush_task is not None and self._flush_task is not asyncio.current_task():
+            self._flush_task.cancel()
+            self._flush_task = None
+        messages, self._pending = self._pending, []
+        if messages:
+            await self._send_frame(messages)
+
+    def close(self):
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        self._pending = []
+
+    def decode(self, event: dict) -> dict:
+        """Decode an incoming ASGI websocket.receive event into a message dict"""
+        if event.get("bytes") is not None:
+            return msgpack.unpackb(event["bytes"], raw=False)
+        return orjson.loads(event["text"])
@@ -0,0 +1,89 @@
+"""
+Chat room authorization and presence.
+
+The addresses allowed into a case's room (its lawyer1 and lawyer2) are
+cached per worker, so a join is a set lookup instead of a Redis read and
+case decode. Entries are replaced from the case change feed whenever the
+case is written, dropped wholesale on `resync`, and expire after
+`room_auth_ttl_seconds` as a backstop.
+
+Presence is shared across workers through the storage backend; with Redis
+it is `room:{id}:presence`, a sorted set of "{connection id}|{user address}"
+members scored by the time they expire. Each worker refreshes the members
+of its own connections every `room_heartbeat_seconds`; members of a worker
+that died without removing them expire after `room_presence_ttl_seconds`.
+"""
+import itertools
+import time
+import uuid
+from collections import OrderedDict
+from typing import FrozenSet, Iterable, List, Optional, Tuple
+
+from ..db.storage import async_store
+
+
+class RoomRegistry:
+    def __init__(self, auth_ttl: float, auth_cache_size: int, presence_ttl: float):
+        self.auth_ttl = auth_ttl
+        self.auth_cache_size = auth_cache_size
+        self.presence_ttl = presence_ttl
+        self.participants: "OrderedDict[str, Tuple[float, FrozenSet[str]]]" = OrderedDict()
+        self.worker_id = uuid.uuid4().hex[:12]
+        self._ids = itertools.count(1)
+        self.auth_hits = 0
+        self.auth_misses = 0
+
+    def _cache(self, case_id: str, addresses: Iterable[Optional[str]]) -> FrozenSet[str]:
+        participants = frozenset(a for a in addresses if a)
+        self.participants[case_id] = (time.monotonic() + self.auth_ttl, participants)
+        self.participants.move_to_end(case_id)
+        while len(self.participants) > self.auth_cache_size:
+            self.participants.popitem(last=False)
+        return participants
+
+    async def authorized(self, case_id: str) -> Optional[FrozenSet[str]]:
+        """Addresses allowed into the case's room, None if the case does not exist"""
+        cached = self.participants.get(case_id)
+        if cached is not None and cached[0] > time.monotonic():
+            self.auth_hits += 1
+            return cached[1]
+
+        self.auth_misses += 1
+        case = await async_store.get_case(case_id)
+        if not case:
+            self.participants.pop(case_id, None)
+            return None
+        return self._cache(case_id, (case.lawyer1_address, case.lawyer2_address))
+
+    def on_case_change(self, change: dict):
+        """Change feed listener: refresh rooms this worker knows about"""
+        if change.get("type") == "resync":
+            self.participants.clear()
+        elif change.get("case_id") in self.participants:
+            self._cache(change["case_id"], change.get("lawyers") or ())
+
+    def member(self, user_address: str) -> str:
+        """Presence member for a new connection"""
+        return f"{self.worker_id}:{next(self._ids)}|{user_address}"
+
+    async def join(self, case_id: str, member: str):
+        await async_store.touch_presence([(case_id, member)], self.presence_ttl)
+
+    async def leave(self, case_id: str, member: str):
+        await async_store.remove_presence(case_id, member)
+
+    async def heartbeat(self, members: Iterable[Tuple[str, str]]):
+        """Keep this worker's (case_id, member) entries alive, pruning expired ones"""
+        await async_store.touch_presence(list(members), self.presence_ttl)
+
+    async def present(self, case_id: str) -> List[str]:
+        """Addresses connected to the room on any worker"""
+        members = await async_store.get_presence(case_id)
+        return sorted({member.partition("|")[2] for member in members})
+
+    def status(self) -> dict:
+        return {
+            "cached_rooms": len(self.participants),
+            "auth_hits": self.auth_hits,
+            "auth_misses": self.auth_misses,
+        }
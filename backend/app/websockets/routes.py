@@ -1,13 +1,20 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, HTTPException
 from .connection_manager import manager
+from .framing import JSON, EncodedMessage
 from ..schema.schemas import ChatMessageSchema
 from ..human_ai.hai import Judge, ProcessInputRequest
-import json
+from ..human_ai.sessions import sessions
+from ..db.storage import store
 from pydantic import ValidationError
 import asyncio
 
 router = APIRouter()
 
+@router.get("/rooms/{case_id}/presence")
+async def room_presence(case_id: str):
+    """Addresses connected to the case's chat room, across all workers"""
+    return {"case_id": case_id, "present": await manager.get_presence(case_id)}
+
 @router.websocket("/ws/{case_id}/{user_address}")
 async def websocket_endpoint(websocket: WebSocket, case_id: str, user_address: str):    
     """
@@ -16,12 +23,10 @@ async def websocket_endpoint(websocket: WebSocket, case_id: str, user_address: s
     Only lawyers involved in the case can join.
     """
     try:
-        await manager.connect(websocket, case_id, user_address)
+        connection = await manager.connect(websocket, case_id, user_address)
         
         # Send chat history to new connection
-        chat_history = manager.get_room_messages(case_id)
-        for message in chat_history:
-            await websocket.send_json(message)
+        await manager.send_history(connection, case_id)
         
         # Notify others about new user
         await manager.broadcast_to_room(
@@ -36,10 +41,12 @@ async def websocket_endpoint(websocket: WebSocket, case_id: str, user_address: s
         
         try:
             while True:
-                # Receive and validate messages
-                data = await websocket.receive_text()
+                # Receive and validate messages (text or binary, per protocol)
+                event = await websocket.receive()
+                if event["type"] == "websocket.disconnect":
+                    raise WebSocketDisconnect(event.get("code", 1000))
                 try:
-                    message_data = json.loads(data)
+                    message_data = connection.decode(event)
                     message = ChatMessageSchema(
                         type="chat",
                         content=message_data["content"],
@@ -49,11 +56,11 @@ async def websocket_endpoint(websocket: WebSocket, case_id: str, user_address: s
                     
                     await manager.broadcast_to_room(message.dict(), case_id)
                     
-                except (ValidationError, KeyError) as e:
-                    await websocket.send_json({
+                except (ValidationError, KeyError, TypeError, ValueError) as e:
+                    await connection.send(EncodedMessage({
                         "type": "error",
                         "content": "Invalid message format"
-                    })
+                    }))
                     continue
                 
         except WebSocketDisconnect:
@@ -77,13 +84,25 @@ async def websocket_endpoint(websocket: WebSocket, case_id: str, user_address: s
 @router.websocket("/ws/hai/{case_id}/{user_address}")
 async def hai_websocket_endpoint(websocket: WebSocket, case_id: str, user_address: str):
     try:
-        await manager.connect(websocket, case_id, user_address)
+        # The HAI client speaks plain JSON only
+        await manager.connect(websocket, case_id, user_address, protocols=(JSON,))
         judge = Judge()
+
+        async def close_evicted(session, reason):
+            manager.disconnect(websocket, case_id)
+            await websocket.close(code=4000, reason=f"Session evicted ({reason}), reconnect to resume")
+
+        session = sessions.register("websocket", judge, close_evicted, case_id, user_address)
         
         try:
-            # Start simulation
-            print("Starting simulation...")
-            initial_state = await judge.start_simulation()
+            # Resume a session that was evicted earlier, otherwise start a new one
+            saved_state = store.pop_session(case_id)
+            if saved_state:
+                print("Resuming simulation...")
+                initial_state = judge.restore(saved_state)
+            else:
+                print("Starting simulation...")
+                initial_state = await judge.start_simulation(case_id)
             print("Initial state:", initial_state.dict())
             
             # Send initial judge statement
@@ -123,6 +142,7 @@ async def hai_websocket_endpoint(websocket: WebSocket, case_id: str, user_addres
             while True:
                 try:
                     data = await websocket.receive_json()
+                    sessions.touch(session)
                     
                     if data["type"] == "human_input":
                         # Process human input and get response
@@ -152,12 +172,16 @@ async def hai_websocket_endpoint(websocket: WebSocket, case_id: str, user_addres
                                 "data": ai_response.dict()
                             })
                     
+                    sessions.touch(session)
+                    
                 except WebSocketDisconnect:
                     manager.disconnect(websocket, case_id)
                     break
                     
         except WebSocketDisconnect:
             manager.disconnect(websocket, case_id)
+        finally:
+            sessions.unregister(session)
             
     except HTTPException as he:
         await websocket.close(code=he.status_code, reason=str(he.detail)) 
\ No newline at end of file
@@ -0,0 +1,140 @@
+"""
+Compare the typed case model and its Redis codec against plain dicts and
+stdlib json.
+
+Times the path cases take in production: encoding is `case_to_hash` plus
+`encode_evidence` for each evidence item (what `queue_case_write` stores),
+decoding is `case_from_parts` on the hash and evidence lists as redis-py
+returns them. Also reports the stored bytes and the memory held per decoded
+case. Run from the backend directory:
+
+    python -m benchmarks.case_codec_benchmark --cases 5000 --evidences 10
+"""
+import argparse
+import json
+import time
+import tracemalloc
+import uuid
+
+from app.db.codec import case_from_parts, case_to_hash, encode_evidence
+from app.schema.models import Case, Evidence
+
+LEGACY_TIME = "19-10-2026 10:00:00"
+
+
+def make_dict_case(evidences: int) -> dict:
+    """A case as the API used to build and store it"""
+    return {
+        "case_id": str(uuid.uuid4()),
+        "title": "Breach of asset transfer agreement",
+        "description": "The respondent failed to transfer the agreed assets. " * 8,
+        "lawyer1_type": "Human",
+        "lawyer1_address": "0x" + uuid.uuid4().hex + "abcdef01",
+        "lawyer1_evidences": [
+            {
+                "ipfs_hash": "Qm" + uuid.uuid4().hex + uuid.uuid4().hex[:12],
+                "description": "Signed agreement between both parties. " * 4,
+                "original_name": f"evidence_{i}.pdf",
+                "submitted_at": LEGACY_TIME,
+            } for i in range(evidences)
+        ],
+        "lawyer2_type": "AI",
+        "lawyer2_address": None,
+        "lawyer2_evidences": [],
+        "case_status": "Open",
+        "mode": "human-ai",
+        "created_at": LEGACY_TIME,
+        "updated_at": LEGACY_TIME,
+    }
+
+
+def make_typed_case(data: dict) -> Case:
+    ts = time.time()
+    return Case(
+        case_id=data["case_id"],
+        title=data["title"],
+        description=data["description"],
+        lawyer1_type=data["lawyer1_type"],
+        lawyer1_address=data["lawyer1_address"],
+        lawyer1_evidences=[
+            Evidence(e["ipfs_hash"], e["description"], e["original_name"], ts)
+            for e in data["lawyer1_evidences"]
+        ],
+        lawyer2_type=data["lawyer2_type"],
+        case_status=data["case_status"],
+        mode=data["mode"],
+        created_at=ts,
+        updated_at=ts,
+    )
+
+
+def encode_stored(case: Case):
+    """The hash mapping and per-lawyer evidence lists queue_case_write stores"""
+    return (
+        case_to_hash(case),
+        [encode_evidence(e) for e in case.lawyer1_evidences],
+        [encode_evidence(e) for e in case.lawyer2_evidences],
+    )
+
+
+def as_read(stored) -> tuple:
+    """Stored parts as read back with decode_responses=True"""
+    fields, lawyer1, lawyer2 = stored
+    return fields, [e.decode() for e in lawyer1], [e.decode() for e in lawyer2]
+
+
+def decode_stored(parts) -> Case:
+    return case_from_parts(*parts)
+
+
+def stored_size(parts) -> int:
+    fields, lawyer1, lawyer2 = parts
+    return sum(len(k) + len(v.encode()) for k, v in fields.items()) + sum(len(e.encode()) for e in lawyer1 + lawyer2)
+
+
+def throughput(fn, items) -> float:
+    start = time.perf_counter()
+    for item in items:
+        fn(item)
+    return len(items) / (time.perf_counter() - start)
+
+
+def memory_per_case(factory, count: int) -> float:
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    held = [factory() for _ in range(count)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    size = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    del held
+    return size / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cases", type=int, default=5000)
+    parser.add_argument("--evidences", type=int, default=10)
+    args = parser.parse_args()
+
+    dict_cases = [make_dict_case(args.evidences) for _ in range(args.cases)]
+    typed_cases = [make_typed_case(c) for c in dict_cases]
+    json_blobs = [json.dumps(c) for c in dict_cases]
+    stored_parts = [as_read(encode_stored(c)) for c in typed_cases]
+
+    rows = [
+        ("dict + json", throughput(json.dumps, dict_cases), throughput(json.loads, json_blobs),
+         sum(map(len, json_blobs)) / args.cases,
+         memory_per_case(lambda: json.loads(json_blobs[0]), args.cases)),
+        ("Case + hash codec", throughput(encode_stored, typed_cases), throughput(decode_stored, stored_parts),
+         sum(map(stored_size, stored_parts)) / args.cases,
+         memory_per_case(lambda: decode_stored(stored_parts[0]), args.cases)),
+    ]
+
+    print(f"{args.cases} cases, {args.evidences} evidences each")
+    print(f"{'format':<22}{'encode/s':>12}{'decode/s':>12}{'bytes/case':>12}{'mem/case':>12}")
+    for name, enc, dec, size, mem in rows:
+        print(f"{name:<22}{enc:>12.0f}{dec:>12.0f}{size:>12.0f}{mem:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Benchmark the inference backends and check their accuracy against PyTorch fp32.
+
+For every classifier in app.human_ai.inference.CLASSIFIERS and every backend,
+measures load time, single-text and batched throughput, and compares the
+predicted labels and scores with the plain PyTorch pipeline. The first run
+also performs the one-time ONNX export into --cache-dir. Run from the
+backend directory:
+
+    python -m benchmarks.inference_backends --backends onnx onnx-int8 --min-agreement 0.97
+
+Exits non-zero if any backend's label agreement is below --min-agreement.
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+from app.human_ai.inference import BACKENDS, CLASSIFIERS, load_text_classifier
+
+SAMPLE_SOURCES = [
+    "app/content-verification/case.txt",
+    "content-verification/references/*.txt",
+    "app/content-verification/output/*.txt",
+]
+
+
+def load_samples(limit: int, chunk_size: int = 500):
+    """Case and evidence text from the repo, cut to the length the app scores"""
+    samples = []
+    for pattern in SAMPLE_SOURCES:
+        for path in sorted(glob.glob(pattern)):
+            with open(path, "r", encoding="utf-8", errors="ignore") as f:
+                text = f.read()
+            samples.extend(
+                chunk for chunk in (text[i:i + chunk_size] for i in range(0, len(text), chunk_size))
+                if chunk.strip()
+            )
+    if not samples:
+        samples = ["The respondent failed to transfer the agreed assets before the deadline."]
+    while len(samples) < limit:
+        samples.extend(samples)
+    return samples[:limit]
+
+
+def run(classifier, texts, batch_size):
+    start = time.perf_counter()
+    single = [classifier(text, truncation=True)[0] for text in texts]
+    single_rate = len(texts) / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    classifier(texts, batch_size=batch_size, truncation=True)
+    batch_rate = len(texts) / (time.perf_counter() - start)
+    return single, single_rate, batch_rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--models", nargs="+", default=list(CLASSIFIERS), choices=list(CLASSIFIERS))
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS[1:]), choices=list(BACKENDS))
+    parser.add_argument("--samples", type=int, default=64)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--cache-dir", default="model_cache")
+    parser.add_argument("--min-agreement", type=float, default=0.95)
+    args = parser.parse_args()
+
+    texts = load_samples(args.samples)
+    failed = False
+
+    print(f"{'model':<14}{'backend':<14}{'load s':>8}{'single/s':>10}{'batch/s':>10}{'agree':>8}{'max dscore':>12}")
+    for name in args.models:
+        task, model_id = CLASSIFIERS[name]
+
+        baseline = load_text_classifier(model_id, task=task, backend="pytorch")
+        reference, single_rate, batch_rate = run(baseline, texts, args.batch_size)
+        print(f"{name:<14}{'pytorch':<14}{'-':>8}{single_rate:>10.1f}{batch_rate:>10.1f}{'1.000':>8}{'0.0000':>12}")
+        del baseline
+
+        for backend in args.backends:
+            if backend == "pytorch":
+                continue
+            start = time.perf_counter()
+            classifier = load_text_classifier(model_id, task=task, backend=backend, cache_dir=args.cache_dir)
+            load_time = time.perf_counter() - start
+
+            results, single_rate, batch_rate = run(classifier, texts, args.batch_size)
+            agreement = sum(r["label"] == ref["label"] for r, ref in zip(results, reference)) / len(texts)
+            max_diff = max(
+                abs(r["score"] - ref["score"])
+                for r, ref in zip(results, reference)
+                if r["label"] == ref["label"]
+            ) if agreement else 1.0
+            print(f"{name:<14}{backend:<14}{load_time:>8.1f}{single_rate:>10.1f}{batch_rate:>10.1f}{agreement:>8.3f}{max_diff:>12.4f}")
+            failed = failed or agreement < args.min_agreement
+            del classifier
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
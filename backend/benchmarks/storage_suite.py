@@ -0,0 +1,298 @@
+"""
+Conformance checks and a throughput benchmark for the storage backends.
+
+Every backend runs the same checks (case versions, evidence routing, turn
+ids, sessions, chat, presence, the change channel), so the embedded backends
+can stand in for Redis wherever the app uses `db.storage`. Then each store
+operation is timed. Run from the backend directory:
+
+    python -m benchmarks.storage_suite --backends memory sqlite
+    python -m benchmarks.storage_suite --backends redis --ops 5000
+
+The redis backend uses REDIS_HOST/REDIS_PORT and leaves its `suite-*` cases
+behind, so point it at a scratch database.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+import traceback
+import uuid
+
+# The app settings require these; nothing here talks to the real services
+for var in ("LLM_MODEL_NAME", "GALADRIEL_API_KEY", "GALADRIEL_BASE_URL", "OPENAI_API_KEY",
+            "PINATA_API_KEY", "PINATA_SECRET_API_KEY"):
+    os.environ.setdefault(var, "suite")
+
+from app.db.storage import create_stores  # noqa: E402
+from app.schema.models import Case, Evidence  # noqa: E402
+
+BACKENDS = ("memory", "sqlite", "redis")
+
+
+def new_id() -> str:
+    return f"suite-{uuid.uuid4().hex}"
+
+
+def make_case(case_id: str, mode: str = "human-human", created_at: float = 1000.0,
+              evidences: int = 2) -> Case:
+    return Case(
+        case_id=case_id,
+        title="Breach of asset transfer agreement",
+        description="The respondent failed to transfer the agreed assets.",
+        lawyer1_type="Human",
+        lawyer1_address=f"0x{case_id[-8:]}a",
+        lawyer2_type="AI" if mode == "human-ai" else "Human",
+        case_status="open",
+        mode=mode,
+        created_at=created_at,
+        updated_at=created_at,
+        lawyer1_evidences=[
+            Evidence(f"Qm{uuid.uuid4().hex}", f"Evidence {i}", f"evidence_{i}.pdf", created_at)
+            for i in range(evidences)
+        ],
+    )
+
+
+def evidence(n: int = 1):
+    return [Evidence(f"Qm{uuid.uuid4().hex}", f"Later evidence {i}", f"later_{i}.pdf", 2000.0) for i in range(n)]
+
+
+# Conformance checks: each takes (store, async_store) and raises AssertionError
+
+def check_case_round_trip(store, async_store):
+    case_id = new_id()
+    before = store.get_cases_version()
+    saved = store.create_case(case_id, make_case(case_id))
+    assert saved.version == 1, saved.version
+    loaded = store.get_case(case_id)
+    assert loaded.to_dict() == saved.to_dict(), (loaded, saved)
+    assert store.get_case_version(case_id) == 1
+    assert store.get_cases_version() > before
+    assert store.get_case(new_id()) is None
+    assert store.get_case_version(new_id()) is None
+
+
+def check_update_fields(store, async_store):
+    case_id = new_id()
+    store.create_case(case_id, make_case(case_id))
+    assert store.update_case_fields(case_id, {"case_status": "closed", "updated_at": 1500.0})
+    case = store.get_case(case_id)
+    assert (case.case_status, case.updated_at, case.version) == ("closed", 1500.0, 2), case
+    assert not store.update_case_fields(new_id(), {"case_status": "closed"})
+
+
+def check_evidence_routing(store, async_store):
+    case_id = new_id()
+    case = store.create_case(case_id, make_case(case_id))
+    address = case.lawyer1_address
+    assert store.add_evidence(case_id, "Human", address, evidence(), 2000.0) == "lawyer1"
+    assert store.add_evidence(case_id, "Human", "0xsecond", evidence(2), 2001.0) == "lawyer2"
+    assert store.add_evidence(case_id, "Human", "0xsecond", evidence(), 2002.0) == "lawyer2"
+    assert store.add_evidence(case_id, "Human", "0xthird", evidence(), 2003.0) == "forbidden"
+    assert store.add_evidence(new_id(), "Human", address, evidence(), 2003.0) == "not_found"
+    case = store.get_case(case_id)
+    assert (case.lawyer2_type, case.lawyer2_address) == ("Human", "0xsecond"), case
+    assert (len(case.lawyer1_evidences), len(case.lawyer2_evidences)) == (3, 3), case
+    assert (case.updated_at, case.version) == (2002.0, 4), case
+
+    ai_case_id = new_id()
+    store.create_case(ai_case_id, make_case(ai_case_id, mode="human-ai", evidences=0))
+    assert store.add_evidence(ai_case_id, "AI", None, evidence(), 2000.0) == "lawyer2"
+    assert store.add_evidence(ai_case_id, "Human", "0xanyone", evidence(), 2000.0) == "lawyer1"
+    assert store.get_case(ai_case_id).lawyer2_type == "AI"
+
+
+def check_batches_and_ranges(store, async_store):
+    created = [make_case(new_id(), created_at=5000.0 + i) for i in range(5)]
+    store.create_cases(created)
+    assert all(case.version == 1 for case in created), [c.version for c in created]
+    ids = [case.case_id for case in created]
+    assert [c.case_id for c in store.get_cases([ids[2], new_id(), ids[0]])] == [ids[2], ids[0]]
+    ranged = store.list_cases(created_after=5001.0, created_before=5003.0)
+    assert [c.case_id for c in ranged if c.case_id in ids] == ids[1:4], ranged
+    seen = {case.case_id for batch in store.iter_case_batches(2) for case in batch}
+    assert set(ids) <= seen
+    assert set(ids) <= {case.case_id for case in store.list_cases()}
+
+
+def check_pending_render(store, async_store):
+    ids = [new_id() for _ in range(3)]
+    store.add_pending_render(ids)
+    popped = set()
+    while True:
+        batch = store.pop_pending_render(2)
+        if not batch:
+            break
+        assert len(batch) <= 2
+        popped.update(batch)
+    assert set(ids) <= popped
+
+
+def check_evidence_links(store, async_store):
+    key, case_id = f"suite{uuid.uuid4().hex}", new_id()
+    assert store.link_evidence(case_id, "lawyer1", [(key, {"original_name": "a.pdf", "first_seen": 1.0})]) == [True]
+    assert store.link_evidence(case_id, "lawyer1", [(key, {"original_name": "b.pdf"})]) == [False]
+    assert store.link_evidence(case_id, "lawyer2", [(key, {}), (key, {})]) == [True, False]
+    assert store.evidence_links(key) == sorted([f"{case_id}:lawyer1", f"{case_id}:lawyer2"])
+
+
+def check_turns(store, async_store):
+    case_id = new_id()
+    ids = [store.append_turn(case_id, {"speaker": "human", "n": i}) for i in range(5)]
+    first = store.get_turns(case_id, limit=2)
+    assert [turn["n"] for _, turn in first] == [0, 1], first
+    rest = store.get_turns(case_id, since=first[-1][0], limit=10)
+    assert [turn["n"] for _, turn in rest] == [2, 3, 4], rest
+    assert [turn_id for turn_id, _ in first + rest] == ids
+    assert [turn["n"] for _, turn in store.get_last_turns(case_id, 2)] == [3, 4]
+    assert store.get_turns(new_id()) == []
+    store.clear_turns(case_id)
+    assert store.get_turns(case_id) == []
+    later = store.append_turn(case_id, {"speaker": "judge", "n": 5})
+    assert [turn["n"] for _, turn in store.get_turns(case_id, since=ids[-1])] == [5], later
+    try:
+        store.get_turns(case_id, since="not-a-cursor")
+    except Exception:
+        pass
+    else:
+        raise AssertionError("malformed cursor accepted")
+
+
+def check_sessions(store, async_store):
+    case_id = new_id()
+    store.save_session(case_id, {"case_id": case_id, "human_score": 1.5, "current_turn": "ai"})
+    state = store.pop_session(case_id)
+    assert state == {"case_id": case_id, "human_score": "1.5", "current_turn": "ai"}, state
+    assert store.pop_session(case_id) is None
+
+
+async def check_async(store, async_store):
+    case_id = new_id()
+    store.create_case(case_id, make_case(case_id))
+    assert (await async_store.get_case(case_id)).case_id == case_id
+
+    for i in range(3):
+        await async_store.append_chat_message(case_id, {"type": "chat", "content": str(i)})
+    messages = await async_store.get_chat_messages(case_id, 1)
+    assert [m["content"] for m in messages] == ["1", "2"], messages
+
+    await async_store.touch_presence([(case_id, "w:1|0xa"), (case_id, "w:2|0xb")], 30)
+    await async_store.touch_presence([(case_id, "w:3|0xc")], 0.05)
+    await async_store.remove_presence(case_id, "w:2|0xb")
+    await asyncio.sleep(0.1)
+    assert sorted(await async_store.get_presence(case_id)) == ["w:1|0xa"]
+
+    changes = async_store.case_changes()
+    # The subscription announces it is live with a resync
+    assert await asyncio.wait_for(changes.__anext__(), 5) == {"type": "resync"}
+    store.publish_case_changes([{"type": "updated", "case_id": case_id, "version": 2}])
+    change = await asyncio.wait_for(changes.__anext__(), 5)
+    assert change["case_id"] == case_id, change
+    await changes.aclose()
+
+
+CHECKS = [
+    check_case_round_trip,
+    check_update_fields,
+    check_evidence_routing,
+    check_batches_and_ranges,
+    check_pending_render,
+    check_evidence_links,
+    check_turns,
+    check_sessions,
+    check_async,
+]
+
+
+def run_checks(store, async_store) -> list:
+    failures = []
+    for check in CHECKS:
+        try:
+            if asyncio.iscoroutinefunction(check):
+                asyncio.run(check(store, async_store))
+            else:
+                check(store, async_store)
+        except Exception:
+            failures.append((check.__name__, traceback.format_exc()))
+    return failures
+
+
+def bench(store, async_store, ops: int) -> dict:
+    """Operations per second and p99 latency for each store operation"""
+    results = {}
+
+    def timed(name, fn, args_list):
+        latencies = []
+        for args in args_list:
+            started = time.perf_counter()
+            fn(*args)
+            latencies.append(time.perf_counter() - started)
+        total = sum(latencies)
+        results[name] = {
+            "ops_per_second": round(len(latencies) / total) if total else 0,
+            "p99_us": round(sorted(latencies)[int(0.99 * (len(latencies) - 1))] * 1e6, 1),
+            "mean_us": round(statistics.mean(latencies) * 1e6, 1),
+        }
+
+    cases = [make_case(new_id()) for _ in range(ops)]
+    timed("create_case", store.create_case, [(case.case_id, case) for case in cases])
+    timed("get_case", store.get_case, [(case.case_id,) for case in cases])
+    timed("get_case_version", store.get_case_version, [(case.case_id,) for case in cases])
+    timed("update_case_fields", store.update_case_fields,
+          [(case.case_id, {"case_status": "closed"}) for case in cases])
+    timed("add_evidence", store.add_evidence,
+          [(case.case_id, "Human", case.lawyer1_address, evidence(), 2000.0) for case in cases])
+    case_id = new_id()
+    timed("append_turn", store.append_turn, [(case_id, {"speaker": "human", "context": "x" * 200})] * ops)
+    timed("get_last_turns", store.get_last_turns, [(case_id, 20)] * ops)
+
+    async def chat():
+        room = new_id()
+        started = time.perf_counter()
+        for i in range(ops):
+            await async_store.append_chat_message(room, {"type": "chat", "content": "x" * 100})
+        append = time.perf_counter() - started
+        started = time.perf_counter()
+        for _ in range(max(ops // 100, 1)):
+            await async_store.get_chat_messages(room)
+        history = time.perf_counter() - started
+        return append, history
+
+    append, history = asyncio.run(chat())
+    results["append_chat_message"] = {"ops_per_second": round(ops / append) if append else 0}
+    results["get_chat_messages (full history)"] = {
+        "ops_per_second": round(max(ops // 100, 1) / history) if history else 0
+    }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=["memory", "sqlite"])
+    parser.add_argument("--ops", type=int, default=2000, help="operations per benchmark")
+    parser.add_argument("--skip-bench", action="store_true", help="run the conformance checks only")
+    args = parser.parse_args()
+
+    failed = False
+    with tempfile.TemporaryDirectory() as tmp:
+        for backend in args.backends:
+            store, async_store = create_stores(backend, os.path.join(tmp, f"{backend}.sqlite3"))
+            failures = run_checks(store, async_store)
+            print(f"{backend}: {len(CHECKS) - len(failures)}/{len(CHECKS)} checks passed")
+            for name, trace in failures:
+                failed = True
+                print(f"  FAILED {name}\n{trace}")
+            if args.skip_bench or failures:
+                continue
+            for name, stats in bench(store, async_store, args.ops).items():
+                extra = f"  p99 {stats['p99_us']:>9.1f} us" if "p99_us" in stats else ""
+                print(f"  {name:<34} {stats['ops_per_second']:>9} ops/s{extra}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
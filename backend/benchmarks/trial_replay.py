@@ -0,0 +1,305 @@
+"""
+Replay scripted courtroom trials through the Judge, offline and deterministically.
+
+Drives start_simulation -> process_input (human and AI turns) -> end_case
+with every external dependency replaced by a local stand-in:
+
+- the assistant, AI lawyer and judge agents answer from a script (or from
+  generated text), but judge calls still go through the LLM gateway
+- turns are logged to an in-memory list instead of the Redis stream
+- the transcript PDF is written to a temporary directory (`--pdf stub`
+  writes plain text instead, when reportlab/PyPDF2 are not installed)
+- pinning to IPFS returns a hash of the transcript instead of calling Pinata
+- sentiment and coherence scores are hash-based unless `--real-models`
+
+Trials run for the full number of turns unless `--early-end` keeps the
+Judge's winning margins. Reports per-turn latency, process memory growth and
+the score trajectory. Run from the backend directory:
+
+    python -m benchmarks.trial_replay --turns 50 --output replay.json
+    python -m benchmarks.trial_replay --script trial.json --real-models
+
+A script is a JSON object with any of these lists, reused cyclically:
+"human_inputs", "assistant_contexts", "ai_responses", "judge_comments".
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+# The app settings require these; nothing here talks to the real services
+for var in ("LLM_MODEL_NAME", "GALADRIEL_API_KEY", "GALADRIEL_BASE_URL", "OPENAI_API_KEY",
+            "PINATA_API_KEY", "PINATA_SECRET_API_KEY"):
+    os.environ.setdefault(var, "replay")
+os.environ.setdefault("WARM_UP_MODELS", "false")
+# Scripted agents cost nothing, so the gateway's rate limits would only add
+# artificial waits; set these explicitly to measure throttling too
+os.environ.setdefault("LLM_REQUESTS_PER_MINUTE", "1000000")
+os.environ.setdefault("LLM_TOKENS_PER_MINUTE", "1000000000")
+
+from app.human_ai.coherence import CoherenceScorer  # noqa: E402
+from app.human_ai.hai import Judge, LawyerContext, ProcessInputRequest  # noqa: E402
+
+WORDS = (
+    "contract breach evidence witness testimony damages liability clause court "
+    "agreement payment delivery notice party claim defence precedent statute "
+    "obligation record exhibit timeline signature invoice negligence intent"
+).split()
+
+
+def generated_text(rng: random.Random, sentences: int) -> str:
+    return " ".join(
+        " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 14))).capitalize() + "."
+        for _ in range(sentences)
+    )
+
+
+def stable_score(text: str, low: float = 0.5, high: float = 1.0) -> float:
+    """Deterministic stand-in for a classifier confidence"""
+    value = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:4], "big") / 2 ** 32
+    return low + (high - low) * value
+
+
+class Script:
+    def __init__(self, data: dict, turns: int, seed: int):
+        rng = random.Random(seed)
+        self.lines = {
+            "human_inputs": data.get("human_inputs") or [generated_text(rng, 2) for _ in range(turns)],
+            "assistant_contexts": data.get("assistant_contexts") or [generated_text(rng, 4) for _ in range(turns)],
+            "ai_responses": data.get("ai_responses") or [generated_text(rng, 5) for _ in range(turns)],
+            "judge_comments": data.get("judge_comments") or [generated_text(rng, 2) for _ in range(turns)],
+        }
+        self.positions = {name: 0 for name in self.lines}
+
+    def next(self, name: str) -> str:
+        lines = self.lines[name]
+        line = lines[self.positions[name] % len(lines)]
+        self.positions[name] += 1
+        return line
+
+
+class ScriptedAgent:
+    """Looks like a phi Agent to the LLM gateway, answers from the script"""
+    def __init__(self, script: Script, name: str):
+        self.script = script
+        self.name = name
+        self.model = SimpleNamespace(id=f"replay-{name}")
+        self.knowledge = None
+        self.tools = None
+        self.markdown = True
+
+    def run(self, prompt: str):
+        return SimpleNamespace(content=self.script.next(self.name))
+
+
+class ScriptedAssistant:
+    def __init__(self, script: Script):
+        self.script = script
+
+    async def ask(self, user_input):
+        return [user_input, self.script.next("assistant_contexts")]
+
+
+class ScriptedAILawyer:
+    def __init__(self, script: Script):
+        self.script = script
+
+    async def respond(self, query):
+        return {"input": "AI Lawyer's Argument", "context": self.script.next("ai_responses"), "speaker": "ai"}
+
+
+class StubCoherenceScorer(CoherenceScorer):
+    def __init__(self):
+        super().__init__(get_classifier=None)
+
+    def pair_scores(self, pairs):
+        return [stable_score(p + "\0" + h) for p, h in pairs]
+
+
+class StubSentiment:
+    def __call__(self, texts, **kwargs):
+        texts = [texts] if isinstance(texts, str) else texts
+        return [{"label": "POSITIVE", "score": stable_score(text)} for text in texts]
+
+
+class LocalTurnLog:
+    def __init__(self):
+        self.turns = []
+
+    def append_turn(self, case_id, turn):
+        self.turns.append((case_id, turn))
+        return f"{len(self.turns)}-0"
+
+    def clear_turns(self, case_id):
+        self.turns = [entry for entry in self.turns if entry[0] != case_id]
+
+
+class ReplayJudge(Judge):
+    def __init__(self, script: Script, reports_dir: str, pdf: str, real_models: bool):
+        super().__init__()
+        self.script = script
+        self.judge = ScriptedAgent(script, "judge_comments")
+        self.reports_dir = reports_dir
+        self.turn_log = LocalTurnLog()
+        self.pdf = pdf
+        self.real_models = real_models
+        if not real_models:
+            self.coherence_scorer = StubCoherenceScorer()
+
+    @property
+    def sentiment_analyzer(self):
+        return super().sentiment_analyzer if self.real_models else StubSentiment()
+
+    @property
+    def sentiment_tokenizer(self):
+        return super().sentiment_tokenizer if self.real_models else None
+
+    def new_human_lawyer(self, case_id):
+        return SimpleNamespace(assistant=ScriptedAssistant(self.script))
+
+    def new_ai_lawyer(self, case_id):
+        return ScriptedAILawyer(self.script)
+
+    def append_to_case_pdf(self, case_id: str, conversation: LawyerContext):
+        if self.pdf == "real":
+            return super().append_to_case_pdf(case_id, conversation)
+        with open(os.path.join(self.reports_dir, f"case_{case_id}.pdf"), "a", encoding="utf-8") as f:
+            f.write(f"{conversation.speaker}: {conversation.input}\n{conversation.context}\n{conversation.score}\n\n")
+
+    def pin_case_record(self, pdf_path: str) -> str:
+        digest = hashlib.sha256()
+        if os.path.exists(pdf_path):
+            with open(pdf_path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 16), b""):
+                    digest.update(block)
+        return f"replay://{digest.hexdigest()}"
+
+
+def rss_bytes() -> int:
+    """Current resident set size, 0 where /proc is not available"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def percentile(values, q):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+async def replay(judge: ReplayJudge, case_id: str, turns: int) -> dict:
+    records = []
+    start_rss = rss_bytes()
+    tracemalloc.start()
+
+    def measure(kind, started, response):
+        current, peak = tracemalloc.get_traced_memory()
+        records.append({
+            "turn": len(records),
+            "kind": kind,
+            "latency_ms": round((time.perf_counter() - started) * 1000, 3),
+            "score": response.current_response.score,
+            "human_score": response.human_score,
+            "ai_score": response.ai_score,
+            "case_status": response.case_status,
+            "python_heap_bytes": current,
+            "python_heap_peak_bytes": peak,
+            "rss_growth_bytes": rss_bytes() - start_rss,
+        })
+
+    started = time.perf_counter()
+    response = await judge.start_simulation(case_id)
+    measure("start", started, response)
+
+    while response.case_status == "open" and sum(r["kind"] == "human" for r in records) < turns:
+        turn_type = response.next_turn
+        request = ProcessInputRequest(
+            turn_type=turn_type,
+            input_text=judge.script.next("human_inputs") if turn_type == "human" else None,
+            case_id=case_id,
+        )
+        started = time.perf_counter()
+        response = await judge.process_input(request)
+        measure(turn_type, started, response)
+
+    if response.case_status == "open":
+        started = time.perf_counter()
+        response = await judge.end_case(case_id)
+        measure("end", started, response)
+    tracemalloc.stop()
+
+    latencies = {}
+    for record in records:
+        latencies.setdefault(record["kind"], []).append(record["latency_ms"])
+    return {
+        "case_id": case_id,
+        "turns": records,
+        "winner": response.winner,
+        "ipfs_hash": response.ipfs_hash,
+        "logged_turns": len(judge.turn_log.turns),
+        "latency_ms": {
+            kind: {
+                "count": len(values),
+                "mean": round(statistics.mean(values), 3),
+                "p50": percentile(values, 0.5),
+                "p95": percentile(values, 0.95),
+                "max": max(values),
+            }
+            for kind, values in latencies.items()
+        },
+        "python_heap_growth_bytes": records[-1]["python_heap_bytes"] - records[0]["python_heap_bytes"],
+        "rss_growth_bytes": records[-1]["rss_growth_bytes"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--turns", type=int, default=50, help="human turns to play")
+    parser.add_argument("--script", help="JSON file of recorded inputs and responses")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--pdf", choices=("real", "stub"), default="real")
+    parser.add_argument("--real-models", action="store_true", help="score with the real classifiers")
+    parser.add_argument("--early-end", action="store_true", help="end the trial once a side leads by the winning margin")
+    parser.add_argument("--case-id", default="replay")
+    parser.add_argument("--output", help="write the full report as JSON")
+    args = parser.parse_args()
+
+    data = {}
+    if args.script:
+        with open(args.script, "r", encoding="utf-8") as f:
+            data = json.load(f)
+
+    with tempfile.TemporaryDirectory() as reports_dir:
+        judge = ReplayJudge(Script(data, args.turns, args.seed), reports_dir, args.pdf, args.real_models)
+        if not args.early_end:
+            judge.human_winning_margin = judge.ai_winning_margin = float("inf")
+        report = asyncio.run(replay(judge, args.case_id, args.turns))
+
+    for kind, stats in report["latency_ms"].items():
+        print(f"{kind:>6}: {stats['count']:4d} turns  mean {stats['mean']:9.2f} ms  "
+              f"p50 {stats['p50']:9.2f} ms  p95 {stats['p95']:9.2f} ms")
+    final = report["turns"][-1]
+    print(f"scores: human {final['human_score']:.3f}  ai {final['ai_score']:.3f}  winner {report['winner']}")
+    print(f"memory: python heap +{report['python_heap_growth_bytes'] / 1024:.0f} KiB, "
+          f"rss +{report['rss_growth_bytes'] / 1024:.0f} KiB over {len(report['turns'])} turns")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"report written to {args.output}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())